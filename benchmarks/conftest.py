@@ -0,0 +1,105 @@
+"""Synthetic ONYPHE-shaped data for the benchmarks.
+
+Documents mimic a datascan result: nested ``app`` and ``geolocus`` objects,
+a few lists, and a raw ``data`` field a few kilobytes long, which is what
+dominates the parsing cost of a real export.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+from typing import Any
+
+import pytest
+
+API_KEY = "0123456789abcdef"
+BASE = "https://www.onyphe.io/api/v2"
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--export-lines",
+        type=int,
+        default=100_000,
+        help="lines in the synthetic export stream (default: 100k)",
+    )
+
+
+def require(module: str, name: str) -> Any:
+    """``module.name``, or skip the benchmark.
+
+    CI runs this suite against the base branch too, whose sources may predate
+    what a benchmark measures: it is skipped there, not left to break the
+    collection of the whole module.
+    """
+    found = getattr(pytest.importorskip(module), name, None)
+    if found is None:
+        pytest.skip(f"{module}.{name} is not in the sources under test")
+    return found
+
+
+def document(index: int, rng: random.Random, data_size: int = 2048) -> dict[str, Any]:
+    """One synthetic datascan document."""
+    ip = f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+    return {
+        "@category": "datascan",
+        "@timestamp": "2026-10-01T12:00:00.000Z",
+        "ip": ip,
+        "port": rng.choice((22, 80, 443, 3389, 8080)),
+        "protocol": "http",
+        "transport": "tcp",
+        "tls": "true",
+        "asn": f"AS{rng.randint(1, 65000)}",
+        "organization": "Example Hosting",
+        "country": rng.choice(("FR", "DE", "US", "JP")),
+        "domain": ["example.com", "example.net"],
+        "hostname": [f"host{index}.example.com"],
+        "app": {
+            "http": {
+                "headers": {"server": "nginx/1.24.0", "content-type": "text/html"},
+                "title": "Welcome",
+                "status": "200",
+            }
+        },
+        "geolocus": {"city": "Paris", "latitude": "48.85", "longitude": "2.35"},
+        "cve": [f"CVE-2024-{rng.randint(1000, 9999)}" for _ in range(rng.randint(0, 4))],
+        "data": "x" * data_size,
+    }
+
+
+def envelope(results: list[dict[str, Any]], *, page: int = 1, max_page: int = 1) -> bytes:
+    """An encoded search answer."""
+    return json.dumps(
+        {
+            "count": len(results),
+            "error": 0,
+            "status": "ok",
+            "text": "Success",
+            "took": "0.120",
+            "total": len(results) * max_page,
+            "page": page,
+            "max_page": max_page,
+            "results": results,
+        }
+    ).encode()
+
+
+@pytest.fixture(scope="session")
+def rng() -> random.Random:
+    return random.Random(1337)
+
+
+@pytest.fixture(scope="session")
+def export_body(request: pytest.FixtureRequest, rng: random.Random) -> bytes:
+    """An NDJSON export of ``--export-lines`` documents, built once."""
+    lines = request.config.getoption("--export-lines")
+    # A pool of distinct lines repeated, so building 1M lines stays cheap.
+    pool = [json.dumps(document(index, rng)).encode() for index in range(1000)]
+    return b"\n".join(pool[index % len(pool)] for index in range(lines)) + b"\n"
+
+
+@pytest.fixture(scope="session")
+def page_body(rng: random.Random) -> bytes:
+    """A search page of 10000 results."""
+    return envelope([document(index, rng) for index in range(10_000)])
@@ -0,0 +1,114 @@
+"""End-to-end client paths over an in-memory transport.
+
+``httpx.MockTransport`` answers instantly from pre-encoded bodies, so what is
+measured is the client itself: request building, decoding, validation and
+line splitting.
+"""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from pyonyphe import Onyphe
+from pyonyphe.cli import emit_ndjson
+
+from .conftest import API_KEY, envelope, require
+
+PAGE_SIZE = 100
+
+
+def over(http: httpx.Client) -> Onyphe:
+    """A client on ``http``, or a skip on sources whose clients cannot share a pool."""
+    try:
+        return Onyphe(API_KEY, http_client=http)
+    except TypeError:
+        pytest.skip("Onyphe(http_client=) is not in the sources under test")
+
+
+def test_export_stream(
+    benchmark: BenchmarkFixture, export_body: bytes, request: pytest.FixtureRequest
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=export_body)
+
+    def consume() -> int:
+        with (
+            httpx.Client(transport=httpx.MockTransport(handler)) as http,
+            over(http) as client,
+        ):
+            return sum(1 for _ in client.export("category:datascan"))
+
+    count = benchmark.pedantic(consume, rounds=3, iterations=1)
+    assert count == request.config.getoption("--export-lines")
+
+
+def test_search_iter_page_walk(benchmark: BenchmarkFixture, page_body: bytes) -> None:
+    # 10000 results in pages of 100: the walk search_iter does on a full query.
+    results = json.loads(page_body)["results"]
+    pages = {
+        page: envelope(results[(page - 1) * PAGE_SIZE : page * PAGE_SIZE], page=page, max_page=100)
+        for page in range(1, 101)
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=pages[int(request.url.params["page"])])
+
+    def walk() -> int:
+        with (
+            httpx.Client(transport=httpx.MockTransport(handler)) as http,
+            over(http) as client,
+        ):
+            return sum(1 for _ in client.search_iter("category:datascan", size=PAGE_SIZE))
+
+    assert benchmark(walk) == 10_000
+
+
+def test_emit_ndjson(benchmark: BenchmarkFixture, page_body: bytes, tmp_path: Path) -> None:
+    rows = json.loads(page_body)["results"]
+    output = tmp_path / "out.ndjson"
+    assert benchmark(emit_ndjson, rows, output) == len(rows)
+
+
+def test_emit_csv(benchmark: BenchmarkFixture, page_body: bytes, tmp_path: Path) -> None:
+    rows = json.loads(page_body)["results"]
+    output = tmp_path / "out.csv"
+    fields = ["ip", "port", "protocol", "app.http.title", "cpe", "@timestamp"]
+    emit_delimited = require("pyonyphe.cli", "emit_delimited")
+    assert benchmark(emit_delimited, rows, "csv", output, fields) == len(rows)
+
+
+def test_progress_overhead(benchmark: BenchmarkFixture, tmp_path: Path) -> None:
+    # Against a bare loop over the same rows, this is the per-document cost of
+    # the live status line: a counter and a clock read.
+    rows = [{"n": n} for n in range(100_000)]
+    progress_line = require("pyonyphe.progress", "Progress")
+    with (tmp_path / "progress").open("w", encoding="utf-8") as stream:
+        progress = progress_line(stream)
+        assert benchmark(lambda: sum(1 for _ in progress.track(rows))) == len(rows)
+
+
+def test_client_construction(benchmark: BenchmarkFixture) -> None:
+    def build() -> None:
+        Onyphe(API_KEY).close()
+
+    benchmark(build)
+
+
+@pytest.mark.parametrize("module", ["pyonyphe", "pyonyphe.cli"])
+def test_import_time(benchmark: BenchmarkFixture, module: str) -> None:
+    # A fresh interpreter each round: the module cache makes re-imports free.
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+
+    def run() -> str:
+        return subprocess.run(command, capture_output=True, text=True, check=True).stderr  # noqa: S603
+
+    trace = benchmark.pedantic(run, rounds=5, iterations=1)
+    last = next(line for line in reversed(trace.splitlines()) if line.endswith(f"| {module}"))
+    benchmark.extra_info["cumulative_us"] = int(last.split("|")[1])
@@ -0,0 +1,29 @@
+"""Work on documents already fetched: projection and local OQL filtering."""
+
+from __future__ import annotations
+
+import random
+
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from .conftest import document, require
+
+
+def test_projection(benchmark: BenchmarkFixture, rng: random.Random) -> None:
+    documents = [document(index, rng) for index in range(1000)]
+    projection = require("pyonyphe.fields", "Projection")
+    project = projection(["ip", "port", "product", "@timestamp", "app.http.title"])
+
+    def run() -> None:
+        for item in documents:
+            project(item)
+
+    benchmark(run)
+
+
+def test_oql_select(benchmark: BenchmarkFixture, rng: random.Random) -> None:
+    documents = [document(index, rng) for index in range(1000)]
+    query = require("pyonyphe.oql", "Query")(
+        "category:datascan port:>=443 -?product:open* (country:FR OR country:DE)"
+    )
+    benchmark(query.select, documents)
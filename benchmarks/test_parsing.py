@@ -0,0 +1,36 @@
+"""Per-document and per-page decoding costs."""
+
+from __future__ import annotations
+
+import json
+import random
+
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from pyonyphe import _specs as specs
+from pyonyphe._base import BaseClient
+from pyonyphe.models import Response
+
+from .conftest import document
+
+
+def test_parse_ndjson_line(benchmark: BenchmarkFixture, rng: random.Random) -> None:
+    lines = [json.dumps(document(index, rng)).encode() for index in range(1000)]
+
+    def parse() -> None:
+        for line in lines:
+            BaseClient.parse_ndjson_line(line)
+
+    benchmark(parse)
+
+
+def test_response_model_validate(benchmark: BenchmarkFixture, page_body: bytes) -> None:
+    payload = json.loads(page_body)
+    response = benchmark(Response.model_validate, payload)
+    assert len(response.results) == 10_000
+
+
+def test_to_payload(benchmark: BenchmarkFixture) -> None:
+    assets = [f"10.0.{index >> 8 & 255}.{index & 255}" for index in range(100_000)]
+    payload = benchmark(specs.to_payload, assets)
+    assert payload.count(b"\n") == len(assets)
@@ -7,36 +7,105 @@
 
 from __future__ import annotations
 
-from importlib.metadata import PackageNotFoundError, version
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
 
-from ._specs import (
-    BEST_CATEGORIES,
-    BULK_SIMPLE_CATEGORIES,
-    SEARCH_MAX_RESULTS,
-    SIMPLE_CATEGORIES,
-    SUMMARY_KINDS,
-)
-from .async_client import AsyncOnyphe
-from .client import Onyphe
-from .config import DEFAULT_BASE_URL, UNRATED_BASE_URL, Settings, load_settings
-from .errors import (
-    APIError,
-    AuthenticationError,
-    ConfigError,
-    NotFoundError,
-    OnypheError,
-    ParamError,
-    PaymentRequiredError,
-    RateLimitError,
-    ServerError,
-    TransportError,
-)
-from .models import Alert, Response
+if TYPE_CHECKING:
+    from ._base import BatchResult
+    from ._specs import (
+        BEST_CATEGORIES,
+        BULK_SIMPLE_CATEGORIES,
+        SEARCH_MAX_RESULTS,
+        SIMPLE_CATEGORIES,
+        SUMMARY_KINDS,
+    )
+    from .async_client import AsyncOnyphe
+    from .client import Onyphe
+    from .config import DEFAULT_BASE_URL, UNRATED_BASE_URL, Settings, load_settings
+    from .errors import (
+        APIError,
+        AuthenticationError,
+        ConfigError,
+        NotFoundError,
+        OnypheError,
+        ParamError,
+        PaymentRequiredError,
+        RateLimitError,
+        ServerError,
+        TransportError,
+    )
+    from .hooks import Event
+    from .metrics import MetricsCollector
+    from .models import Alert, Response
+    from .partition import Dimension, Window
+    from .pool import AsyncOnyphePool, OnyphePool
+    from .streaming import AsyncStreamHandle, StreamHandle, StreamStats
+
+    __version__: str
+
+#: Where each public name lives. They are imported on first access, so that
+#: ``import pyonyphe`` -- and every CLI run -- does not pay for httpx and
+#: pydantic until a client is actually built.
+_EXPORTS = {
+    "BatchResult": "._base",
+    "BEST_CATEGORIES": "._specs",
+    "BULK_SIMPLE_CATEGORIES": "._specs",
+    "SEARCH_MAX_RESULTS": "._specs",
+    "SIMPLE_CATEGORIES": "._specs",
+    "SUMMARY_KINDS": "._specs",
+    "AsyncOnyphe": ".async_client",
+    "Onyphe": ".client",
+    "DEFAULT_BASE_URL": ".config",
+    "UNRATED_BASE_URL": ".config",
+    "Settings": ".config",
+    "load_settings": ".config",
+    "APIError": ".errors",
+    "AuthenticationError": ".errors",
+    "ConfigError": ".errors",
+    "NotFoundError": ".errors",
+    "OnypheError": ".errors",
+    "ParamError": ".errors",
+    "PaymentRequiredError": ".errors",
+    "RateLimitError": ".errors",
+    "ServerError": ".errors",
+    "TransportError": ".errors",
+    "Event": ".hooks",
+    "MetricsCollector": ".metrics",
+    "Alert": ".models",
+    "Response": ".models",
+    "Dimension": ".partition",
+    "AsyncOnyphePool": ".pool",
+    "OnyphePool": ".pool",
+    "AsyncStreamHandle": ".streaming",
+    "StreamHandle": ".streaming",
+    "StreamStats": ".streaming",
+    "Window": ".partition",
+}
+
+
+def _version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("pyonyphe")
+    except PackageNotFoundError:  # pragma: no cover - running from a source tree
+        return "0.0.0.dev0"
+
+
+def __getattr__(name: str) -> Any:
+    if name == "__version__":
+        value: Any = _version()
+    elif name in _EXPORTS:
+        value = getattr(import_module(_EXPORTS[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value  # resolved once; later lookups never get here
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
 
-try:
-    __version__ = version("pyonyphe")
-except PackageNotFoundError:  # pragma: no cover - running from a source tree
-    __version__ = "0.0.0.dev0"
 
 __all__ = [
     "BEST_CATEGORIES",
@@ -49,18 +118,28 @@ __all__ = [
     "APIError",
     "Alert",
     "AsyncOnyphe",
+    "AsyncOnyphePool",
+    "AsyncStreamHandle",
     "AuthenticationError",
+    "BatchResult",
     "ConfigError",
+    "Dimension",
+    "Event",
+    "MetricsCollector",
     "NotFoundError",
     "Onyphe",
     "OnypheError",
+    "OnyphePool",
     "ParamError",
     "PaymentRequiredError",
     "RateLimitError",
     "Response",
     "ServerError",
     "Settings",
+    "StreamHandle",
+    "StreamStats",
     "TransportError",
+    "Window",
     "__version__",
     "load_settings",
 ]
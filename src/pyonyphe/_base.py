@@ -5,6 +5,7 @@ from __future__ import annotations
 
 import base64
 import json as jsonlib
+from collections.abc import Iterable
 from dataclasses import dataclass
 from typing import Any
 
@@ -16,13 +17,16 @@ from .errors import (
     APIError,
     AuthenticationError,
     NotFoundError,
+    OnypheError,
+    ParamError,
     PaymentRequiredError,
     RateLimitError,
     ServerError,
 )
+from .hooks import Event, Hook
 from .models import Response
 
-__all__ = ["USER_AGENT", "BaseClient", "PreparedRequest"]
+__all__ = ["USER_AGENT", "BaseClient", "BatchResult", "PreparedRequest"]
 
 USER_AGENT = "pyonyphe/3.0.0 (+https://github.com/sebdraven/pyonyphe)"
 
@@ -30,7 +34,9 @@ USER_AGENT = "pyonyphe/3.0.0 (+https://github.com/sebdraven/pyonyphe)"
 RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
 
 
-@dataclass(frozen=True, slots=True)
+# Not slotted: hooks keep per-call state in weak references to the request,
+# which a slotted dataclass cannot take before Python 3.11.
+@dataclass(frozen=True)
 class PreparedRequest:
     """A :class:`~pyonyphe._specs.Spec` resolved against the client settings."""
 
@@ -41,6 +47,28 @@ class PreparedRequest:
     content: bytes | None
     json: dict[str, Any] | None
     stream: bool
+    endpoint: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class BatchResult:
+    """Outcome of one item handed to ``send_many``.
+
+    :param index: position of the item in the input
+    :param item: the :class:`~pyonyphe._specs.Spec` or callable that was run
+    :param result: what it returned, a :class:`Response` for a spec
+    :param error: the exception it raised instead
+    """
+
+    index: int
+    item: Any
+    result: Any = None
+    error: OnypheError | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the item completed without raising."""
+        return self.error is None
 
 
 class BaseClient:
@@ -53,6 +81,10 @@ class BaseClient:
     :param max_retries: how many times a retryable failure is retried
     :param backoff: base delay in seconds for the exponential backoff
     :param user_agent: value sent in the ``User-Agent`` header
+    :param hooks: callables receiving every :class:`~pyonyphe.hooks.Event`
+    :param canonical_queries: send search and export queries in their
+        :func:`~pyonyphe.oql.canonical` spelling, so that equivalent queries
+        make the same request -- and hit the same cache or recording
     """
 
     def __init__(
@@ -65,6 +97,8 @@ class BaseClient:
         max_retries: int = 3,
         backoff: float = 0.5,
         user_agent: str = USER_AGENT,
+        hooks: Iterable[Hook] = (),
+        canonical_queries: bool = False,
     ) -> None:
         self.settings: Settings = load_settings(
             api_key, base_url=base_url, unrated_email=unrated_email
@@ -73,6 +107,25 @@ class BaseClient:
         self.max_retries = max_retries
         self.backoff = backoff
         self.user_agent = user_agent
+        self._hooks: list[Hook] = list(hooks)
+        self.canonical_queries = canonical_queries
+
+    # -- lifecycle events ---------------------------------------------------
+
+    def add_hook(self, hook: Hook) -> None:
+        """Call ``hook`` with every :class:`~pyonyphe.hooks.Event` from now on."""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """Stop calling a hook registered earlier."""
+        self._hooks.remove(hook)
+
+    def emit(self, name: str, request: PreparedRequest, **fields: Any) -> None:
+        """Build an event and hand it to every hook -- a no-op when there is none."""
+        if self._hooks:
+            event = Event(name, request, **fields)
+            for hook in self._hooks:
+                hook(event)
 
     # -- request building ---------------------------------------------------
 
@@ -97,6 +150,8 @@ class BaseClient:
             **self._auth_headers(),
         }
         params = dict(spec.params)
+        if self.canonical_queries and spec.endpoint in ("search", "export"):
+            params["q"] = self._canonical(params["q"])
         if self.settings.is_unrated:
             # The Unrated endpoint uses the Authorization header for basic auth,
             # so the key has to travel as a query parameter as well.
@@ -109,8 +164,20 @@ class BaseClient:
             content=spec.content,
             json=spec.json,
             stream=spec.stream,
+            endpoint=spec.endpoint or spec.path,
         )
 
+    @staticmethod
+    def _canonical(query: str) -> str:
+        from .oql import canonical
+
+        try:
+            return canonical(query)
+        except ParamError:
+            # Syntax the local parser does not know goes out as written:
+            # the API is the judge of what it accepts.
+            return query
+
     # -- response handling --------------------------------------------------
 
     @staticmethod
@@ -167,7 +234,17 @@ class BaseClient:
         return self.backoff * (2**attempt)
 
     @staticmethod
-    def parse_ndjson_line(line: str) -> dict[str, Any] | None:
+    def batch_spec(item: Spec) -> Spec:
+        """Reject the specs ``send_many`` cannot run: streams are not batchable.
+
+        :raises ParamError: for a streaming spec
+        """
+        if item.stream:
+            raise ParamError(f"{item.path} streams its results; iterate stream() instead")
+        return item
+
+    @staticmethod
+    def parse_ndjson_line(line: str | bytes) -> dict[str, Any] | None:
         """Decode one line of a streamed response, skipping blanks and junk."""
         stripped = line.strip()
         if not stripped:
@@ -97,6 +97,8 @@ class Spec:
     :param json: JSON body, for ``POST`` endpoints that take one
     :param content: raw body, used by the bulk endpoints
     :param stream: ``True`` when the API answers with newline-delimited JSON
+    :param endpoint: ``path`` without the caller's values, e.g. ``summary/ip``;
+        a low-cardinality name for metrics and traces, ``path`` when omitted
     """
 
     method: str
@@ -105,6 +107,7 @@ class Spec:
     json: dict[str, Any] | None = None
     content: bytes | None = None
     stream: bool = False
+    endpoint: str | None = None
 
 
 def _check(value: str, allowed: frozenset[str], label: str) -> str:
@@ -179,7 +182,7 @@ def search(
         params["trackquery"] = _flag(True)
     if calculated:
         params["calculated"] = _flag(True)
-    return Spec("GET", "search/", params=params)
+    return Spec("GET", "search/", params=params, endpoint="search")
 
 
 def export(query: str, *, trackquery: bool = False, calculated: bool = False) -> Spec:
@@ -189,40 +192,40 @@ def export(query: str, *, trackquery: bool = False, calculated: bool = False) ->
         params["trackquery"] = _flag(True)
     if calculated:
         params["calculated"] = _flag(True)
-    return Spec("GET", "export/", params=params, stream=True)
+    return Spec("GET", "export/", params=params, stream=True, endpoint="export")
 
 
 def summary(kind: SummaryKind, value: str) -> Spec:
     """Summary API for an IP, a domain or a hostname."""
     _check(kind, SUMMARY_KINDS, "summary kind")
-    return Spec("GET", f"summary/{kind}/{value}")
+    return Spec("GET", f"summary/{kind}/{value}", endpoint=f"summary/{kind}")
 
 
 def simple(category: SimpleCategory, value: str) -> Spec:
     """Simple API (deprecated upstream, kept until APIv3 drops it)."""
     _check(category, SIMPLE_CATEGORIES, "simple category")
-    return Spec("GET", f"simple/{category}/{value}")
+    return Spec("GET", f"simple/{category}/{value}", endpoint=f"simple/{category}")
 
 
 def simple_best(category: BestCategory, value: str) -> Spec:
     """Simple Best API: single best-matching document for an IP."""
     _check(category, BEST_CATEGORIES, "best category")
-    return Spec("GET", f"simple/{category}/best/{value}")
+    return Spec("GET", f"simple/{category}/best/{value}", endpoint=f"simple/{category}/best")
 
 
 def simple_datamd5(md5: str) -> Spec:
     """Datascan documents sharing the same ``datamd5`` fingerprint."""
-    return Spec("GET", f"simple/datascan/datamd5/{md5}")
+    return Spec("GET", f"simple/datascan/datamd5/{md5}", endpoint="simple/datascan/datamd5")
 
 
 def simple_resolver_forward(value: str) -> Spec:
     """Forward DNS records for a domain or hostname."""
-    return Spec("GET", f"simple/resolver/forward/{value}")
+    return Spec("GET", f"simple/resolver/forward/{value}", endpoint="simple/resolver/forward")
 
 
 def simple_resolver_reverse(value: str) -> Spec:
     """Reverse DNS records for an IP address."""
-    return Spec("GET", f"simple/resolver/reverse/{value}")
+    return Spec("GET", f"simple/resolver/reverse/{value}", endpoint="simple/resolver/reverse")
 
 
 # --------------------------------------------------------------------------
@@ -278,4 +281,4 @@ def alert_del(alert_id: int | str) -> Spec:
     """Delete the alert with the given identifier."""
     if alert_id is None or str(alert_id) == "":
         raise ParamError("an alert id is required")
-    return Spec("POST", f"alert/del/{alert_id}")
+    return Spec("POST", f"alert/del/{alert_id}", endpoint="alert/del")
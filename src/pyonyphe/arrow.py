@@ -0,0 +1,416 @@
+"""Parquet and Arrow output, for pandas, DuckDB, Spark and friends.
+
+Needs the ``arrow`` extra. Both sinks follow the :class:`~pyonyphe.sinks.Sink`
+protocol, so :func:`~pyonyphe.sinks.copy` feeds them:
+
+>>> with ParquetSink("datascan", partition_by="category") as sink:   # doctest: +SKIP
+...     copy(api.export("category:datascan"), sink)
+
+ONYPHE documents have no fixed schema: every category has its own fields,
+and a field may hold a number in one document and a string in the next. The
+schema is inferred batch by batch. A field seen for the first time is added,
+types are promoted where Arrow can (``null`` to anything, ``int`` to
+``double``, structs to the union of their fields), and a field whose values
+cannot share a type is kept as JSON text. When the schema grows, the
+current output cannot take it any more: :class:`ParquetSink` starts a new
+part file, :class:`ArrowStreamSink` a new stream.
+
+Memory is bounded by ``batch_rows`` documents per partition.
+"""
+
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Sequence
+from functools import reduce
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Literal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .errors import ParamError
+from .sinks import BinaryStream
+
+__all__ = [
+    "PARTITIONS",
+    "ArrowStreamSink",
+    "ParquetSink",
+    "conform",
+    "evolve",
+    "read_dataset",
+    "record_batch",
+]
+
+Row = dict[str, Any]
+Partition = Literal["category", "date"]
+
+#: What :class:`ParquetSink` can split its output by.
+PARTITIONS: tuple[Partition, ...] = ("category", "date")
+#: Hive's name for the partition of documents without the partitioning field.
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _text(value: Any) -> str | None:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _column(values: list[Any]) -> pa.Array:
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types -- a number here, a string there: keep them as text.
+        return pa.array([_text(value) for value in values], pa.string())
+
+
+def record_batch(rows: Sequence[Row]) -> pa.RecordBatch:
+    """A record batch of ``rows``, with columns in order of first appearance."""
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    columns = [_column([row.get(name) for row in rows]) for name in names]
+    return pa.RecordBatch.from_arrays(columns, names=names)
+
+
+def evolve(current: pa.Schema, incoming: pa.Schema) -> pa.Schema:
+    """A schema both fit in: every field of either, types promoted, text on a clash."""
+    try:
+        return pa.unify_schemas([current, incoming], promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    fields = {field.name: field for field in current}
+    for field in incoming:
+        if field.name not in fields:
+            fields[field.name] = field
+            continue
+        try:
+            merged = pa.unify_schemas(
+                [pa.schema([fields[field.name]]), pa.schema([field])],
+                promote_options="permissive",
+            )
+            fields[field.name] = merged.field(0)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            fields[field.name] = pa.field(field.name, pa.string())
+    return pa.schema(list(fields.values()))
+
+
+def _conform_column(column: pa.Array, target: pa.DataType) -> pa.Array:
+    if column.type == target:
+        return column
+    try:
+        return column.cast(target)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    values = column.to_pylist()
+    if pa.types.is_string(target):
+        return pa.array([_text(value) for value in values], pa.string())
+    return pa.array(values, target)
+
+
+def conform(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """``batch`` with the fields and types of ``schema``; missing fields are null."""
+    columns = [
+        _conform_column(batch.column(field.name), field.type)
+        if field.name in batch.schema.names
+        else pa.nulls(batch.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+class _Output(ABC):
+    """Where the batches of one partition go, under one schema at a time."""
+
+    def __init__(self) -> None:
+        self.schema: pa.Schema | None = None
+        self.parts = 0
+
+    def write(self, rows: Sequence[Row]) -> None:
+        batch = record_batch(rows)
+        if self.schema is None:
+            self.schema = batch.schema
+            self.open(self.schema)
+        else:
+            schema = evolve(self.schema, batch.schema)
+            if not schema.equals(self.schema):
+                self.close()
+                self.schema = schema
+                self.open(schema)
+        self.write_batch(conform(batch, self.schema))
+
+    @abstractmethod
+    def open(self, schema: pa.Schema) -> None:
+        """Start a new part under ``schema``."""
+
+    @abstractmethod
+    def write_batch(self, batch: pa.RecordBatch) -> None:
+        """Write ``batch``, already conformed to the current schema."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Finish the current part, if any."""
+
+
+class _ArrowSink(ABC):
+    """Rows buffered per partition, handed to an :class:`_Output` by the batch."""
+
+    def __init__(self, *, batch_rows: int) -> None:
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._buffers: dict[str, list[Row]] = {}
+
+    def _key(self, row: Row) -> str:
+        return ""
+
+    @abstractmethod
+    def _output(self, key: str) -> _Output:
+        """The output of partition ``key``, opened on first use."""
+
+    def write_many(self, rows: Sequence[Row]) -> None:
+        buffers = self._buffers
+        for row in rows:
+            key = self._key(row)
+            buffer = buffers.get(key)
+            if buffer is None:
+                buffer = buffers[key] = []
+            buffer.append(row)
+            if len(buffer) >= self.batch_rows:
+                self._drain(key)
+
+    def _drain(self, key: str) -> None:
+        rows = self._buffers.pop(key, None)
+        if rows:
+            self._output(key).write(rows)
+            self.rows += len(rows)
+
+    def _drain_all(self) -> None:
+        for key in list(self._buffers):
+            self._drain(key)
+
+    def flush(self) -> None:  # noqa: B027 - a no-op on purpose, not a hook to fill in
+        """Nothing: batches go out when full, so that row groups stay large."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Write what is buffered and finish every output."""
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+# -- Parquet -----------------------------------------------------------------
+
+
+class _ParquetOutput(_Output):
+    def __init__(self, directory: Path, options: dict[str, Any]) -> None:
+        super().__init__()
+        self.directory = directory
+        self.options = options
+        self.writer: pq.ParquetWriter | None = None
+
+    def open(self, schema: pa.Schema) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"part-{self.parts:05d}.parquet"
+        self.parts += 1
+        self.writer = pq.ParquetWriter(path, schema, **self.options)
+
+    def write_batch(self, batch: pa.RecordBatch) -> None:
+        assert self.writer is not None
+        self.writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class ParquetSink(_ArrowSink):
+    """A Parquet dataset: a directory of ``part-NNNNN.parquet`` files.
+
+    With ``partition_by``, documents are split Hive-style into
+    ``category=<@category>/`` or ``date=<YYYY-MM-DD of @timestamp>/``
+    sub-directories, which DuckDB and Spark read as a column.
+    Parts may disagree on a type -- ``port`` as a number in one and as text
+    in a later one -- so read the dataset with the schemas of its parts
+    merged: ``read_parquet('path/**/*.parquet', union_by_name=true,
+    hive_partitioning=true)`` in DuckDB, ``mergeSchema`` in Spark, or
+    :func:`read_dataset`.
+
+    :param path: the directory; created if need be
+    :param partition_by: ``"category"``, ``"date"`` or ``None``
+    :param batch_rows: documents per row group, and buffered per partition
+    :param compression: Parquet codec, such as ``"snappy"``, ``"zstd"`` or ``"gzip"``
+    :param level: codec level, its default when ``None``
+    :param max_open: partitions written to at once; the least recently used
+        is closed beyond that, and continues in a new part if it comes back
+    :raises ParamError: on an unknown ``partition_by``
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        partition_by: Partition | None = None,
+        batch_rows: int = 8192,
+        compression: str = "snappy",
+        level: int | None = None,
+        max_open: int = 64,
+    ) -> None:
+        if partition_by is not None and partition_by not in PARTITIONS:
+            raise ParamError(f"unknown partition {partition_by!r}, expected category or date")
+        super().__init__(batch_rows=batch_rows)
+        self.path = Path(path)
+        self.partition_by = partition_by
+        self.max_open = max_open
+        self._options: dict[str, Any] = {"compression": compression}
+        if level is not None:
+            self._options["compression_level"] = level
+        self._outputs: OrderedDict[str, _ParquetOutput] = OrderedDict()
+        self._parts: dict[str, int] = {}
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, row: Row) -> str:
+        if self.partition_by == "category":
+            value = row.get("@category")
+        elif self.partition_by == "date":
+            value = str(row.get("@timestamp") or "")[:10]
+        else:
+            return ""
+        text = str(value) if value else DEFAULT_PARTITION
+        # A value is a directory name: keep it one.
+        return f"{self.partition_by}={text.replace('/', '_')}"
+
+    def _output(self, key: str) -> _Output:
+        output = self._outputs.get(key)
+        if output is not None:
+            self._outputs.move_to_end(key)
+            return output
+        if len(self._outputs) >= self.max_open:
+            evicted, oldest = self._outputs.popitem(last=False)
+            oldest.close()
+            self._parts[evicted] = oldest.parts
+        output = _ParquetOutput(self.path / key if key else self.path, self._options)
+        output.parts = self._parts.get(key, 0)
+        self._outputs[key] = output
+        return output
+
+    def close(self) -> None:
+        try:
+            self._drain_all()
+        finally:
+            for output in self._outputs.values():
+                output.close()
+            self._outputs.clear()
+
+    def __enter__(self) -> ParquetSink:
+        return self
+
+
+def read_dataset(path: str | Path) -> pa.Table:
+    """Read back what :class:`ParquetSink` wrote, as one table.
+
+    Every part is brought to the schema they all fit in, and a Hive
+    partition becomes a column of its own, as other readers do.
+    """
+    tables = []
+    for part in sorted(Path(path).rglob("part-*.parquet")):
+        table = pq.read_table(part)
+        name, equals, value = part.parent.name.partition("=")
+        if equals and name not in table.column_names:
+            column = None if value == DEFAULT_PARTITION else value
+            table = table.append_column(name, pa.array([column] * table.num_rows, pa.string()))
+        tables.append(table)
+    if not tables:
+        return pa.table({})
+    schema = reduce(evolve, (table.schema for table in tables))
+    batches = [conform(batch, schema) for table in tables for batch in table.to_batches()]
+    return pa.Table.from_batches(batches, schema)
+
+
+# -- Arrow IPC ---------------------------------------------------------------
+
+
+class _StreamOutput(_Output):
+    def __init__(self, stream: BinaryStream) -> None:
+        super().__init__()
+        self.stream = stream
+        self.writer: pa.ipc.RecordBatchStreamWriter | None = None
+
+    def open(self, schema: pa.Schema) -> None:
+        self.parts += 1
+        self.writer = pa.ipc.new_stream(self.stream, schema)
+
+    def write_batch(self, batch: pa.RecordBatch) -> None:
+        assert self.writer is not None
+        self.writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class ArrowStreamSink(_ArrowSink):
+    """The Arrow IPC stream format, onto a binary stream such as stdout.
+
+    A stream has a single schema, so when it has to grow, the stream is
+    ended and another one follows, with the wider schema. Read until the
+    input is exhausted::
+
+        while True:
+            try:
+                reader = pa.ipc.open_stream(source)
+            except pa.ArrowInvalid:
+                break
+            for batch in reader:
+                ...
+
+    :param stream: where to write
+    :param batch_rows: documents per record batch
+    :param owned: close ``stream`` with the sink
+    """
+
+    def __init__(
+        self, stream: BinaryStream, *, batch_rows: int = 8192, owned: bool = False
+    ) -> None:
+        super().__init__(batch_rows=batch_rows)
+        self.stream = stream
+        self.owned = owned
+        self._single = _StreamOutput(stream)
+
+    @property
+    def streams(self) -> int:
+        """IPC streams written so far."""
+        return self._single.parts
+
+    def _output(self, key: str) -> _Output:
+        return self._single
+
+    def flush(self) -> None:
+        """Send the batch in progress, so that a reader downstream sees it."""
+        self._drain_all()
+        self.stream.flush()
+
+    def close(self) -> None:
+        try:
+            self._drain_all()
+            self._single.close()
+        finally:
+            if self.owned:
+                self.stream.close()
+            else:
+                self.stream.flush()
+
+    def __enter__(self) -> ArrowStreamSink:
+        return self
@@ -3,7 +3,10 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import AsyncIterator, Iterable
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Sequence
+from contextlib import AbstractAsyncContextManager
+from functools import partial
 from pathlib import Path
 from types import TracebackType
 from typing import Any
@@ -11,7 +14,7 @@ from typing import Any
 import httpx
 
 from . import _specs as specs
-from ._base import RETRY_STATUS, BaseClient, PreparedRequest
+from ._base import RETRY_STATUS, BaseClient, BatchResult, PreparedRequest
 from ._specs import (
     SEARCH_MAX_RESULTS,
     BestCategory,
@@ -20,12 +23,23 @@ from ._specs import (
     Spec,
     SummaryKind,
 )
-from .errors import TransportError
+from .errors import APIError, OnypheError, ParamError, TransportError
+from .fields import Projection
+from .hooks import (
+    ATTEMPT_FINISHED,
+    ATTEMPT_STARTED,
+    REQUEST_FINISHED,
+    REQUEST_PREPARED,
+    RETRY_SCHEDULED,
+)
 from .models import Alert, Response
+from .partition import Dimension, Window, amerge, aplan, check_target
+from .streaming import AsyncStreamHandle
 
 __all__ = ["AsyncOnyphe"]
 
 BulkSource = str | Path | Iterable[str] | bytes
+BatchItem = Spec | Callable[["AsyncOnyphe"], Awaitable[Any]]
 
 
 class AsyncOnyphe(BaseClient):
@@ -37,15 +51,28 @@ class AsyncOnyphe(BaseClient):
     ...         ...
     """
 
-    def __init__(self, api_key: str | None = None, **kwargs: Any) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        *,
+        http_client: httpx.AsyncClient | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        **kwargs: Any,
+    ) -> None:
         super().__init__(api_key, **kwargs)
-        self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=True)
+        if http_client is not None and transport is not None:
+            raise ParamError("pass either http_client or transport, not both")
+        self._owns_client = http_client is None
+        self._client = http_client or httpx.AsyncClient(
+            timeout=self.timeout, follow_redirects=True, transport=transport
+        )
 
     # -- lifecycle ----------------------------------------------------------
 
     async def aclose(self) -> None:
-        """Close the underlying HTTP connection pool."""
-        await self._client.aclose()
+        """Close the underlying HTTP connection pool, unless it was passed in."""
+        if self._owns_client:
+            await self._client.aclose()
 
     async def __aenter__(self) -> AsyncOnyphe:
         return self
@@ -72,40 +99,121 @@ class AsyncOnyphe(BaseClient):
     async def send(self, spec: Spec) -> Response:
         """Send a non-streaming spec, retrying transient failures."""
         prepared = self.prepare(spec)
+        self.emit(REQUEST_PREPARED, prepared)
+        started = time.perf_counter()
+        try:
+            response = await self._attempts(prepared)
+            result = self.to_response(response)
+        except OnypheError as exc:
+            status = exc.status_code if isinstance(exc, APIError) else None
+            elapsed = time.perf_counter() - started
+            self.emit(REQUEST_FINISHED, prepared, status=status, elapsed=elapsed, error=exc)
+            raise
+        elapsed = time.perf_counter() - started
+        self.emit(REQUEST_FINISHED, prepared, status=response.status_code, elapsed=elapsed)
+        return result
+
+    async def _attempts(self, prepared: PreparedRequest) -> httpx.Response:
+        """Send ``prepared`` until it succeeds, fails for good, or runs out of retries."""
         kwargs = self._kwargs(prepared)
         last_error: Exception | None = None
         for attempt in range(self.max_retries + 1):
+            self.emit(ATTEMPT_STARTED, prepared, attempt=attempt)
+            sent = time.perf_counter()
             try:
                 response = await self._client.request(prepared.method, prepared.url, **kwargs)
             except httpx.HTTPError as exc:
                 last_error = TransportError(f"unable to reach ONYPHE: {exc}")
+                elapsed = time.perf_counter() - sent
+                self.emit(ATTEMPT_FINISHED, prepared, attempt=attempt, elapsed=elapsed, error=exc)
                 if attempt >= self.max_retries:
                     raise last_error from exc
-                await asyncio.sleep(self.retry_delay(attempt))
+                delay = self.retry_delay(attempt)
+                self.emit(RETRY_SCHEDULED, prepared, attempt=attempt, delay=delay, error=exc)
+                await asyncio.sleep(delay)
                 continue
-            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+            status = response.status_code
+            elapsed = time.perf_counter() - sent
+            self.emit(ATTEMPT_FINISHED, prepared, attempt=attempt, status=status, elapsed=elapsed)
+            if status in RETRY_STATUS and attempt < self.max_retries:
                 header = response.headers.get("Retry-After", "")
                 after = float(header) if header.replace(".", "", 1).isdigit() else None
-                await asyncio.sleep(self.retry_delay(attempt, after))
+                delay = self.retry_delay(attempt, after)
+                self.emit(RETRY_SCHEDULED, prepared, attempt=attempt, status=status, delay=delay)
+                await asyncio.sleep(delay)
                 continue
-            return self.to_response(response)
+            return response
         raise last_error or TransportError("request failed")  # pragma: no cover
 
-    async def stream(self, spec: Spec) -> AsyncIterator[dict[str, Any]]:
-        """Send a streaming spec and yield one dict per NDJSON line."""
-        prepared = self.prepare(spec)
-        kwargs = self._kwargs(prepared)
+    async def _run_item(self, index: int, item: BatchItem) -> BatchResult:
+        try:
+            if isinstance(item, Spec):
+                return BatchResult(index, item, result=await self.send(self.batch_spec(item)))
+            return BatchResult(index, item, result=await item(self))
+        except OnypheError as exc:
+            return BatchResult(index, item, error=exc)
+
+    async def send_many(
+        self, items: Iterable[BatchItem], *, workers: int = 8, ordered: bool = False
+    ) -> AsyncIterator[BatchResult]:
+        """Run a batch of calls as at most ``workers`` concurrent tasks.
+
+        :param items: specs, or coroutine functions taking the client, such as
+            ``lambda api: api.summary_ip(ip)``
+        :param ordered: yield in input order rather than as calls complete
+
+        Errors are captured per item, and ``items`` is consumed lazily, exactly
+        like :meth:`pyonyphe.client.Onyphe.send_many`.
+        """
+        limit = max(1, workers)
+        source = enumerate(items)
+        in_flight: dict[asyncio.Task[BatchResult], int] = {}
+        finished: dict[int, BatchResult] = {}
+        expected = 0
+
+        def refill() -> None:
+            while len(in_flight) + len(finished) < limit * 2 and len(in_flight) < limit:
+                entry = next(source, None)
+                if entry is None:
+                    return
+                in_flight[asyncio.create_task(self._run_item(*entry))] = entry[0]
+
         try:
-            async with self._client.stream(prepared.method, prepared.url, **kwargs) as response:
-                if response.status_code >= 400:
-                    await response.aread()
-                    self.raise_for_status(response, self._decode(response))
-                async for line in response.aiter_lines():
-                    item = self.parse_ndjson_line(line)
-                    if item is not None:
-                        yield item
-        except httpx.HTTPError as exc:
-            raise TransportError(f"unable to reach ONYPHE: {exc}") from exc
+            refill()
+            while in_flight or finished:
+                if in_flight:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        del in_flight[task]
+                        result = task.result()
+                        if ordered:
+                            finished[result.index] = result
+                        else:
+                            yield result
+                while expected in finished:
+                    yield finished.pop(expected)
+                    expected += 1
+                refill()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    def stream(self, spec: Spec, *, project: Projection | None = None) -> AsyncStreamHandle:
+        """Send a streaming spec; the handle yields one dict per NDJSON line."""
+        return self._stream(spec, project=project)
+
+    def _stream(
+        self,
+        spec: Spec,
+        *,
+        gate: AbstractAsyncContextManager[Any] | None = None,
+        project: Projection | None = None,
+    ) -> AsyncStreamHandle:
+        prepared = self.prepare(spec)
+        return AsyncStreamHandle(
+            self, self._client, prepared, self._kwargs(prepared), gate=gate, project=project
+        )
 
     async def request(
         self,
@@ -150,6 +258,7 @@ class AsyncOnyphe(BaseClient):
         max_pages: int | None = None,
         trackquery: bool = False,
         calculated: bool = False,
+        project: Projection | None = None,
     ) -> AsyncIterator[dict[str, Any]]:
         """Iterate over every result of a query, walking the pages for you.
 
@@ -167,7 +276,7 @@ class AsyncOnyphe(BaseClient):
             if not response.results:
                 return
             for hit in response.results:
-                yield hit
+                yield hit if project is None else project(hit)
                 fetched += 1
                 if max_results is not None and fetched >= max_results:
                     return
@@ -180,10 +289,76 @@ class AsyncOnyphe(BaseClient):
             page += 1
 
     def export(
-        self, query: str, *, trackquery: bool = False, calculated: bool = False
+        self,
+        query: str,
+        *,
+        trackquery: bool = False,
+        calculated: bool = False,
+        project: Projection | None = None,
+    ) -> AsyncStreamHandle:
+        """Stream every document matching an OQL query (Eagle View and above).
+
+        :param project: keep, drop or truncate fields of each document as it
+            is decoded; see :class:`~pyonyphe.fields.Projection`
+        """
+        spec = specs.export(query, trackquery=trackquery, calculated=calculated)
+        return self.stream(spec, project=project)
+
+    async def count(self, query: str) -> int:
+        """Number of documents matching ``query``, from a one-result search."""
+        return (await self.search(query, size=1)).total
+
+    async def partition(
+        self,
+        query: str,
+        dimensions: Sequence[Dimension | Window],
+        *,
+        target: int = SEARCH_MAX_RESULTS,
+        strict: bool = False,
+    ) -> list[str]:
+        """Split ``query`` into disjoint sub-queries of at most ``target`` documents."""
+        return await aplan(self.count, query, dimensions, target=target, strict=strict)
+
+    async def export_partitioned(
+        self,
+        query: str,
+        dimensions: Sequence[Dimension | Window],
+        *,
+        target: int = SEARCH_MAX_RESULTS,
+        workers: int = 4,
+        use_export: bool = True,
+        size: int = 100,
+        trackquery: bool = False,
+        calculated: bool = False,
+        project: Projection | None = None,
     ) -> AsyncIterator[dict[str, Any]]:
-        """Stream every document matching an OQL query (Eagle View and above)."""
-        return self.stream(specs.export(query, trackquery=trackquery, calculated=calculated))
+        """Fetch a large result set as concurrent, disjoint slices.
+
+        See :meth:`pyonyphe.client.Onyphe.export_partitioned`.
+        """
+        check_target(target, use_export)
+        queries = await self.partition(query, dimensions, target=target, strict=not use_export)
+        if use_export:
+            sources = [
+                partial(
+                    self.export, sub, trackquery=trackquery, calculated=calculated, project=project
+                )
+                for sub in queries
+            ]
+        else:
+            sources = [
+                partial(
+                    self.search_iter,
+                    sub,
+                    size=size,
+                    trackquery=trackquery,
+                    calculated=calculated,
+                    project=project,
+                )
+                for sub in queries
+            ]
+        async for document in amerge(sources, workers=workers):
+            yield document
 
     async def summary(self, kind: SummaryKind, value: str) -> Response:
         """Summary API for an IP, a domain or a hostname."""
@@ -223,25 +398,29 @@ class AsyncOnyphe(BaseClient):
 
     # -- bulk APIs ----------------------------------------------------------
 
-    def bulk_summary(self, kind: SummaryKind, source: BulkSource) -> AsyncIterator[dict[str, Any]]:
+    def bulk_summary(
+        self, kind: SummaryKind, source: BulkSource, *, project: Projection | None = None
+    ) -> AsyncStreamHandle:
         """Bulk Summary API."""
-        return self.stream(specs.bulk_summary(kind, source))
+        return self.stream(specs.bulk_summary(kind, source), project=project)
 
     def bulk_simple(
-        self, category: BulkSimpleCategory, source: BulkSource
-    ) -> AsyncIterator[dict[str, Any]]:
+        self, category: BulkSimpleCategory, source: BulkSource, *, project: Projection | None = None
+    ) -> AsyncStreamHandle:
         """Bulk Simple API over a list of IP addresses."""
-        return self.stream(specs.bulk_simple(category, source))
+        return self.stream(specs.bulk_simple(category, source), project=project)
 
     def bulk_simple_best(
-        self, category: BestCategory, source: BulkSource
-    ) -> AsyncIterator[dict[str, Any]]:
+        self, category: BestCategory, source: BulkSource, *, project: Projection | None = None
+    ) -> AsyncStreamHandle:
         """Bulk Simple Best API over a list of IP addresses."""
-        return self.stream(specs.bulk_simple_best(category, source))
+        return self.stream(specs.bulk_simple_best(category, source), project=project)
 
-    def discovery(self, category: str, source: BulkSource) -> AsyncIterator[dict[str, Any]]:
+    def discovery(
+        self, category: str, source: BulkSource, *, project: Projection | None = None
+    ) -> AsyncStreamHandle:
         """Discovery API: several OQL queries at once (Griffin View only)."""
-        return self.stream(specs.discovery(category, source))
+        return self.stream(specs.discovery(category, source), project=project)
 
     # -- alerts -------------------------------------------------------------
 
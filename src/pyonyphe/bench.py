@@ -0,0 +1,296 @@
+"""Load generation against the ONYPHE API or a local stand-in.
+
+Drives a weighted mix of endpoints through one :class:`~pyonyphe.AsyncOnyphe`,
+either closed-loop -- ``concurrency`` workers, each sending its next call as
+soon as the previous one returns -- or open-loop at a target ``rate``, capped
+at ``concurrency`` calls in flight:
+
+>>> mix = parse_mix("summary/ip=3,search=1")
+>>> async with AsyncOnyphe(base_url=url) as api:           # doctest: +SKIP
+...     report = await run(api, mix, concurrency=64, requests=10_000)
+>>> report.throughput                                       # doctest: +SKIP
+
+Every call spends real credits against the real API: point ``base_url`` at
+:mod:`pyonyphe.fake_server` for anything but a short run.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any, cast
+
+from ._specs import BEST_CATEGORIES, SIMPLE_CATEGORIES, BestCategory, SimpleCategory
+from .async_client import AsyncOnyphe
+from .errors import OnypheError, ParamError
+from .hooks import RETRY_SCHEDULED, Event
+
+__all__ = ["OPERATIONS", "BenchReport", "EndpointReport", "Targets", "parse_mix", "run"]
+
+
+@dataclass(frozen=True, slots=True)
+class Targets:
+    """The values the benchmarked calls are made on.
+
+    :param ip: for ``summary/ip`` and the ``simple`` categories
+    :param domain: for ``summary/domain``
+    :param hostname: for ``summary/hostname``
+    :param query: for ``search``
+    :param size: results per ``search`` page
+    """
+
+    ip: str = "8.8.8.8"
+    domain: str = "example.com"
+    hostname: str = "www.example.com"
+    query: str = "category:datascan"
+    size: int = 10
+
+
+Operation = Callable[[AsyncOnyphe, Targets], Awaitable[Any]]
+
+#: The endpoints a mix can name; ``simple/<category>`` and
+#: ``simple/<category>/best`` are accepted for every category too.
+OPERATIONS: dict[str, Operation] = {
+    "user": lambda api, t: api.user(),
+    "search": lambda api, t: api.search(t.query, size=t.size),
+    "summary/ip": lambda api, t: api.summary_ip(t.ip),
+    "summary/domain": lambda api, t: api.summary_domain(t.domain),
+    "summary/hostname": lambda api, t: api.summary_hostname(t.hostname),
+}
+
+
+def _operation(name: str) -> Operation:
+    if name in OPERATIONS:
+        return OPERATIONS[name]
+    parts = name.split("/")
+    if parts[0] == "simple" and len(parts) == 2 and parts[1] in SIMPLE_CATEGORIES:
+        category = cast(SimpleCategory, parts[1])
+        return lambda api, t: api.simple(category, t.ip)
+    if parts[0] == "simple" and parts[2:] == ["best"] and parts[1] in BEST_CATEGORIES:
+        best = cast(BestCategory, parts[1])
+        return lambda api, t: api.simple_best(best, t.ip)
+    known = ", ".join([*OPERATIONS, "simple/<category>", "simple/<category>/best"])
+    raise ParamError(f"unknown endpoint {name!r}, expected one of {known}")
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """Parse ``name[=weight],...`` into endpoint weights; a weight defaults to 1.
+
+    :raises ParamError: on an unknown endpoint or a weight that is not positive
+    """
+    mix: dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = item.partition("=")
+        _operation(name)
+        try:
+            value = float(weight) if weight else 1.0
+        except ValueError:
+            value = -1.0
+        if value <= 0:
+            raise ParamError(f"bad weight for {name!r}: {weight!r}")
+        mix[name] = mix.get(name, 0.0) + value
+    if not mix:
+        raise ParamError("an empty endpoint mix")
+    return mix
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+@dataclass(slots=True)
+class EndpointReport:
+    """Results of one endpoint of the mix.
+
+    :param latencies: seconds per call, retries included
+    :param errors: failed calls, by exception class
+    """
+
+    latencies: list[float] = field(default_factory=list)
+    errors: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def calls(self) -> int:
+        return len(self.latencies)
+
+    def as_dict(self) -> dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": sum(self.errors.values()),
+            "p50": _percentile(ordered, 0.5),
+            "p95": _percentile(ordered, 0.95),
+            "p99": _percentile(ordered, 0.99),
+        }
+
+
+@dataclass(slots=True)
+class BenchReport:
+    """Everything measured by one :func:`run`.
+
+    :param elapsed: wall-clock seconds of the whole run
+    :param cpu: CPU seconds the process spent meanwhile, every thread included
+    :param endpoints: per-endpoint results
+    :param retries: retries scheduled, by HTTP status or ``transport``
+    """
+
+    concurrency: int
+    rate: float | None
+    elapsed: float = 0.0
+    cpu: float = 0.0
+    endpoints: dict[str, EndpointReport] = field(default_factory=dict)
+    retries: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def calls(self) -> int:
+        return sum(report.calls for report in self.endpoints.values())
+
+    @property
+    def errors(self) -> Counter[str]:
+        total: Counter[str] = Counter()
+        for report in self.endpoints.values():
+            total.update(report.errors)
+        return total
+
+    @property
+    def throughput(self) -> float:
+        """Calls per second, failed ones included."""
+        return self.calls / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def cpu_percent(self) -> float:
+        """CPU time over wall time; above 100 when several cores were busy."""
+        return 100 * self.cpu / self.elapsed if self.elapsed else 0.0
+
+    def latency(self, q: float) -> float:
+        """The ``q`` percentile of every call's latency."""
+        ordered = sorted(value for r in self.endpoints.values() for value in r.latencies)
+        return _percentile(ordered, q)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Plain-data view, ready for ``json.dumps``."""
+        return {
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "calls": self.calls,
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+            "latency": {
+                "p50": self.latency(0.5),
+                "p95": self.latency(0.95),
+                "p99": self.latency(0.99),
+                "max": self.latency(1.0),
+            },
+            "errors": dict(self.errors),
+            "retries": dict(self.retries),
+            "cpu_seconds": self.cpu,
+            "cpu_percent": self.cpu_percent,
+            "endpoints": {name: report.as_dict() for name, report in self.endpoints.items()},
+        }
+
+
+async def run(
+    client: AsyncOnyphe,
+    mix: dict[str, float],
+    *,
+    concurrency: int = 8,
+    rate: float | None = None,
+    requests: int | None = None,
+    duration: float | None = None,
+    targets: Targets | None = None,
+    seed: int | None = None,
+) -> BenchReport:
+    """Send the ``mix`` until ``requests`` calls were made or ``duration`` elapsed.
+
+    :param concurrency: calls in flight at most
+    :param rate: calls started per second; as fast as ``concurrency`` allows when ``None``
+    :param seed: seed of the endpoint draw, for a reproducible sequence
+    :raises ParamError: when neither ``requests`` nor ``duration`` bounds the
+        run, or for a ``concurrency`` below 1 or a ``rate`` that is not positive
+    """
+    if requests is None and duration is None:
+        raise ParamError("bound the run with requests, duration, or both")
+    if concurrency < 1:
+        raise ParamError("concurrency must be at least 1")
+    if rate is not None and not rate > 0:
+        raise ParamError("rate must be positive")
+    targets = targets or Targets()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    operations = {name: _operation(name) for name in names}
+    rng = random.Random(seed)  # noqa: S311 - picks endpoints, not secrets
+    report = BenchReport(concurrency, rate)
+    for name in names:
+        report.endpoints[name] = EndpointReport()
+
+    def count_retry(event: Event) -> None:
+        if event.name == RETRY_SCHEDULED:
+            report.retries[str(event.status) if event.status is not None else "transport"] += 1
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + duration if duration is not None else math.inf
+    issued = 0
+
+    def claim() -> str | None:
+        """The next endpoint to call, or ``None`` once the run is over."""
+        nonlocal issued
+        if (requests is not None and issued >= requests) or loop.time() >= deadline:
+            return None
+        issued += 1
+        return rng.choices(names, weights)[0]
+
+    async def call(name: str) -> None:
+        endpoint = report.endpoints[name]
+        sent = time.perf_counter()
+        try:
+            await operations[name](client, targets)
+        except OnypheError as exc:
+            endpoint.errors[type(exc).__name__] += 1
+        endpoint.latencies.append(time.perf_counter() - sent)
+
+    async def worker() -> None:
+        while (name := claim()) is not None:
+            await call(name)
+
+    async def paced() -> None:
+        gate = asyncio.Semaphore(concurrency)
+        pending: set[asyncio.Task[None]] = set()
+
+        async def gated(name: str) -> None:
+            try:
+                await call(name)
+            finally:
+                gate.release()
+
+        tick = started
+        while (name := claim()) is not None:
+            await gate.acquire()
+            task = asyncio.create_task(gated(name))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            tick += 1 / cast(float, rate)
+            await asyncio.sleep(max(0.0, tick - loop.time()))
+        if pending:
+            await asyncio.gather(*pending)
+
+    client.add_hook(count_retry)
+    cpu = time.process_time()
+    try:
+        if rate:
+            await paced()
+        else:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        client.remove_hook(count_retry)
+    report.elapsed = loop.time() - started
+    report.cpu = time.process_time() - cpu
+    return report
@@ -0,0 +1,353 @@
+"""Record real ONYPHE exchanges once, replay them offline.
+
+Synthetic data never has the shape of the real thing: 16 KB datascan ``data``
+fields, deep ``summary`` documents, the exact pace of an export. A
+:class:`RecordingTransport` captures what the API really sent, streamed
+bodies and their timing included, into a gzip-compressed cassette:
+
+>>> with Onyphe(transport=RecordingTransport("summary.cassette")) as api:  # doctest: +SKIP
+...     api.summary_ip("8.8.8.8")
+
+A :class:`ReplayTransport` then serves it back, as fast as possible or at the
+recorded pace, with no network and no credits spent:
+
+>>> replay = ReplayTransport("summary.cassette", speed=1.0)               # doctest: +SKIP
+>>> with Onyphe("unused", transport=replay) as api:                         # doctest: +SKIP
+...     api.summary_ip("8.8.8.8")
+
+Both work with either client. Request headers are never stored, and the
+``k`` query parameter, in which the Unrated endpoint also sends the API key,
+is dropped from recorded URLs and ignored when matching a request: neither
+the API key nor the Unrated email ends up in a cassette.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Callable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import cast
+
+import httpx
+
+__all__ = ["CassetteError", "Interaction", "RecordingTransport", "ReplayTransport"]
+
+VERSION = 1
+#: Response headers never written to a cassette.
+DROPPED_HEADERS = frozenset(("set-cookie", "date"))
+#: Query parameters never written to a cassette, nor matched on: the API key.
+DROPPED_PARAMS = ("k",)
+
+_Done = Callable[["Interaction"], None]
+_Delay = Callable[[float], float]
+
+
+class CassetteError(LookupError):
+    """A request the cassette holds no answer for, or an unreadable cassette."""
+
+
+@dataclass(slots=True)
+class Interaction:
+    """One recorded request and its response.
+
+    :param method: HTTP method
+    :param url: full URL, query string included but for :data:`DROPPED_PARAMS`
+    :param body: request body
+    :param status: response status
+    :param headers: response headers, in order
+    :param latency: seconds from sending the request to receiving the headers
+    :param chunks: ``(offset, data)`` pairs, the offset in seconds after the headers
+    """
+
+    method: str
+    url: str
+    body: bytes = b""
+    status: int = 200
+    headers: list[tuple[str, str]] = field(default_factory=list)
+    latency: float = 0.0
+    chunks: list[tuple[float, bytes]] = field(default_factory=list)
+
+    @property
+    def key(self) -> tuple[str, str, bytes]:
+        return (self.method, self.url, self.body)
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {
+                "method": self.method,
+                "url": self.url,
+                "body": _encode(self.body),
+                "status": self.status,
+                "headers": self.headers,
+                "latency": round(self.latency, 6),
+                "chunks": [[round(offset, 6), _encode(data)] for offset, data in self.chunks],
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def loads(cls, line: str) -> Interaction:
+        raw = json.loads(line)
+        return cls(
+            method=raw["method"],
+            url=raw["url"],
+            body=_decode(raw["body"]),
+            status=raw["status"],
+            headers=[(name, value) for name, value in raw["headers"]],
+            latency=raw["latency"],
+            chunks=[(offset, _decode(data)) for offset, data in raw["chunks"]],
+        )
+
+
+def _encode(data: bytes) -> str | dict[str, str]:
+    # NDJSON and JSON bodies stay readable text; anything else -- a gzip
+    # content-encoding, for one -- goes through base64.
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(data).decode("ascii")}
+
+
+def _decode(data: str | dict[str, str]) -> bytes:
+    if isinstance(data, dict):
+        return base64.b64decode(data["base64"])
+    return data.encode("utf-8")
+
+
+def _request_url(request: httpx.Request) -> str:
+    url = request.url
+    for name in DROPPED_PARAMS:
+        url = url.copy_remove_param(name)
+    return str(url)
+
+
+def _request_body(request: httpx.Request) -> bytes:
+    # The client always sends a buffered body, never a stream.
+    return request.read()
+
+
+# -- recording ---------------------------------------------------------------
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Forward every request, writing each exchange to ``path`` as it completes.
+
+    :param path: the cassette to write; an existing one is overwritten
+    :param transport: where requests really go; a plain ``httpx`` transport
+        of the right flavour by default
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        transport: httpx.BaseTransport | httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self._sync = transport if isinstance(transport, httpx.BaseTransport) else None
+        self._async = transport if isinstance(transport, httpx.AsyncBaseTransport) else None
+        self._file = gzip.open(self.path, "wt", encoding="utf-8")  # noqa: SIM115
+        self._file.write(json.dumps({"version": VERSION}) + "\n")
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def _write(self, interaction: Interaction) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(interaction.dumps() + "\n")
+                self.recorded += 1
+
+    def _start(self, request: httpx.Request, response: httpx.Response, sent: float) -> Interaction:
+        headers = [
+            (name, value)
+            for name, value in response.headers.multi_items()
+            if name.lower() not in DROPPED_HEADERS
+        ]
+        return Interaction(
+            method=request.method,
+            url=_request_url(request),
+            body=_request_body(request),
+            status=response.status_code,
+            headers=headers,
+            latency=time.perf_counter() - sent,
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._sync is None:
+            self._sync = httpx.HTTPTransport()
+        sent = time.perf_counter()
+        response = self._sync.handle_request(request)
+        interaction = self._start(request, response, sent)
+        inner = cast(httpx.SyncByteStream, response.stream)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(inner, interaction, self._write),
+            extensions=response.extensions,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._async is None:
+            self._async = httpx.AsyncHTTPTransport()
+        sent = time.perf_counter()
+        response = await self._async.handle_async_request(request)
+        interaction = self._start(request, response, sent)
+        inner = cast(httpx.AsyncByteStream, response.stream)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncRecordingStream(inner, interaction, self._write),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        """Close the real transport and finish the cassette."""
+        if self._sync is not None:
+            self._sync.close()
+        with self._lock:
+            self._file.close()
+
+    async def aclose(self) -> None:
+        """Close the real transport and finish the cassette."""
+        if self._async is not None:
+            await self._async.aclose()
+        with self._lock:
+            self._file.close()
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, inner: httpx.SyncByteStream, interaction: Interaction, done: _Done) -> None:
+        self._inner = inner
+        self._interaction = interaction
+        self._done = done
+        self._origin = time.perf_counter()
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._inner:
+            self._interaction.chunks.append((time.perf_counter() - self._origin, chunk))
+            yield chunk
+
+    def close(self) -> None:
+        # Written on close, so an exchange cut short is recorded as far as it went.
+        self._inner.close()
+        self._done(self._interaction)
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, inner: httpx.AsyncByteStream, interaction: Interaction, done: _Done) -> None:
+        self._inner = inner
+        self._interaction = interaction
+        self._done = done
+        self._origin = time.perf_counter()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._inner:
+            self._interaction.chunks.append((time.perf_counter() - self._origin, chunk))
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+        self._done(self._interaction)
+
+
+# -- replay ------------------------------------------------------------------
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Serve the exchanges of a cassette back, without touching the network.
+
+    Requests are matched on method, URL and body. A request recorded several
+    times gets its answers in recording order, the last one repeating once
+    they run out.
+
+    :param path: the cassette to read
+    :param speed: ``None`` to answer immediately, ``1.0`` for the recorded
+        timing, ``10.0`` for ten times faster
+    :raises CassetteError: on a request the cassette has no answer for
+    """
+
+    def __init__(self, path: str | Path, *, speed: float | None = None) -> None:
+        self.path = Path(path)
+        self.speed = speed
+        self.interactions = _load(self.path)
+        self._queues: dict[tuple[str, str, bytes], deque[Interaction]] = defaultdict(deque)
+        for interaction in self.interactions:
+            self._queues[interaction.key].append(interaction)
+        self._lock = threading.Lock()
+        self.replayed = 0
+
+    def _next(self, request: httpx.Request) -> Interaction:
+        url = _request_url(request)
+        key = (request.method, url, _request_body(request))
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                raise CassetteError(f"no recorded answer for {request.method} {url}")
+            interaction = queue.popleft() if len(queue) > 1 else queue[0]
+            self.replayed += 1
+        return interaction
+
+    def _delay(self, seconds: float) -> float:
+        return seconds / self.speed if self.speed else 0.0
+
+    def _response(
+        self, interaction: Interaction, stream: httpx.SyncByteStream | httpx.AsyncByteStream
+    ) -> httpx.Response:
+        return httpx.Response(interaction.status, headers=interaction.headers, stream=stream)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self._next(request)
+        if delay := self._delay(interaction.latency):
+            time.sleep(delay)
+        return self._response(interaction, _ReplayStream(interaction.chunks, self._delay))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self._next(request)
+        if delay := self._delay(interaction.latency):
+            await asyncio.sleep(delay)
+        return self._response(interaction, _AsyncReplayStream(interaction.chunks, self._delay))
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, chunks: list[tuple[float, bytes]], delay: _Delay) -> None:
+        self._chunks = chunks
+        self._delay = delay
+
+    def __iter__(self) -> Iterator[bytes]:
+        origin = time.perf_counter()
+        for offset, data in self._chunks:
+            wait = self._delay(offset) - (time.perf_counter() - origin)
+            if wait > 0:
+                time.sleep(wait)
+            yield data
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[tuple[float, bytes]], delay: _Delay) -> None:
+        self._chunks = chunks
+        self._delay = delay
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        origin = time.perf_counter()
+        for offset, data in self._chunks:
+            wait = self._delay(offset) - (time.perf_counter() - origin)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield data
+
+
+def _load(path: Path) -> list[Interaction]:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            header = json.loads(handle.readline() or "{}")
+            if header.get("version") != VERSION:
+                raise CassetteError(f"{path}: not a version {VERSION} cassette")
+            return [Interaction.loads(line) for line in handle if line.strip()]
+    except (OSError, ValueError, KeyError) as exc:
+        raise CassetteError(f"{path}: unreadable cassette: {exc}") from exc
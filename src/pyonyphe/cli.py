@@ -6,23 +6,62 @@ official Perl ``onyphe`` CLI shipped by ONYPHE.
 
 # NOTE: no `from __future__ import annotations` here -- Typer resolves the
 # annotations at runtime to build the parser.
+#
+# Startup matters for a command run in shell pipelines: the client (httpx,
+# pydantic), rich and the benchmark and profiling machinery are imported by
+# the code paths that need them, not here.
 
+import inspect
 import json
+import re
 import sys
-from collections.abc import Iterable, Iterator
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import nullcontext
+from dataclasses import dataclass, fields
+from functools import cache, wraps
 from pathlib import Path
-from typing import Annotated, Any, cast
+from typing import TYPE_CHECKING, Annotated, Any, cast
 
 import typer
 from dotenv import find_dotenv, load_dotenv
-from rich.console import Console
-from rich.table import Table
 
-from . import __version__
-from ._specs import BestCategory, BulkSimpleCategory, SimpleCategory, SummaryKind
-from .client import Onyphe
+from ._specs import (
+    SEARCH_MAX_RESULTS,
+    BestCategory,
+    BulkSimpleCategory,
+    SimpleCategory,
+    SummaryKind,
+)
 from .config import load_settings
-from .errors import OnypheError
+from .errors import OnypheError, ParamError
+from .fields import Projection, getter, parse_fields
+from .progress import Progress
+from .sinks import (
+    COMPRESSIONS,
+    DEFAULT_LEVELS,
+    Aggregator,
+    BackgroundWriter,
+    BinaryStream,
+    DelimitedSink,
+    NDJSONSink,
+    ShardedSink,
+    Sink,
+    TeeSink,
+    batched,
+    compress,
+    copy,
+    open_output,
+)
+
+if TYPE_CHECKING:
+    import cProfile
+
+    from rich.console import Console
+
+    from .bench import BenchReport
+    from .client import Onyphe
+    from .profiling import Profile
 
 app = typer.Typer(
     name="pyonyphe",
@@ -32,11 +71,54 @@ app = typer.Typer(
 )
 alert_app = typer.Typer(help="Manage ONYPHE alerts.", no_args_is_help=True)
 bulk_app = typer.Typer(help="Bulk endpoints, fed from a file of assets.", no_args_is_help=True)
+index_app = typer.Typer(
+    help="Index NDJSON files by IP, domain or hash, and look documents up.", no_args_is_help=True
+)
 app.add_typer(alert_app, name="alert")
 app.add_typer(bulk_app, name="bulk")
+app.add_typer(index_app, name="index")
+
+
+@cache
+def console(stderr: bool = False) -> "Console":
+    """The rich console for tables; rich is only imported when one is drawn."""
+    from rich.console import Console
 
-out = Console()
-err = Console(stderr=True)
+    return Console(stderr=stderr)
+
+
+def fail(message: object) -> None:
+    """Report an error on stderr."""
+    typer.secho(str(message), err=True, fg="red")
+
+
+def note(message: str, **style: Any) -> None:
+    """Report something on stderr, dimmed unless told otherwise."""
+    typer.secho(message, err=True, **(style or {"dim": True}))
+
+
+#: Formats written by :mod:`pyonyphe.arrow`, with the ``arrow`` extra.
+ARROW_FORMATS = ("parquet", "arrow")
+#: Delimited text formats, by their cell delimiter.
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+#: Local databases, written by :mod:`pyonyphe.store`.
+STORE_FORMATS = ("sqlite", "duckdb")
+#: Formats ``--tee`` writes, as in ``--tee csv:hosts.csv``.
+TEE_FORMATS = ("ndjson", *DELIMITERS, *ARROW_FORMATS, *STORE_FORMATS)
+#: Formats told by file suffix, past any compression one.
+SUFFIX_FORMATS = {
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".arrows": "arrow",
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+    ".duckdb": "duckdb",
+}
 
 #: Columns shown by ``--format table``, in order, when present in a result.
 TABLE_COLUMNS = (
@@ -60,67 +142,462 @@ class State:
     base_url: str | None = None
     unrated_email: str | None = None
     timeout: float = 30.0
+    profile: "Profile | None" = None
+    progress: bool | None = None
+    compression: str | None = "auto"
+    level: int | None = None
+    compress_threads: int = 0
 
 
 state = State()
 
+#: ``--format``, ``--partition-by``, ``--fields`` and ``--list-sep`` of the
+#: streaming commands.
+FormatOption = typer.Option(
+    "--format",
+    "-f",
+    help="ndjson, csv, tsv, parquet (to a directory), arrow, sqlite or duckdb (to a database).",
+)
+PartitionOption = typer.Option(
+    "--partition-by", help="With parquet: one sub-directory per category or per date."
+)
+FieldsOption = typer.Option(
+    help="Columns of csv, tsv and table output: dotted paths, comma-separated."
+)
+ListSepOption = typer.Option(help="Joins the items of a list in a csv or tsv cell.")
+ShardByOption = typer.Option(
+    help="Spread documents over files by this field, such as @category, country or port."
+)
+ShardDocumentsOption = typer.Option(help="Start a new file every N documents.")
+ShardSizeOption = typer.Option(help="Start a new file every SIZE bytes, such as 512M.")
+KeyOption = typer.Option(
+    help="With sqlite or duckdb: fields identifying a document, replaced when stored again; "
+    "by default those of its category, such as ip,port for datascan."
+)
+#: ``--keep``, ``--drop`` and ``--max-length``: the projection of each document.
+KeepOption = typer.Option(
+    help="Keep only these fields of each document, as it arrives: dotted paths, comma-separated."
+)
+DropOption = typer.Option(help="Remove these fields of each document, as it arrives.")
+MaxLengthOption = typer.Option(help="Cut strings longer than N characters down to N.")
+TeeOption = typer.Option(
+    help="Also write to FORMAT:PATH, or to a PATH whose suffix names the format, such as "
+    "hosts.csv, out.ndjson.gz or onyphe.db; ndjson:- for stdout. Repeatable."
+)
+SummaryOption = typer.Option(
+    help="Count the values of these fields, comma-separated, and show the top ones on stderr."
+)
+
+
+@dataclass(frozen=True)
+class StreamOutput:
+    """The output options every streaming command takes, declared once.
+
+    :func:`streaming` adds them to a command and hands them over as one
+    ``out`` argument.
+    """
+
+    fmt: Annotated[str, FormatOption] = "ndjson"
+    output: Annotated[Path | None, typer.Option("--output", "-o", help="Write to a file.")] = None
+    partition_by: Annotated[str | None, PartitionOption] = None
+    fields: Annotated[str | None, FieldsOption] = None
+    list_sep: Annotated[str, ListSepOption] = "|"
+    key: Annotated[str | None, KeyOption] = None
+    keep: Annotated[str | None, KeepOption] = None
+    drop: Annotated[str | None, DropOption] = None
+    max_length: Annotated[int | None, MaxLengthOption] = None
+    shard_by: Annotated[str | None, ShardByOption] = None
+    shard_documents: Annotated[int | None, ShardDocumentsOption] = None
+    shard_size: Annotated[str | None, ShardSizeOption] = None
+    tee: Annotated[list[str] | None, TeeOption] = None
+    summary: Annotated[str | None, SummaryOption] = None
+
+    def projection(self) -> Projection | None:
+        """The projection ``--keep``, ``--drop`` and ``--max-length`` ask for, if any."""
+        return projection(self.keep, self.drop, self.max_length)
+
+    def emit(self, rows: Iterable[dict[str, Any]]) -> int:
+        """Write ``rows`` where and how these options say; see :func:`emit_rows`."""
+        return emit_rows(
+            rows,
+            self.fmt,
+            self.output,
+            partition_by=self.partition_by,
+            fields=self.fields,
+            list_sep=self.list_sep,
+            key=self.key,
+            shard_by=self.shard_by,
+            shard_documents=self.shard_documents,
+            shard_size=self.shard_size,
+            tee=self.tee or (),
+            summary=self.summary,
+        )
 
-def get_client() -> Onyphe:
+
+def streaming(command: Callable[..., None]) -> Callable[..., None]:
+    """Give ``command`` the options of :class:`StreamOutput`, passed as ``out``.
+
+    Typer builds the parser from the signature and the annotations, so the
+    wrapper advertises the command's own parameters followed by the options.
+    """
+    options = fields(StreamOutput)
+    own = [
+        parameter
+        for parameter in inspect.signature(command).parameters.values()
+        if parameter.name != "out"
+    ]
+    added = [
+        inspect.Parameter(
+            option.name,
+            inspect.Parameter.KEYWORD_ONLY,
+            default=option.default,
+            annotation=option.type,
+        )
+        for option in options
+    ]
+
+    @wraps(command)
+    def wrapper(*args: Any, **kwargs: Any) -> None:
+        out = StreamOutput(**{option.name: kwargs.pop(option.name) for option in options})
+        command(*args, out=out, **kwargs)
+
+    parameters = [*own, *added]
+    wrapper.__signature__ = inspect.Signature(parameters, return_annotation=None)  # type: ignore[attr-defined]
+    wrapper.__annotations__ = {p.name: p.annotation for p in parameters} | {"return": None}
+    return wrapper
+
+
+def get_client() -> "Onyphe":
     """Build a client from the global options, or exit with a clear message."""
+    from .client import Onyphe
+
+    profile = state.profile
     try:
         return Onyphe(
             state.api_key,
             base_url=state.base_url,
             unrated_email=state.unrated_email,
             timeout=state.timeout,
+            transport=profile.transport() if profile else None,
+            hooks=[profile] if profile else (),
+        )
+    except OnypheError as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+
+
+def projection(keep: str | None, drop: str | None, max_length: int | None) -> Projection | None:
+    """The projection ``--keep``, ``--drop`` and ``--max-length`` ask for, if any."""
+    if keep is None and drop is None and max_length is None:
+        return None
+    try:
+        return Projection(
+            parse_fields(keep) if keep is not None else None,
+            parse_fields(drop or ""),
+            max_length=max_length,
         )
     except OnypheError as exc:
-        err.print(f"[red]{exc}[/red]")
+        fail(exc)
         raise typer.Exit(code=2) from exc
 
 
-def _sink(output: Path | None) -> Any:
-    return output.open("w", encoding="utf-8") if output else sys.stdout
+def _open_output(output: Path | None) -> tuple[BinaryStream, bool]:
+    """Where results go, and whether that stream is ours to close.
+
+    A file is compressed as ``--compression`` says, by its suffix by default;
+    stdout only when a format is named.
+    """
+    try:
+        if output:
+            stream = open_output(
+                output,
+                compression=state.compression,
+                level=state.level,
+                threads=state.compress_threads,
+            )
+            return stream, True
+        sys.stdout.flush()
+        if state.compression == "auto":
+            return sys.stdout.buffer, False
+        stream = compress(
+            sys.stdout.buffer,
+            state.compression,
+            level=state.level,
+            threads=state.compress_threads,
+        )
+        return stream, state.compression is not None
+    except (OSError, OnypheError) as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+
+
+def _line_sink(
+    output: Path | None, threaded: bool, kind: type[NDJSONSink] = NDJSONSink, **options: Any
+) -> NDJSONSink:
+    stream, owned = _open_output(output)
+    if threaded:
+        stream, owned = BackgroundWriter(stream, owned=owned), True
+    return kind(stream, owned=owned, **options)
 
 
 def emit_ndjson(rows: Iterable[dict[str, Any]], output: Path | None) -> int:
-    """Write results as newline-delimited JSON. Returns the number of rows."""
-    handle = _sink(output)
+    """Write results as newline-delimited JSON. Returns the number of rows.
+
+    Writing happens on a thread of its own, so that a slow disk or pipe does
+    not hold up fetching; under ``--profile`` it does not, so that the phases
+    add up.
+    """
+    return _emit_lines(rows, _line_sink(output, threaded=state.profile is None))
+
+
+def emit_delimited(
+    rows: Iterable[dict[str, Any]],
+    fmt: str,
+    output: Path | None,
+    fields: list[str] | None = None,
+    list_sep: str = "|",
+) -> int:
+    """Write results as CSV or TSV, a row at a time. Returns the number of rows.
+
+    Columns are ``fields``, or the leaves of the first document; written as
+    NDJSON is, from a thread of its own.
+    """
+    sink = _delimited_sink(fmt, output, fields, list_sep, threaded=state.profile is None)
+    return _emit_lines(rows, sink)
+
+
+def _delimited_sink(
+    fmt: str, output: Path | None, fields: list[str] | None, list_sep: str, threaded: bool
+) -> DelimitedSink:
+    return cast(
+        DelimitedSink,
+        _line_sink(
+            output,
+            threaded,
+            kind=DelimitedSink,
+            fields=fields,
+            delimiter=DELIMITERS[fmt],
+            list_separator=list_sep,
+            on_dropped=_warn_dropped(),
+        ),
+    )
+
+
+def _warn_dropped() -> Callable[[str], None]:
+    """Note on stderr the first field left out of csv or tsv columns, once."""
+    warned = False
+
+    def warn(field: str) -> None:
+        nonlocal warned
+        if not warned:
+            warned = True
+            note(
+                f"{field} is not in the first document, so not a column: it is left out; "
+                "name the columns with --fields",
+                fg="yellow",
+            )
+
+    return warn
+
+
+def _sharded_sink(
+    fmt: str,
+    output: Path | None,
+    by: str | None,
+    limits: tuple[int | None, int | None],
+    fields: str | None = None,
+    list_sep: str = "|",
+) -> ShardedSink:
+    """Results over many files, listed in ``manifest.json``.
+
+    ``by`` routes documents to files by a field, ``limits`` rolls a file over
+    at a number of documents or of bytes. Files are compressed only when
+    ``--compression`` names a format: there is no single suffix to go by.
+    """
+    if output is None:
+        fail("sharded output is a directory: name it with --output")
+        raise typer.Exit(code=2)
+    if fmt != "ndjson" and fmt not in DELIMITERS:
+        fail("--shard-by, --shard-documents and --shard-size go with ndjson, csv or tsv")
+        raise typer.Exit(code=2)
+    options: dict[str, Any] = {}
+    if fmt in DELIMITERS:
+        options = {
+            "kind": DelimitedSink,
+            "suffix": f".{fmt}",
+            "fields": parse_fields(fields) if fields else None,
+            "delimiter": DELIMITERS[fmt],
+            "list_separator": list_sep,
+            # Each shard takes its columns from its own first document.
+            "on_dropped": _warn_dropped(),
+        }
+    try:
+        return ShardedSink(
+            output,
+            by=by,
+            max_documents=limits[0],
+            max_bytes=limits[1],
+            compression=None if state.compression == "auto" else state.compression,
+            level=state.level,
+            **options,
+        )
+    except (OSError, OnypheError) as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+
+
+def _bytes(size: str) -> int:
+    """Bytes in ``"500000"``, ``"64K"``, ``"512M"`` or ``"2G"``."""
+    match = re.fullmatch(r"\s*(\d+)\s*([KMGT]?)i?B?\s*", size, flags=re.IGNORECASE)
+    if match is None:
+        fail(f"invalid size {size!r}, expected a number of bytes such as 500000, 64K or 512M")
+        raise typer.Exit(code=2)
+    number, unit = int(match[1]), match[2].upper()
+    return number * 1024 ** ("KMGT".index(unit) + 1) if unit else number
+
+
+def _emit_lines(rows: Iterable[dict[str, Any]], sink: NDJSONSink) -> int:
+    try:
+        if state.profile is None:
+            return copy(rows, sink)
+        return _emit_ndjson_profiled(rows, sink, state.profile)
+    finally:
+        sink.close()
+
+
+def _emit_ndjson_profiled(
+    rows: Iterable[dict[str, Any]], sink: NDJSONSink, profile: "Profile"
+) -> int:
+    clock = time.perf_counter
+    serialize = write = 0.0
     count = 0
     try:
-        for row in rows:
-            handle.write(json.dumps(row, ensure_ascii=False) + "\n")
-            count += 1
+        for batch in batched(rows, 512):
+            started = clock()
+            data = sink.encode(batch)
+            encoded = clock()
+            sink.write_bytes(data)
+            written = clock()
+            serialize += encoded - started
+            write += written - encoded
+            count += len(batch)
+        started = clock()
+        sink.flush()
+        write += clock() - started
     finally:
-        if output:
-            handle.close()
+        profile.add("serialize", serialize)
+        profile.add("write", write)
+        profile.documents += count
+    return count
+
+
+def _arrow_sink(fmt: str, output: Path | None, partition_by: str | None = None) -> Sink:
+    """A Parquet dataset or an Arrow IPC stream.
+
+    Parquet is compressed with the codec named by ``--compression``, snappy
+    by default; an Arrow stream is compressed as NDJSON would be.
+    """
+    try:
+        from . import arrow
+    except ImportError as exc:
+        fail(f"--format {fmt} needs the arrow extra: pip install 'pyonyphe[arrow]'")
+        raise typer.Exit(code=2) from exc
+    try:
+        if fmt == "parquet":
+            if output is None:
+                fail("--format parquet writes a directory: name it with --output")
+                raise typer.Exit(code=2)
+            codec = "snappy" if state.compression == "auto" else state.compression or "none"
+            return arrow.ParquetSink(
+                output,
+                partition_by=cast(Any, partition_by),
+                compression=codec,
+                level=state.level,
+            )
+        stream, owned = _open_output(output)
+        return arrow.ArrowStreamSink(stream, owned=owned)
+    except (OSError, OnypheError) as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+
+
+def _store_sink(fmt: str, output: Path | None, key: str | None = None) -> Sink:
+    """A SQLite or DuckDB database.
+
+    Documents already in the database are replaced, matched on the ``key``
+    fields or, without, on their content.
+    """
+    if output is None:
+        fail(f"--format {fmt} writes a database: name it with --output")
+        raise typer.Exit(code=2)
+    from .store import DuckDBStore, SQLiteStore
+
+    kind = DuckDBStore if fmt == "duckdb" else SQLiteStore
+    try:
+        return kind(output, key=parse_fields(key) if key else None)
+    except (OSError, OnypheError) as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+
+
+def _emit_batches(rows: Iterable[dict[str, Any]], sink: Sink, size: int) -> int:
+    clock = time.perf_counter
+    write = 0.0
+    count = 0
+    try:
+        for batch in batched(rows, size):
+            started = clock()
+            sink.write_many(batch)
+            write += clock() - started
+            count += len(batch)
+    finally:
+        started = clock()
+        try:
+            sink.close()
+        finally:
+            if state.profile is not None:
+                state.profile.add("write", write + clock() - started)
+                state.profile.documents += count
     return count
 
 
 def emit_json(payload: Any, output: Path | None) -> None:
     """Write a single JSON document, pretty-printed."""
-    handle = _sink(output)
+    with _phase("serialize"):
+        data = (json.dumps(payload, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+    stream, owned = _open_output(output)
     try:
-        handle.write(json.dumps(payload, ensure_ascii=False, indent=2) + "\n")
+        with _phase("write"):
+            stream.write(data)
     finally:
-        if output:
-            handle.close()
+        if owned:
+            stream.close()
+        else:
+            stream.flush()
 
 
-def emit_table(rows: list[dict[str, Any]], title: str = "") -> None:
-    """Render results as a table, keeping only the columns that carry data."""
+def emit_table(
+    rows: list[dict[str, Any]], title: str = "", fields: list[str] | None = None
+) -> None:
+    """Render results as a table: ``fields``, or the usual columns that carry data."""
     if not rows:
-        out.print("[yellow]no result[/yellow]")
+        typer.secho("no result", fg="yellow")
         return
-    columns = [c for c in TABLE_COLUMNS if any(c in row for row in rows)]
-    if not columns:
-        columns = sorted({key for row in rows for key in row})[:8]
+    from rich.table import Table
+
+    if fields:
+        columns = fields
+    else:
+        columns = [c for c in TABLE_COLUMNS if any(c in row for row in rows)]
+        if not columns:
+            columns = sorted({key for row in rows for key in row})[:8]
+    getters = [getter(column) for column in columns]
     table = Table(title=title or None, header_style="bold")
     for column in columns:
         table.add_column(column, overflow="fold")
     for row in rows:
-        table.add_row(*[_cell(row.get(column)) for column in columns])
-    out.print(table)
+        table.add_row(*[_cell(get(row)) for get in getters])
+    console().print(table)
 
 
 def _cell(value: Any) -> str:
@@ -131,30 +608,240 @@ def _cell(value: Any) -> str:
     return str(value)
 
 
-def render(rows: list[dict[str, Any]], fmt: str, output: Path | None, title: str = "") -> None:
-    """Dispatch to the requested output format."""
+def render(
+    rows: list[dict[str, Any]],
+    fmt: str,
+    output: Path | None,
+    title: str = "",
+    **options: Any,
+) -> None:
+    """Dispatch to the requested output format; ``options`` are those of :func:`emit_rows`."""
     if fmt == "table":
-        emit_table(rows, title)
-    elif fmt == "ndjson":
-        emit_ndjson(rows, output)
-    else:
+        with _phase("write"):
+            fields = options.get("fields")
+            emit_table(rows, title, parse_fields(fields) if fields else None)
+    elif fmt == "json":
         emit_json(rows, output)
+    else:
+        emit_rows(rows, fmt, output, **options)
+        return
+    if state.profile is not None:
+        state.profile.documents += len(rows)
+
+
+def open_sink(
+    fmt: str,
+    output: Path | None,
+    *,
+    partition_by: str | None = None,
+    fields: str | None = None,
+    list_sep: str = "|",
+    key: str | None = None,
+    shard_by: str | None = None,
+    shard_documents: int | None = None,
+    shard_size: str | None = None,
+    threaded: bool = True,
+) -> Sink:
+    """The sink writing ``fmt`` to ``output`` (stdout when ``None``), or exit with a clear message.
+
+    ``threaded`` writes NDJSON, CSV and TSV from a thread of their own.
+    """
+    if partition_by is not None and fmt != "parquet":
+        fail("--partition-by goes with --format parquet")
+        raise typer.Exit(code=2)
+    if shard_by is not None or shard_documents is not None or shard_size is not None:
+        limits = (shard_documents, _bytes(shard_size) if shard_size else None)
+        return _sharded_sink(fmt, output, shard_by, limits, fields, list_sep)
+    if fmt == "ndjson":
+        return _line_sink(output, threaded)
+    if fmt in DELIMITERS:
+        columns = parse_fields(fields) if fields else None
+        return _delimited_sink(fmt, output, columns, list_sep, threaded)
+    if fmt in ARROW_FORMATS:
+        return _arrow_sink(fmt, output, partition_by)
+    if fmt in STORE_FORMATS:
+        return _store_sink(fmt, output, key)
+    fail(f"unknown format {fmt!r}, expected ndjson, csv, tsv, parquet, arrow, sqlite or duckdb")
+    raise typer.Exit(code=2)
+
+
+def emit_rows(
+    rows: Iterable[dict[str, Any]],
+    fmt: str,
+    output: Path | None,
+    *,
+    tee: Sequence[str] = (),
+    summary: str | None = None,
+    **options: Any,
+) -> int:
+    """Write rows as they come, in one of the streaming formats. Returns the number of rows.
 
+    ``tee`` also writes them to the outputs named by each ``FORMAT:PATH``
+    (see :func:`tee_target`), and ``summary`` counts the values of a few
+    fields, reported on stderr; ``options`` are those of :func:`open_sink`.
+    """
+    sink = open_sink(fmt, output, threaded=state.profile is None, **options)
+    if tee or summary:
+        return _emit_tee(rows, sink, output, tee, summary, options)
+    if isinstance(sink, NDJSONSink):
+        return _emit_lines(rows, sink)
+    # Whole batches rather than copy(): row groups, record batches and
+    # transactions stay large.
+    return _emit_batches(rows, sink, getattr(sink, "batch_rows", 4096))
 
-def run(rows: Iterator[dict[str, Any]], output: Path | None) -> None:
-    """Consume a streaming endpoint, reporting progress on stderr."""
-    count = emit_ndjson(rows, output)
-    err.print(f"[dim]{count} document(s)[/dim]")
+
+def tee_target(spec: str) -> tuple[str, Path | None]:
+    """The format and path of a ``--tee``: ``FORMAT:PATH``, or a path whose suffix says.
+
+    ``-`` is stdout: ``ndjson:-``. Exits on a path whose format cannot be told.
+    """
+    name, colon, path = spec.partition(":")
+    if colon and name in TEE_FORMATS:
+        return name, None if path == "-" else Path(path)
+    suffixes = [suffix.lower() for suffix in Path(spec).suffixes]
+    if suffixes and suffixes[-1] in COMPRESSIONS:
+        suffixes.pop()
+    fmt = SUFFIX_FORMATS.get(suffixes[-1]) if suffixes else None
+    if fmt is None:
+        fail(
+            f"cannot tell the format of --tee {spec!r}: write it as FORMAT:PATH, such as csv:{spec}"
+        )
+        raise typer.Exit(code=2)
+    return fmt, Path(spec)
+
+
+def _emit_tee(
+    rows: Iterable[dict[str, Any]],
+    sink: Sink,
+    output: Path | None,
+    tee: Sequence[str],
+    summary: str | None,
+    options: dict[str, Any],
+) -> int:
+    sinks = [sink]
+    try:
+        targets = [tee_target(spec) for spec in tee]
+        if sum(path is None for _, path in [("", output), *targets]) > 1:
+            fail("only one output can go to stdout")
+            raise typer.Exit(code=2)
+        # Each output writes as it would alone, but --partition-by and the
+        # --shard-* options are those of the main one.
+        shared = {name: options.get(name) for name in ("fields", "key")}
+        for fmt, path in targets:
+            sinks.append(open_sink(fmt, path, list_sep=options.get("list_sep", "|"), **shared))
+    except BaseException:
+        for opened in sinks:
+            opened.close()
+        raise
+    aggregator = Aggregator(parse_fields(summary)) if summary else None
+    if aggregator is not None:
+        sinks.append(aggregator)
+    tee_sink = TeeSink(sinks)
+    if state.profile is not None:
+        count = _emit_batches(rows, tee_sink, 512)
+    else:
+        try:
+            count = copy(rows, tee_sink)
+        finally:
+            tee_sink.close()
+    if aggregator is not None:
+        _report_summary(aggregator)
+    return count
+
+
+def _report_summary(aggregator: Aggregator, top: int = 10) -> None:
+    """The most frequent values of each field of ``--summary``, on stderr."""
+    from rich.table import Table
+
+    for field in aggregator.fields:
+        table = Table(title=f"{field} ({aggregator.documents} document(s))", header_style="bold")
+        table.add_column("value", overflow="fold")
+        table.add_column("count", justify="right")
+        table.add_column("%", justify="right")
+        for value, count in aggregator.most_common(field, top):
+            share = 100 * count / aggregator.documents if aggregator.documents else 0.0
+            table.add_row(_cell(value) or "(none)", str(count), f"{share:.1f}")
+        console(stderr=True).print(table)
+
+
+def _phase(name: str) -> Any:
+    """Account a block to a phase of the ``--profile`` report, if there is one."""
+    return state.profile.phase(name) if state.profile else nullcontext()
+
+
+def tracked(
+    client: "Onyphe", rows: Iterator[dict[str, Any]], total: int | None = None
+) -> Iterator[dict[str, Any]]:
+    """Show a live progress line on stderr while ``rows`` is consumed.
+
+    On when stderr is a terminal, unless ``--progress``/``--no-progress`` says
+    otherwise; ``rows`` comes back untouched when off.
+    """
+    show = state.progress if state.progress is not None else sys.stderr.isatty()
+    if not show:
+        return rows
+    progress = Progress(total=total)
+    client.add_hook(progress)
+
+    def consume() -> Iterator[dict[str, Any]]:
+        try:
+            yield from progress.track(rows)
+        finally:
+            progress.close()
+            client.remove_hook(progress)
+
+    return consume()
+
+
+def run(client: "Onyphe", rows: Iterator[dict[str, Any]], out: StreamOutput) -> None:
+    """Consume a streaming endpoint into ``out``, reporting progress on stderr."""
+    count = out.emit(tracked(client, rows))
+    note(f"{count} document(s)")
 
 
 def _version_callback(value: bool) -> None:
     if value:
-        out.print(f"pyonyphe {__version__}")
+        from . import __version__
+
+        typer.echo(f"pyonyphe {__version__}")
         raise typer.Exit()
 
 
+def _report_profile(
+    profile: "Profile", profiler: "cProfile.Profile | None", stats: Path | None
+) -> None:
+    """Print the ``--profile`` report on stderr, and dump the cProfile stats."""
+    from rich.table import Table
+
+    from .profiling import PHASES
+
+    if profiler is not None and stats is not None:
+        profiler.disable()
+        profiler.dump_stats(stats)
+    profile.finish()
+    table = Table(title="profile", header_style="bold")
+    table.add_column("phase")
+    table.add_column("seconds", justify="right")
+    table.add_column("share", justify="right")
+    for name in PHASES:
+        seconds = profile.phases[name]
+        share = 100 * seconds / profile.elapsed if profile.elapsed else 0.0
+        table.add_row(name, f"{seconds:.3f}", f"{share:.0f}%")
+    table.add_row("total", f"{profile.elapsed:.3f}", "", style="bold")
+    console(stderr=True).print(table)
+    note(
+        f"{profile.requests} request(s), {profile.documents} document(s), "
+        f"{profile.bytes / 1e6:.1f} MB: {profile.documents_per_second:.0f} docs/s, "
+        f"{profile.megabytes_per_second:.1f} MB/s; "
+        f"peak Python memory {profile.peak_memory / 1e6:.1f} MB"
+    )
+    if stats is not None:
+        note(f"cProfile stats written to {stats}")
+
+
 @app.callback()
 def root(
+    ctx: typer.Context,
     api_key: Annotated[
         str | None,
         typer.Option("--api-key", "-k", envvar="ONYPHE_API_KEY", help="ONYPHE API key."),
@@ -171,6 +858,34 @@ def root(
         ),
     ] = None,
     timeout: Annotated[float, typer.Option(help="Per-request timeout, in seconds.")] = 30.0,
+    profile: Annotated[
+        bool, typer.Option("--profile", help="Report where the time went, on stderr.")
+    ] = False,
+    profile_stats: Annotated[
+        Path | None,
+        typer.Option(help="With --profile, also dump cProfile stats to this file."),
+    ] = None,
+    compression: Annotated[
+        str,
+        typer.Option(
+            help="Compress output: auto (by the --output suffix, .gz or .zst), none, gzip, zstd."
+        ),
+    ] = "auto",
+    level: Annotated[
+        int | None,
+        typer.Option(help="Compression level [default: 6 for gzip, 3 for zstd]."),
+    ] = None,
+    compress_threads: Annotated[
+        int, typer.Option(help="Threads compressing output, besides the writing one.")
+    ] = 0,
+    progress: Annotated[
+        bool | None,
+        typer.Option(
+            "--progress/--no-progress",
+            help="Live progress of streaming commands on stderr [default: when a terminal].",
+            show_default=False,
+        ),
+    ] = None,
     version: Annotated[
         bool,
         typer.Option("--version", callback=_version_callback, is_eager=True, help="Show version."),
@@ -185,6 +900,24 @@ def root(
     state.base_url = base_url
     state.unrated_email = unrated_email
     state.timeout = timeout
+    state.progress = progress
+    if compression not in ("auto", "none", *DEFAULT_LEVELS):
+        fail(f"unknown compression {compression!r}, expected auto, none, gzip or zstd")
+        raise typer.Exit(code=2)
+    state.compression = None if compression == "none" else compression
+    state.level = level
+    state.compress_threads = compress_threads
+    state.profile = None
+    if profile:
+        import cProfile
+
+        from .profiling import Profile
+
+        measured = state.profile = Profile()
+        profiler = cProfile.Profile() if profile_stats else None
+        if profiler is not None:
+            profiler.enable()
+        ctx.call_on_close(lambda: _report_profile(measured, profiler, profile_stats))
 
 
 @app.command()
@@ -195,18 +928,20 @@ def config() -> None:
             state.api_key, base_url=state.base_url, unrated_email=state.unrated_email
         )
     except OnypheError as exc:
-        err.print(f"[red]{exc}[/red]")
+        fail(exc)
         raise typer.Exit(code=2) from exc
     masked = (
         settings.api_key[:4] + "…" + settings.api_key[-4:] if len(settings.api_key) > 8 else "…"
     )
+    from rich.table import Table
+
     table = Table(header_style="bold")
     table.add_column("setting")
     table.add_column("value")
     table.add_row("base_url", settings.base_url)
     table.add_row("api_key", masked)
     table.add_row("unrated", "yes" if settings.is_unrated else "no")
-    out.print(table)
+    console().print(table)
 
 
 @app.command()
@@ -230,21 +965,45 @@ def search(
     ] = None,
     trackquery: Annotated[bool, typer.Option(help="Report which sub-query matched.")] = False,
     calculated: Annotated[bool, typer.Option(help="Ask for enriched fields.")] = False,
-    fmt: Annotated[str, typer.Option("--format", "-f", help="table, json or ndjson.")] = "table",
+    fmt: Annotated[
+        str,
+        typer.Option(
+            "--format",
+            "-f",
+            help="table, json, ndjson, csv, tsv, parquet, arrow, sqlite or duckdb.",
+        ),
+    ] = "table",
     output: Annotated[Path | None, typer.Option("--output", "-o", help="Write to a file.")] = None,
+    partition_by: Annotated[str | None, PartitionOption] = None,
+    fields: Annotated[str | None, FieldsOption] = None,
+    list_sep: Annotated[str, ListSepOption] = "|",
+    key: Annotated[str | None, KeyOption] = None,
+    keep: Annotated[str | None, KeepOption] = None,
+    drop: Annotated[str | None, DropOption] = None,
+    max_length: Annotated[int | None, MaxLengthOption] = None,
 ) -> None:
     """Run an OQL search."""
+    project = projection(keep, drop, max_length)
     with get_client() as client:
         try:
             if all_pages or limit is not None or pages is not None:
+                # With --limit or --pages, an upper bound of the count: enough for an ETA.
+                bounds = [limit, pages * size if pages is not None else None]
+                known = [bound for bound in bounds if bound is not None]
+                total = min(SEARCH_MAX_RESULTS, *known) if known else None
                 rows = list(
-                    client.search_iter(
-                        query,
-                        size=size,
-                        max_results=limit,
-                        max_pages=pages,
-                        trackquery=trackquery,
-                        calculated=calculated,
+                    tracked(
+                        client,
+                        client.search_iter(
+                            query,
+                            size=size,
+                            max_results=limit,
+                            max_pages=pages,
+                            trackquery=trackquery,
+                            calculated=calculated,
+                            project=project,
+                        ),
+                        total,
                     )
                 )
                 title = f"{len(rows)} result(s)"
@@ -253,26 +1012,43 @@ def search(
                     query, page=page, size=size, trackquery=trackquery, calculated=calculated
                 )
                 rows = response.results
+                if project is not None:
+                    rows = [project(row) for row in rows]
                 title = f"{response.count} of {response.total} result(s)"
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
-    render(rows, fmt, output, title)
+    render(
+        rows,
+        fmt,
+        output,
+        title,
+        partition_by=partition_by,
+        fields=fields,
+        list_sep=list_sep,
+        key=key,
+    )
 
 
 @app.command()
+@streaming
 def export(
     query: Annotated[str, typer.Argument(help="ONYPHE Query Language expression.")],
     trackquery: Annotated[bool, typer.Option(help="Report which sub-query matched.")] = False,
     calculated: Annotated[bool, typer.Option(help="Ask for enriched fields.")] = False,
-    output: Annotated[Path | None, typer.Option("--output", "-o", help="Write to a file.")] = None,
+    *,
+    out: StreamOutput,
 ) -> None:
-    """Stream a full export as newline-delimited JSON."""
+    """Stream a full export, as newline-delimited JSON by default."""
     with get_client() as client:
         try:
-            run(client.export(query, trackquery=trackquery, calculated=calculated), output)
+            project = out.projection()
+            rows = client.export(
+                query, trackquery=trackquery, calculated=calculated, project=project
+            )
+            run(client, rows, out)
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
 
 
@@ -280,7 +1056,9 @@ def export(
 def summary(
     kind: Annotated[str, typer.Argument(help="ip, domain or hostname.")],
     value: Annotated[str, typer.Argument(help="The asset to summarise.")],
-    fmt: Annotated[str, typer.Option("--format", "-f", help="table, json or ndjson.")] = "json",
+    fmt: Annotated[
+        str, typer.Option("--format", "-f", help="table, json, ndjson, csv or tsv.")
+    ] = "json",
     output: Annotated[Path | None, typer.Option("--output", "-o")] = None,
 ) -> None:
     """Summary API for an IP, a domain or a hostname."""
@@ -290,7 +1068,7 @@ def summary(
             # ParamError on anything unknown, which we turn into exit code 1.
             response = client.summary(cast(SummaryKind, kind), value)
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
     render(response.results, fmt, output, f"summary {kind} {value}")
 
@@ -300,7 +1078,9 @@ def simple(
     category: Annotated[str, typer.Argument(help="datascan, geoloc, vulnscan, ...")],
     value: Annotated[str, typer.Argument(help="IP, domain, hostname or string.")],
     best: Annotated[bool, typer.Option("--best", help="Best-matching document only.")] = False,
-    fmt: Annotated[str, typer.Option("--format", "-f", help="table, json or ndjson.")] = "table",
+    fmt: Annotated[
+        str, typer.Option("--format", "-f", help="table, json, ndjson, csv or tsv.")
+    ] = "table",
     output: Annotated[Path | None, typer.Option("--output", "-o")] = None,
 ) -> None:
     """Simple API (deprecated upstream, kept while it still answers)."""
@@ -312,7 +1092,7 @@ def simple(
                 else client.simple(cast(SimpleCategory, category), value)
             )
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
     render(response.results, fmt, output, f"simple {category} {value}")
 
@@ -321,67 +1101,297 @@ def simple(
 def resolve(
     value: Annotated[str, typer.Argument(help="Domain, hostname or IP address.")],
     reverse: Annotated[bool, typer.Option("--reverse", help="Reverse lookup on an IP.")] = False,
-    fmt: Annotated[str, typer.Option("--format", "-f", help="table, json or ndjson.")] = "table",
+    fmt: Annotated[
+        str, typer.Option("--format", "-f", help="table, json, ndjson, csv or tsv.")
+    ] = "table",
 ) -> None:
     """Forward or reverse DNS records known to ONYPHE."""
     with get_client() as client:
         try:
             response = client.resolver_reverse(value) if reverse else client.resolver_forward(value)
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
     render(response.results, fmt, None, f"resolver {value}")
 
 
 @bulk_app.command("summary")
+@streaming
 def bulk_summary(
     kind: Annotated[str, typer.Argument(help="ip, domain or hostname.")],
     file: Annotated[Path, typer.Argument(help="One asset per line.")],
-    output: Annotated[Path | None, typer.Option("--output", "-o")] = None,
+    *,
+    out: StreamOutput,
 ) -> None:
     """Bulk Summary API."""
     with get_client() as client:
         try:
-            run(client.bulk_summary(cast(SummaryKind, kind), file), output)
+            rows = client.bulk_summary(cast(SummaryKind, kind), file, project=out.projection())
+            run(client, rows, out)
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
 
 
 @bulk_app.command("simple")
+@streaming
 def bulk_simple(
     category: Annotated[str, typer.Argument(help="datascan, geoloc, vulnscan, ...")],
     file: Annotated[Path, typer.Argument(help="One IP address per line.")],
     best: Annotated[bool, typer.Option("--best", help="Best-matching document only.")] = False,
-    output: Annotated[Path | None, typer.Option("--output", "-o")] = None,
+    *,
+    out: StreamOutput,
 ) -> None:
     """Bulk Simple API over a list of IP addresses."""
     with get_client() as client:
         try:
+            project = out.projection()
             rows = (
-                client.bulk_simple_best(cast(BestCategory, category), file)
+                client.bulk_simple_best(cast(BestCategory, category), file, project=project)
                 if best
-                else client.bulk_simple(cast(BulkSimpleCategory, category), file)
+                else client.bulk_simple(cast(BulkSimpleCategory, category), file, project=project)
             )
-            run(rows, output)
+            run(client, rows, out)
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
 
 
 @bulk_app.command("discovery")
+@streaming
 def bulk_discovery(
     category: Annotated[str, typer.Argument(help="Category to query, e.g. datascan.")],
     file: Annotated[Path, typer.Argument(help="One OQL query per line.")],
-    output: Annotated[Path | None, typer.Option("--output", "-o")] = None,
+    *,
+    out: StreamOutput,
 ) -> None:
     """Discovery API: several OQL queries at once (Griffin View only)."""
     with get_client() as client:
         try:
-            run(client.discovery(category, file), output)
+            rows = client.discovery(category, file, project=out.projection())
+            run(client, rows, out)
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
+            raise typer.Exit(code=1) from exc
+
+
+@app.command("filter")
+@streaming
+def filter_documents(
+    query: Annotated[str, typer.Argument(help="ONYPHE Query Language expression.")],
+    files: Annotated[
+        list[Path] | None,
+        typer.Argument(help="NDJSON files, .gz and .zst decompressed; stdin when none."),
+    ] = None,
+    count: Annotated[bool, typer.Option("--count", help="Only print how many match.")] = False,
+    *,
+    out: StreamOutput,
+) -> None:
+    """Filter exported documents with an OQL query, locally: no API call, no credit."""
+    from .oql import Query
+
+    try:
+        matcher = Query(query)
+    except OnypheError as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+    project = out.projection()
+
+    def matching() -> Iterator[dict[str, Any]]:
+        for source in files or [Path("-")]:
+            rows = matcher.scan(source)
+            yield from rows if project is None else map(project, rows)
+
+    try:
+        if count:
+            typer.echo(sum(1 for _ in matching()))
+            return
+        written = out.emit(matching())
+    except (OSError, OnypheError) as exc:
+        fail(exc)
+        raise typer.Exit(code=1) from exc
+    note(f"{written} document(s)")
+
+
+IndexPathOption = typer.Option(
+    "--index", help="The index file; FILE with .idx added by default.", show_default=False
+)
+
+
+@index_app.command("build")
+def index_build(
+    file: Annotated[Path, typer.Argument(help="Uncompressed NDJSON file.")],
+    field: Annotated[
+        list[str] | None,
+        typer.Option("--field", help="Field to index, repeatable; ip, domain, hostname, datamd5."),
+    ] = None,
+    index: Annotated[Path | None, IndexPathOption] = None,
+    workers: Annotated[
+        int | None, typer.Option(help="Processes indexing ranges of the file; one per CPU.")
+    ] = None,
+) -> None:
+    """Index FILE, for lookups that read only the matching lines."""
+    from .offsets import DEFAULT_FIELDS, OffsetIndex
+
+    try:
+        built = OffsetIndex.build(file, fields=field or DEFAULT_FIELDS, path=index, workers=workers)
+    except ParamError as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+    except OSError as exc:
+        fail(exc)
+        raise typer.Exit(code=1) from exc
+    with built:
+        note(f"{len(built)} entries over {', '.join(built.fields)} in {built.path}")
+
+
+@index_app.command("lookup")
+def index_lookup(
+    file: Annotated[Path, typer.Argument(help="NDJSON file indexed with 'index build'.")],
+    field: Annotated[str, typer.Argument(help="Indexed field, such as ip.")],
+    values: Annotated[list[str], typer.Argument(help="Values to look up.")],
+    index: Annotated[Path | None, IndexPathOption] = None,
+    output: Annotated[Path | None, typer.Option("--output", "-o")] = None,
+) -> None:
+    """Print the lines of FILE holding one of VALUES in FIELD, as they are."""
+    from .offsets import OffsetIndex
+
+    try:
+        opened = OffsetIndex(file, index)
+    except ParamError as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+    found = 0
+    with opened:
+        if field not in opened.fields:
+            fail(f"{field!r} is not indexed, only {', '.join(opened.fields)}")
+            raise typer.Exit(code=2)
+        stream, owned = _open_output(output)
+        try:
+            for value in values:
+                for line in opened.lines(field, value):
+                    stream.write(line if line.endswith(b"\n") else line + b"\n")
+                    found += 1
+        except OSError as exc:
+            fail(exc)
             raise typer.Exit(code=1) from exc
+        finally:
+            if owned:
+                stream.close()
+            else:
+                stream.flush()
+    note(f"{found} document(s)")
+
+
+@app.command()
+def bench(
+    mix: Annotated[
+        str, typer.Option(help="Endpoints and weights, e.g. 'summary/ip=3,search=1'.")
+    ] = "summary/ip",
+    concurrency: Annotated[int, typer.Option("--concurrency", "-c", help="Calls in flight.")] = 8,
+    rate: Annotated[
+        float | None, typer.Option(help="Calls started per second; as fast as possible if unset.")
+    ] = None,
+    requests: Annotated[
+        int | None, typer.Option("--requests", "-n", help="Stop after N calls.")
+    ] = None,
+    duration: Annotated[
+        float | None, typer.Option("--duration", "-d", help="Stop after S seconds.")
+    ] = None,
+    ip: Annotated[str, typer.Option(help="IP for summary/ip and simple.")] = "8.8.8.8",
+    domain: Annotated[str, typer.Option(help="Domain for summary/domain.")] = "example.com",
+    hostname: Annotated[
+        str, typer.Option(help="Hostname for summary/hostname.")
+    ] = "www.example.com",
+    query: Annotated[str, typer.Option(help="OQL for search.")] = "category:datascan",
+    max_retries: Annotated[int, typer.Option(help="Retries on 429 and 5xx.")] = 3,
+    seed: Annotated[int | None, typer.Option(help="Seed of the endpoint draw.")] = None,
+    fmt: Annotated[str, typer.Option("--format", "-f", help="table or json.")] = "table",
+    output: Annotated[Path | None, typer.Option("--output", "-o", help="Write to a file.")] = None,
+) -> None:
+    """Drive an endpoint mix at a given concurrency or rate, and report.
+
+    Point --base-url at a local stand-in (python -m pyonyphe.fake_server): on
+    the real API, every call spends credits.
+    """
+    import asyncio
+
+    from . import bench as benchmark
+    from .async_client import AsyncOnyphe
+    from .config import DEFAULT_BASE_URL
+
+    if concurrency < 1:
+        raise typer.BadParameter("must be at least 1", param_hint="'--concurrency'")
+    if rate is not None and not rate > 0:
+        raise typer.BadParameter("must be positive", param_hint="'--rate'")
+    if requests is None and duration is None:
+        requests = 100
+    targets = benchmark.Targets(ip=ip, domain=domain, hostname=hostname, query=query)
+
+    async def drive() -> "BenchReport":
+        async with AsyncOnyphe(
+            state.api_key,
+            base_url=state.base_url,
+            unrated_email=state.unrated_email,
+            timeout=state.timeout,
+            max_retries=max_retries,
+        ) as client:
+            if client.settings.base_url == DEFAULT_BASE_URL:
+                note("benchmarking the live API: every call spends credits", fg="yellow")
+            return await benchmark.run(
+                client,
+                benchmark.parse_mix(mix),
+                concurrency=concurrency,
+                rate=rate,
+                requests=requests,
+                duration=duration,
+                targets=targets,
+                seed=seed,
+            )
+
+    try:
+        report = asyncio.run(drive())
+    except OnypheError as exc:
+        fail(exc)
+        raise typer.Exit(code=2) from exc
+    if fmt == "json":
+        emit_json(report.as_dict(), output)
+    else:
+        emit_bench(report)
+
+
+def emit_bench(report: "BenchReport") -> None:
+    """Render a benchmark report as tables."""
+    from rich.table import Table
+
+    summary = Table(title="bench", header_style="bold", show_header=False)
+    summary.add_column("metric")
+    summary.add_column("value", justify="right")
+    summary.add_row("calls", str(report.calls))
+    summary.add_row("elapsed", f"{report.elapsed:.2f} s")
+    summary.add_row("throughput", f"{report.throughput:.1f} /s")
+    for label, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        summary.add_row(label, f"{report.latency(q) * 1000:.1f} ms")
+    summary.add_row("client CPU", f"{report.cpu:.2f} s ({report.cpu_percent:.0f}%)")
+    summary.add_row("errors", _counts(report.errors))
+    summary.add_row("retries", _counts(report.retries))
+    console().print(summary)
+    table = Table(header_style="bold")
+    for column in ("endpoint", "calls", "errors", "p50 ms", "p95 ms", "p99 ms"):
+        table.add_column(column, justify="left" if column == "endpoint" else "right")
+    for name, endpoint in report.endpoints.items():
+        row = endpoint.as_dict()
+        table.add_row(
+            name,
+            str(row["calls"]),
+            str(row["errors"]),
+            *(f"{row[q] * 1000:.1f}" for q in ("p50", "p95", "p99")),
+        )
+    console().print(table)
+
+
+def _counts(counts: dict[str, int]) -> str:
+    return ", ".join(f"{name} {count}" for name, count in sorted(counts.items())) or "none"
 
 
 @alert_app.command("list")
@@ -391,11 +1401,13 @@ def alert_list() -> None:
         try:
             alerts = client.alerts()
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
     if not alerts:
-        out.print("[yellow]no alert[/yellow]")
+        typer.secho("no alert", fg="yellow")
         return
+    from rich.table import Table
+
     table = Table(header_style="bold")
     for column in ("id", "name", "query", "email", "threshold"):
         table.add_column(column, overflow="fold")
@@ -407,7 +1419,7 @@ def alert_list() -> None:
             alert.email or "",
             alert.threshold or "",
         )
-    out.print(table)
+    console().print(table)
 
 
 @alert_app.command("add")
@@ -422,9 +1434,9 @@ def alert_add(
         try:
             client.add_alert(name, query, email, threshold)
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
-    out.print(f"[green]alert {name!r} created[/green]")
+    typer.secho(f"alert {name!r} created", fg="green")
 
 
 @alert_app.command("del")
@@ -436,9 +1448,9 @@ def alert_del(
         try:
             client.del_alert(alert_id)
         except OnypheError as exc:
-            err.print(f"[red]{exc}[/red]")
+            fail(exc)
             raise typer.Exit(code=1) from exc
-    out.print(f"[green]alert {alert_id} deleted[/green]")
+    typer.secho(f"alert {alert_id} deleted", fg="green")
 
 
 def main() -> None:
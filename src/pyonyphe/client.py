@@ -2,8 +2,13 @@
 
 from __future__ import annotations
 
+import contextvars
 import time
-from collections.abc import Iterable, Iterator
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager
+from functools import partial
 from pathlib import Path
 from types import TracebackType
 from typing import Any
@@ -11,7 +16,7 @@ from typing import Any
 import httpx
 
 from . import _specs as specs
-from ._base import RETRY_STATUS, BaseClient, PreparedRequest
+from ._base import RETRY_STATUS, BaseClient, BatchResult, PreparedRequest
 from ._specs import (
     SEARCH_MAX_RESULTS,
     BestCategory,
@@ -20,12 +25,23 @@ from ._specs import (
     Spec,
     SummaryKind,
 )
-from .errors import TransportError
+from .errors import APIError, OnypheError, ParamError, TransportError
+from .fields import Projection
+from .hooks import (
+    ATTEMPT_FINISHED,
+    ATTEMPT_STARTED,
+    REQUEST_FINISHED,
+    REQUEST_PREPARED,
+    RETRY_SCHEDULED,
+)
 from .models import Alert, Response
+from .partition import Dimension, Window, check_target, merge, plan
+from .streaming import StreamHandle
 
 __all__ = ["Onyphe"]
 
 BulkSource = str | Path | Iterable[str] | bytes
+BatchItem = Spec | Callable[["Onyphe"], Any]
 
 
 class Onyphe(BaseClient):
@@ -40,15 +56,29 @@ class Onyphe(BaseClient):
     :func:`pyonyphe.config.load_settings`.
     """
 
-    def __init__(self, api_key: str | None = None, **kwargs: Any) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        *,
+        http_client: httpx.Client | None = None,
+        transport: httpx.BaseTransport | None = None,
+        **kwargs: Any,
+    ) -> None:
         super().__init__(api_key, **kwargs)
-        self._client = httpx.Client(timeout=self.timeout, follow_redirects=True)
+        if http_client is not None and transport is not None:
+            raise ParamError("pass either http_client or transport, not both")
+        # A caller-supplied pool is shared with other clients: it is theirs to close.
+        self._owns_client = http_client is None
+        self._client = http_client or httpx.Client(
+            timeout=self.timeout, follow_redirects=True, transport=transport
+        )
 
     # -- lifecycle ----------------------------------------------------------
 
     def close(self) -> None:
-        """Close the underlying HTTP connection pool."""
-        self._client.close()
+        """Close the underlying HTTP connection pool, unless it was passed in."""
+        if self._owns_client:
+            self._client.close()
 
     def __enter__(self) -> Onyphe:
         return self
@@ -79,40 +109,122 @@ class Onyphe(BaseClient):
         :raises APIError: on any non-2xx answer
         """
         prepared = self.prepare(spec)
+        self.emit(REQUEST_PREPARED, prepared)
+        started = time.perf_counter()
+        try:
+            response = self._attempts(prepared)
+            result = self.to_response(response)
+        except OnypheError as exc:
+            status = exc.status_code if isinstance(exc, APIError) else None
+            elapsed = time.perf_counter() - started
+            self.emit(REQUEST_FINISHED, prepared, status=status, elapsed=elapsed, error=exc)
+            raise
+        elapsed = time.perf_counter() - started
+        self.emit(REQUEST_FINISHED, prepared, status=response.status_code, elapsed=elapsed)
+        return result
+
+    def _attempts(self, prepared: PreparedRequest) -> httpx.Response:
+        """Send ``prepared`` until it succeeds, fails for good, or runs out of retries."""
         kwargs = self._kwargs(prepared)
         last_error: Exception | None = None
         for attempt in range(self.max_retries + 1):
+            self.emit(ATTEMPT_STARTED, prepared, attempt=attempt)
+            sent = time.perf_counter()
             try:
                 response = self._client.request(prepared.method, prepared.url, **kwargs)
             except httpx.HTTPError as exc:
                 last_error = TransportError(f"unable to reach ONYPHE: {exc}")
+                elapsed = time.perf_counter() - sent
+                self.emit(ATTEMPT_FINISHED, prepared, attempt=attempt, elapsed=elapsed, error=exc)
                 if attempt >= self.max_retries:
                     raise last_error from exc
-                time.sleep(self.retry_delay(attempt))
+                delay = self.retry_delay(attempt)
+                self.emit(RETRY_SCHEDULED, prepared, attempt=attempt, delay=delay, error=exc)
+                time.sleep(delay)
                 continue
-            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+            status = response.status_code
+            elapsed = time.perf_counter() - sent
+            self.emit(ATTEMPT_FINISHED, prepared, attempt=attempt, status=status, elapsed=elapsed)
+            if status in RETRY_STATUS and attempt < self.max_retries:
                 header = response.headers.get("Retry-After", "")
                 after = float(header) if header.replace(".", "", 1).isdigit() else None
-                time.sleep(self.retry_delay(attempt, after))
+                delay = self.retry_delay(attempt, after)
+                self.emit(RETRY_SCHEDULED, prepared, attempt=attempt, status=status, delay=delay)
+                time.sleep(delay)
                 continue
-            return self.to_response(response)
+            return response
         raise last_error or TransportError("request failed")  # pragma: no cover
 
-    def stream(self, spec: Spec) -> Iterator[dict[str, Any]]:
-        """Send a streaming spec and yield one dict per NDJSON line."""
-        prepared = self.prepare(spec)
-        kwargs = self._kwargs(prepared)
+    def _run_item(self, index: int, item: BatchItem) -> BatchResult:
         try:
-            with self._client.stream(prepared.method, prepared.url, **kwargs) as response:
-                if response.status_code >= 400:
-                    response.read()
-                    self.raise_for_status(response, self._decode(response))
-                for line in response.iter_lines():
-                    item = self.parse_ndjson_line(line)
-                    if item is not None:
-                        yield item
-        except httpx.HTTPError as exc:
-            raise TransportError(f"unable to reach ONYPHE: {exc}") from exc
+            if isinstance(item, Spec):
+                return BatchResult(index, item, result=self.send(self.batch_spec(item)))
+            return BatchResult(index, item, result=item(self))
+        except OnypheError as exc:
+            return BatchResult(index, item, error=exc)
+
+    def send_many(
+        self, items: Iterable[BatchItem], *, workers: int = 8, ordered: bool = False
+    ) -> Iterator[BatchResult]:
+        """Run a batch of calls on a thread pool sharing this client's connections.
+
+        :param items: specs, or callables taking the client, such as
+            ``lambda api: api.summary_ip(ip)``
+        :param workers: calls in flight at once
+        :param ordered: yield in input order rather than as calls complete
+
+        An :class:`~pyonyphe.errors.OnypheError` is captured in
+        :attr:`BatchResult.error` instead of aborting the batch. ``items`` is
+        consumed lazily and at most ``2 * workers`` results are held at a time,
+        so a generator of millions of items runs in bounded memory.
+        """
+        limit = max(1, workers) * 2
+        source = enumerate(items)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            in_flight: deque[Future[BatchResult]] = deque()
+
+            def refill() -> None:
+                while len(in_flight) < limit:
+                    entry = next(source, None)
+                    if entry is None:
+                        return
+                    # Each call runs in a copy of the caller's context, so a
+                    # trace started around send_many follows it into the pool.
+                    context = contextvars.copy_context()
+                    in_flight.append(pool.submit(context.run, self._run_item, *entry))
+
+            try:
+                refill()
+                while in_flight:
+                    if ordered:
+                        yield in_flight.popleft().result()
+                    else:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            in_flight.remove(future)
+                            yield future.result()
+                    refill()
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    def stream(self, spec: Spec, *, project: Projection | None = None) -> StreamHandle:
+        """Send a streaming spec; the handle yields one dict per NDJSON line.
+
+        Nothing is sent before the handle is entered or first iterated.
+        """
+        return self._stream(spec, project=project)
+
+    def _stream(
+        self,
+        spec: Spec,
+        *,
+        gate: AbstractContextManager[Any] | None = None,
+        project: Projection | None = None,
+    ) -> StreamHandle:
+        prepared = self.prepare(spec)
+        return StreamHandle(
+            self, self._client, prepared, self._kwargs(prepared), gate=gate, project=project
+        )
 
     def request(
         self,
@@ -167,6 +279,7 @@ class Onyphe(BaseClient):
         max_pages: int | None = None,
         trackquery: bool = False,
         calculated: bool = False,
+        project: Projection | None = None,
     ) -> Iterator[dict[str, Any]]:
         """Iterate over every result of a query, walking the pages for you.
 
@@ -174,6 +287,7 @@ class Onyphe(BaseClient):
             ``size * max_pages`` documents
         :param max_results: stop after this many documents
         :param max_pages: stop after this many API calls, whichever comes first
+        :param project: applied to each document; see :class:`~pyonyphe.fields.Projection`
 
         Stops at ``max_results`` or ``max_pages`` when given, at the last page
         ONYPHE reports, and never goes past the 10000 results the Search API is
@@ -190,7 +304,7 @@ class Onyphe(BaseClient):
             if not response.results:
                 return
             for hit in response.results:
-                yield hit
+                yield hit if project is None else project(hit)
                 fetched += 1
                 if max_results is not None and fetched >= max_results:
                     return
@@ -203,10 +317,90 @@ class Onyphe(BaseClient):
             page += 1
 
     def export(
-        self, query: str, *, trackquery: bool = False, calculated: bool = False
+        self,
+        query: str,
+        *,
+        trackquery: bool = False,
+        calculated: bool = False,
+        project: Projection | None = None,
+    ) -> StreamHandle:
+        """Stream every document matching an OQL query (Eagle View and above).
+
+        :param project: keep, drop or truncate fields of each document as it
+            is decoded; see :class:`~pyonyphe.fields.Projection`
+        """
+        spec = specs.export(query, trackquery=trackquery, calculated=calculated)
+        return self.stream(spec, project=project)
+
+    def count(self, query: str) -> int:
+        """Number of documents matching ``query``, from a one-result search."""
+        return self.search(query, size=1).total
+
+    def partition(
+        self,
+        query: str,
+        dimensions: Sequence[Dimension | Window],
+        *,
+        target: int = SEARCH_MAX_RESULTS,
+        strict: bool = False,
+    ) -> list[str]:
+        """Split ``query`` into disjoint sub-queries of at most ``target`` documents.
+
+        See :func:`pyonyphe.partition.plan`; every count costs one search call.
+        """
+        return plan(self.count, query, dimensions, target=target, strict=strict)
+
+    def export_partitioned(
+        self,
+        query: str,
+        dimensions: Sequence[Dimension | Window],
+        *,
+        target: int = SEARCH_MAX_RESULTS,
+        workers: int = 4,
+        use_export: bool = True,
+        size: int = 100,
+        trackquery: bool = False,
+        calculated: bool = False,
+        project: Projection | None = None,
     ) -> Iterator[dict[str, Any]]:
-        """Stream every document matching an OQL query (Eagle View and above)."""
-        return self.stream(specs.export(query, trackquery=trackquery, calculated=calculated))
+        """Fetch a large result set as concurrent, disjoint slices.
+
+        :param dimensions: how to slice, see :class:`~pyonyphe.partition.Dimension`
+        :param target: largest slice worth fetching in one go
+        :param workers: slices fetched at the same time
+        :param use_export: walk each slice with :meth:`search_iter` instead,
+            for licenses without the Export API; ``target`` must then be at
+            most 10000, and a slice still larger raises
+        :raises ParamError: without the Export API, for a slice too large to
+            walk, before anything is fetched
+        :param size: page size when ``use_export`` is false
+        :param project: applied to each document, as in :meth:`export`
+
+        The slices are planned up front, then their documents are yielded in
+        arrival order, not in query order.
+        """
+        check_target(target, use_export)
+        queries = self.partition(query, dimensions, target=target, strict=not use_export)
+        if use_export:
+            sources = [
+                partial(
+                    self.export, sub, trackquery=trackquery, calculated=calculated, project=project
+                )
+                for sub in queries
+            ]
+        else:
+            sources = [
+                partial(
+                    self.search_iter,
+                    sub,
+                    size=size,
+                    trackquery=trackquery,
+                    calculated=calculated,
+                    project=project,
+                )
+                for sub in queries
+            ]
+        return merge(sources, workers=workers)
 
     def summary(self, kind: SummaryKind, value: str) -> Response:
         """Summary API for an IP, a domain or a hostname."""
@@ -247,29 +441,34 @@ class Onyphe(BaseClient):
 
     # -- bulk APIs ----------------------------------------------------------
 
-    def bulk_summary(self, kind: SummaryKind, source: BulkSource) -> Iterator[dict[str, Any]]:
+    def bulk_summary(
+        self, kind: SummaryKind, source: BulkSource, *, project: Projection | None = None
+    ) -> StreamHandle:
         """Bulk Summary API.
 
         :param source: a file path, a raw newline-separated string, or any
             iterable of assets
+        :param project: applied to each document, as in :meth:`export`
         """
-        return self.stream(specs.bulk_summary(kind, source))
+        return self.stream(specs.bulk_summary(kind, source), project=project)
 
     def bulk_simple(
-        self, category: BulkSimpleCategory, source: BulkSource
-    ) -> Iterator[dict[str, Any]]:
+        self, category: BulkSimpleCategory, source: BulkSource, *, project: Projection | None = None
+    ) -> StreamHandle:
         """Bulk Simple API over a list of IP addresses."""
-        return self.stream(specs.bulk_simple(category, source))
+        return self.stream(specs.bulk_simple(category, source), project=project)
 
     def bulk_simple_best(
-        self, category: BestCategory, source: BulkSource
-    ) -> Iterator[dict[str, Any]]:
+        self, category: BestCategory, source: BulkSource, *, project: Projection | None = None
+    ) -> StreamHandle:
         """Bulk Simple Best API over a list of IP addresses."""
-        return self.stream(specs.bulk_simple_best(category, source))
+        return self.stream(specs.bulk_simple_best(category, source), project=project)
 
-    def discovery(self, category: str, source: BulkSource) -> Iterator[dict[str, Any]]:
+    def discovery(
+        self, category: str, source: BulkSource, *, project: Projection | None = None
+    ) -> StreamHandle:
         """Discovery API: several OQL queries at once (Griffin View only)."""
-        return self.stream(specs.discovery(category, source))
+        return self.stream(specs.discovery(category, source), project=project)
 
     # -- alerts -------------------------------------------------------------
 
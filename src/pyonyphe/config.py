@@ -16,7 +16,10 @@ users without affecting anyone embedding the client.
 from __future__ import annotations
 
 import os
+import stat
 import sys
+import threading
+from collections.abc import Callable
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -94,6 +97,35 @@ def _read_ini(path: Path) -> dict[str, str]:
     return values
 
 
+# Parsed configuration files, by path, with the (mtime, size) they were read
+# at: building many clients reads each file once, and an edit is still seen.
+_FILES: dict[Path, tuple[tuple[int, int], dict[str, str]]] = {}
+_FILES_LOCK = threading.Lock()
+
+
+def _read_cached(path: Path, reader: Callable[[Path], dict[str, str]]) -> dict[str, str] | None:
+    """Parse ``path`` with ``reader``, or reuse the last parse if the file is unchanged.
+
+    Returns ``None`` when ``path`` is not a regular file. Callers must not
+    mutate the result.
+    """
+    try:
+        info = path.stat()
+    except OSError:
+        return None
+    if not stat.S_ISREG(info.st_mode):
+        return None
+    stamp = (info.st_mtime_ns, info.st_size)
+    with _FILES_LOCK:
+        cached = _FILES.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    values = reader(path)
+    with _FILES_LOCK:
+        _FILES[path] = (stamp, values)
+    return values
+
+
 def load_settings(
     api_key: str | None = None,
     *,
@@ -109,14 +141,17 @@ def load_settings(
     :param unrated_email: login email for the Unrated endpoint
     :param config_path: override the TOML configuration path (mostly for tests)
     :raises ConfigError: when no API key can be found anywhere
+
+    Configuration files are parsed once and reused until their modification
+    time or size changes.
     """
     files: dict[str, str] = {}
     toml_path = config_path or default_config_path()
-    if toml_path.is_file():
-        files.update(_read_toml(toml_path))
-    ini_path = Path.home() / ".onyphe.ini"
-    if ini_path.is_file():
-        ini = _read_ini(ini_path)
+    toml = _read_cached(toml_path, _read_toml)
+    if toml is not None:
+        files.update(toml)
+    ini = _read_cached(Path.home() / ".onyphe.ini", _read_ini)
+    if ini is not None:
         files.setdefault("api_key", ini.get("api_key", ""))
         files.setdefault("base_url", ini.get("api_endpoint", ""))
         files.setdefault("unrated_email", ini.get("api_unrated_email", ""))
@@ -0,0 +1,436 @@
+"""A local stand-in for the ONYPHE API, for offline load testing.
+
+``respx`` answers instantly and never opens a socket, so it cannot exercise
+slow answers, rate-limit bursts, throttled streams or a connection dropped
+halfway through an export. :class:`FakeOnyphe` is a plain ASGI application
+serving every endpoint of :mod:`pyonyphe._specs` with synthetic documents,
+and misbehaving on demand.
+
+In-process, for the async client::
+
+    app = FakeOnyphe(Faults(rate_limit_rate=0.1))
+    api = AsyncOnyphe("key", transport=httpx.ASGITransport(app))
+
+Over a real socket, for either client -- this needs the ``fake`` extra::
+
+    with serve(FakeOnyphe(Faults(latency=lognormal(0.08)))) as base_url:
+        api = Onyphe("key", base_url=base_url)
+
+or from a shell, for other processes to point ``--base-url`` at::
+
+    python -m pyonyphe.fake_server --port 8000 --rate-limit-rate 0.05
+
+Mid-stream disconnects need the socket: in-process, the error raised by the
+application reaches the caller as is instead of as a dropped connection.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterable, Iterator, MutableMapping
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import parse_qs
+
+from ._specs import SEARCH_MAX_RESULTS
+
+__all__ = [
+    "DisconnectError",
+    "FakeOnyphe",
+    "Faults",
+    "constant",
+    "document",
+    "lognormal",
+    "main",
+    "serve",
+    "uniform",
+]
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+Latency = Callable[[random.Random], float]
+
+PREFIX = "/api/v2/"
+
+
+# -- latency distributions ---------------------------------------------------
+
+
+def constant(seconds: float) -> Latency:
+    """Always the same delay."""
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Latency:
+    """A delay drawn uniformly between two bounds."""
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> Latency:
+    """A long-tailed delay, the usual shape of a remote API's latency."""
+    mu = math.log(median) if median > 0 else 0.0
+    return lambda rng: rng.lognormvariate(mu, sigma) if median > 0 else 0.0
+
+
+# -- configuration -----------------------------------------------------------
+
+
+@dataclass(frozen=True, slots=True)
+class Faults:
+    """How the fake server misbehaves. The defaults answer fast and clean.
+
+    :param latency: delay before each answer
+    :param rate_limit_rate: share of requests answered 429
+    :param retry_after: ``Retry-After`` seconds sent with a 429
+    :param error_rate: share of requests answered 5xx
+    :param stream_rate: documents per second a stream is throttled to, none when ``None``
+    :param chunk_documents: documents sent per chunk of a stream
+    :param disconnect_rate: share of streams cut before their end
+    :param total: documents matching any query, for search and export
+    :param data_size: length of the ``data`` field of each document
+    :param api_key: the only key accepted; any key when ``None``
+    :param seed: seed of the generator, for reproducible runs
+    """
+
+    latency: Latency = field(default=constant(0.0))
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    error_rate: float = 0.0
+    stream_rate: float | None = None
+    chunk_documents: int = 100
+    disconnect_rate: float = 0.0
+    total: int = 1000
+    data_size: int = 512
+    api_key: str | None = None
+    seed: int | None = None
+
+
+class DisconnectError(Exception):
+    """Raised inside the application to drop a stream halfway."""
+
+
+# -- synthetic data ----------------------------------------------------------
+
+
+def document(
+    category: str, index: int, rng: random.Random, *, value: str | None = None, data_size: int = 512
+) -> dict[str, Any]:
+    """One synthetic ONYPHE document of ``category``."""
+    ip = value or f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+    doc: dict[str, Any] = {
+        "@category": category,
+        "@timestamp": "2026-10-01T12:00:00.000Z",
+        "ip": ip,
+        "asn": f"AS{rng.randint(1, 65000)}",
+        "organization": "Example Hosting",
+        "country": rng.choice(("FR", "DE", "US", "JP")),
+        "domain": ["example.com"],
+        "hostname": [f"host{index}.example.com"],
+    }
+    if category == "datascan":
+        doc.update(
+            port=rng.choice((22, 80, 443, 3389, 8080)),
+            protocol="http",
+            transport="tcp",
+            app={"http": {"headers": {"server": "nginx/1.24.0"}, "title": "Welcome"}},
+            cve=[f"CVE-2024-{rng.randint(1000, 9999)}" for _ in range(rng.randint(0, 3))],
+            data="x" * data_size,
+        )
+    elif category == "resolver":
+        doc.update(forward=f"host{index}.example.com", reverse=ip)
+    elif category == "threatlist":
+        doc.update(threatlist="example-blocklist", tag=["scanner"])
+    return doc
+
+
+# -- the application ---------------------------------------------------------
+
+
+class FakeOnyphe:
+    """ASGI application mimicking the ONYPHE APIv2.
+
+    :param faults: how to misbehave
+    :ivar requests: requests served, by endpoint -- e.g. ``summary/ip``
+    """
+
+    def __init__(self, faults: Faults | None = None) -> None:
+        self.faults = faults or Faults()
+        self.requests: Counter[str] = Counter()
+        self.alerts: dict[str, dict[str, Any]] = {}
+        self._rng = random.Random(self.faults.seed)  # noqa: S311 - synthetic data
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await _lifespan(receive, send)
+            return
+        if scope["type"] != "http":  # pragma: no cover - websockets
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        path = scope["path"]
+        if not path.startswith(PREFIX):
+            await _json(send, 404, {"error": 1, "text": f"not found: {path}"})
+            return
+        parts = [part for part in path[len(PREFIX) :].split("/") if part]
+        query = {
+            key: values[-1] for key, values in parse_qs(scope["query_string"].decode()).items()
+        }
+        faults = self.faults
+        rng = self._rng
+        delay = faults.latency(rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if faults.api_key is not None and _bearer(scope) != faults.api_key:
+            await _json(send, 401, {"error": 1, "text": "invalid API key"})
+            return
+        if faults.rate_limit_rate and rng.random() < faults.rate_limit_rate:
+            headers = [(b"retry-after", f"{faults.retry_after:g}".encode())]
+            await _json(send, 429, {"error": 1, "text": "too many requests"}, headers)
+            return
+        if faults.error_rate and rng.random() < faults.error_rate:
+            await _json(send, rng.choice((500, 502, 503)), {"error": 1, "text": "server error"})
+            return
+        await self._route(scope["method"], parts, query, body, send)
+
+    async def _route(
+        self, method: str, parts: list[str], query: dict[str, str], body: bytes, send: Send
+    ) -> None:
+        head = parts[0] if parts else ""
+        if method == "GET" and parts == ["user"]:
+            self.requests["user"] += 1
+            results = [{"email": "fake@example.com", "credits": 1_000_000}]
+            await _json(send, 200, _envelope(results))
+        elif method == "GET" and parts == ["search"]:
+            self.requests["search"] += 1
+            await self._search(query, send)
+        elif method == "GET" and parts == ["export"]:
+            self.requests["export"] += 1
+            await self._stream(send, self._documents("datascan", self.faults.total))
+        elif method == "GET" and head == "summary" and len(parts) == 3:
+            self.requests[f"summary/{parts[1]}"] += 1
+            results = [
+                self._document(category, index, value=parts[2])
+                for index, category in enumerate(("datascan", "resolver", "geoloc", "threatlist"))
+            ]
+            await _json(send, 200, _envelope(results))
+        elif method == "GET" and head == "simple" and len(parts) >= 3:
+            endpoint = "/".join(parts[:-1])
+            self.requests[endpoint] += 1
+            results = [self._document(parts[1], 0, value=parts[-1])]
+            await _json(send, 200, _envelope(results))
+        elif method == "POST" and head == "bulk" and len(parts) >= 3:
+            self.requests["/".join(parts)] += 1
+            category = parts[2] if parts[1] != "summary" else "datascan"
+            assets = [line.strip() for line in body.decode().splitlines() if line.strip()]
+            await self._stream(
+                send,
+                (self._document(category, i, value=asset) for i, asset in enumerate(assets)),
+            )
+        elif head == "alert":
+            await self._alert(method, parts, body, send)
+        else:
+            await _json(send, 404, {"error": 1, "text": f"unknown endpoint: {'/'.join(parts)}"})
+
+    async def _search(self, query: dict[str, str], send: Send) -> None:
+        page = int(query.get("page", 1))
+        size = int(query.get("size", 10))
+        reachable = min(self.faults.total, SEARCH_MAX_RESULTS)
+        max_page = max(1, math.ceil(reachable / size))
+        start = (page - 1) * size
+        count = max(0, min(size, reachable - start))
+        results = [self._document("datascan", start + index) for index in range(count)]
+        await _json(
+            send,
+            200,
+            _envelope(results, total=self.faults.total, page=page, max_page=max_page),
+        )
+
+    async def _alert(self, method: str, parts: list[str], body: bytes, send: Send) -> None:
+        if method == "GET" and parts == ["alert", "list"]:
+            self.requests["alert/list"] += 1
+            await _json(send, 200, _envelope(list(self.alerts.values())))
+        elif method == "POST" and parts == ["alert", "add"]:
+            self.requests["alert/add"] += 1
+            alert_id = str(len(self.alerts) + 1)
+            self.alerts[alert_id] = {"id": int(alert_id), **json.loads(body or b"{}")}
+            await _json(send, 200, _envelope([]))
+        elif method == "POST" and parts[:2] == ["alert", "del"] and len(parts) == 3:
+            self.requests["alert/del"] += 1
+            if self.alerts.pop(parts[2], None) is None:
+                await _json(send, 404, {"error": 1, "text": "no such alert"})
+            else:
+                await _json(send, 200, _envelope([]))
+        else:
+            await _json(send, 404, {"error": 1, "text": "unknown alert endpoint"})
+
+    def _document(self, category: str, index: int, *, value: str | None = None) -> dict[str, Any]:
+        return document(category, index, self._rng, value=value, data_size=self.faults.data_size)
+
+    def _documents(self, category: str, count: int) -> Iterator[dict[str, Any]]:
+        return (self._document(category, index) for index in range(count))
+
+    async def _stream(self, send: Send, documents: Iterator[dict[str, Any]]) -> None:
+        faults = self.faults
+        cut_at: int | None = None
+        if faults.disconnect_rate and self._rng.random() < faults.disconnect_rate:
+            # Somewhere past the first chunk, so the client has started reading.
+            cut_at = faults.chunk_documents + self._rng.randint(0, faults.chunk_documents)
+        pause = faults.chunk_documents / faults.stream_rate if faults.stream_rate else 0.0
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")],
+            }
+        )
+        chunk: list[bytes] = []
+        for sent, doc in enumerate(documents, 1):
+            chunk.append(json.dumps(doc).encode() + b"\n")
+            if cut_at is not None and sent >= cut_at:
+                # A truncated line, then the connection goes without a last chunk.
+                partial = b"".join(chunk)[:-10]
+                await send({"type": "http.response.body", "body": partial, "more_body": True})
+                raise DisconnectError(f"stream cut after {sent} documents")
+            if len(chunk) >= faults.chunk_documents:
+                await send(
+                    {"type": "http.response.body", "body": b"".join(chunk), "more_body": True}
+                )
+                chunk = []
+                if pause:
+                    await asyncio.sleep(pause)
+        await send({"type": "http.response.body", "body": b"".join(chunk)})
+
+
+def _envelope(results: list[dict[str, Any]], **extra: Any) -> dict[str, Any]:
+    return {
+        "count": len(results),
+        "error": 0,
+        "status": "ok",
+        "text": "Success",
+        "took": "0.001",
+        "total": len(results),
+        "results": results,
+        **extra,
+    }
+
+
+def _bearer(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode().partition(" ")
+            return token if scheme.lower() == "bearer" else None
+    return None
+
+
+async def _json(
+    send: Send,
+    status: int,
+    payload: dict[str, Any],
+    headers: Iterable[tuple[bytes, bytes]] = (),
+) -> None:
+    body = json.dumps(payload).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+# -- serving -----------------------------------------------------------------
+
+
+@contextmanager
+def serve(
+    app: FakeOnyphe | None = None, *, host: str = "127.0.0.1", port: int = 0
+) -> Iterator[str]:
+    """Serve ``app`` on a socket from a background thread.
+
+    :param port: ``0`` picks a free one
+    :returns: the base URL to give the client
+    """
+    # Imported here: uvicorn is the `fake` extra, and the application itself
+    # runs in-process without it.
+    import uvicorn
+
+    config = uvicorn.Config(app or FakeOnyphe(), host=host, port=port, log_level="error")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="fake-onyphe", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("the fake ONYPHE server did not start")
+        time.sleep(0.01)
+    bound = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://{host}:{bound}{PREFIX.rstrip('/')}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Serve a fake ONYPHE API until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog="python -m pyonyphe.fake_server", description=main.__doc__
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="median latency, seconds")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream-rate", type=float, default=None, help="documents per second")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--total", type=int, default=1000, help="documents per query")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    faults = Faults(
+        latency=lognormal(args.latency),
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        stream_rate=args.stream_rate,
+        disconnect_rate=args.disconnect_rate,
+        total=args.total,
+        seed=args.seed,
+    )
+    with serve(FakeOnyphe(faults), host=args.host, port=args.port) as base_url:
+        print(f"fake ONYPHE API on {base_url}")
+        with suppress(KeyboardInterrupt):
+            threading.Event().wait()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,191 @@
+"""Dotted paths into nested documents.
+
+>>> title = getter("app.http.title")
+>>> title({"app": {"http": {"title": "Welcome"}}})
+'Welcome'
+
+A path walks through objects key by key. It also walks through lists, so
+that ``"cpe.vendor"`` on ``{"cpe": [{"vendor": "a"}, {"vendor": "b"}]}`` is
+``["a", "b"]``. A key that is literally dotted wins over the walk.
+
+A :class:`Projection` trims whole documents down to some paths:
+
+>>> Projection(keep=["ip", "app.http.title"])({"ip": "1.1.1.1", "data": "...",
+...     "app": {"http": {"title": "Welcome", "headers": "..."}}})
+{'ip': '1.1.1.1', 'app': {'http': {'title': 'Welcome'}}}
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any
+
+from .errors import ParamError
+
+__all__ = ["Projection", "getter", "parse_fields", "paths"]
+
+Getter = Callable[[Mapping[str, Any]], Any]
+#: Paths compiled into a tree: each key leads to the tree of what is under it,
+#: or to ``None`` for everything under it.
+Tree = dict[str, "Tree | None"]
+
+
+def _walk(value: Any, keys: tuple[str, ...]) -> Any:
+    for index, key in enumerate(keys):
+        if isinstance(value, Mapping):
+            value = value.get(key)
+        elif isinstance(value, list):
+            found: list[Any] = []
+            for item in value:
+                leaf = _walk(item, keys[index:])
+                if isinstance(leaf, list):
+                    found.extend(leaf)
+                elif leaf is not None:
+                    found.append(leaf)
+            return found or None
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def getter(path: str) -> Getter:
+    """A function returning the value at ``path`` in a document, or ``None``."""
+    if "." not in path:
+        return lambda document: document.get(path)
+    keys = tuple(path.split("."))
+
+    def get(document: Mapping[str, Any]) -> Any:
+        if path in document:
+            return document[path]
+        return _walk(document, keys)
+
+    return get
+
+
+def paths(document: Mapping[str, Any], prefix: str = "") -> Iterator[str]:
+    """The dotted path of every leaf of ``document``, in order; lists are leaves."""
+    for key, value in document.items():
+        if isinstance(value, Mapping) and value:
+            yield from paths(value, f"{prefix}{key}.")
+        else:
+            yield prefix + key
+
+
+def parse_fields(spec: str) -> list[str]:
+    """Paths out of a comma-separated list, such as ``"ip,port,app.http.title"``."""
+    return [field.strip() for field in spec.split(",") if field.strip()]
+
+
+# -- projection --------------------------------------------------------------
+
+
+def _tree(fields: Iterable[str]) -> Tree:
+    tree: Tree = {}
+    for field in fields:
+        node: Tree | None = tree
+        keys = field.split(".")
+        for key in keys[:-1]:
+            child = node.setdefault(key, {})
+            if child is None:  # a shorter path already takes all of it
+                break
+            node = child
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+#: What :func:`_keep` returns when nothing of a value is kept.
+_NOTHING: Any = object()
+
+
+def _keep(value: Any, tree: Tree) -> Any:
+    if isinstance(value, dict):
+        kept = {}
+        for key, child in tree.items():
+            if key in value:
+                item = value[key] if child is None else _keep(value[key], child)
+                if item is not _NOTHING:
+                    kept[key] = item
+        return kept or _NOTHING
+    if isinstance(value, list):
+        items = [item for item in (_keep(item, tree) for item in value) if item is not _NOTHING]
+        return items or _NOTHING
+    return _NOTHING
+
+
+def _drop(value: Any, tree: Tree) -> Any:
+    if isinstance(value, dict):
+        if not any(key in value for key in tree):
+            return value
+        kept = {}
+        for key, item in value.items():
+            if key not in tree:
+                kept[key] = item
+            elif (child := tree[key]) is not None:
+                kept[key] = _drop(item, child)
+        return kept
+    if isinstance(value, list):
+        return [_drop(item, tree) for item in value]
+    return value
+
+
+def _truncate(value: Any, length: int) -> Any:
+    if isinstance(value, str):
+        return value[:length] if len(value) > length else value
+    if isinstance(value, dict):
+        return {key: _truncate(item, length) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_truncate(item, length) for item in value]
+    return value
+
+
+class Projection:
+    """Keep some fields of a document, drop others, and cut long strings short.
+
+    The paths are compiled once into a tree, so that projecting a document
+    only visits what is kept or dropped. Streams apply it to each document
+    as it is decoded: the rest of a large document -- ``data``, certificates
+    -- is let go at once rather than carried down the pipeline.
+
+    Paths go through lists as :func:`getter` does: ``"cpe.vendor"`` keeps the
+    ``vendor`` of each item of ``cpe``. A document is never changed: what
+    differs is copied.
+
+    :param keep: the paths kept, with everything under them; all of them
+        when ``None``
+    :param drop: the paths removed, after ``keep``
+    :param max_length: strings longer than that many characters are cut to it
+    :raises ParamError: on an empty path or a ``max_length`` under 1
+    """
+
+    def __init__(
+        self,
+        keep: Iterable[str] | None = None,
+        drop: Iterable[str] = (),
+        *,
+        max_length: int | None = None,
+    ) -> None:
+        self.keep = list(keep) if keep is not None else None
+        self.drop = list(drop)
+        self.max_length = max_length
+        if any(not field or "" in field.split(".") for field in [*(self.keep or ()), *self.drop]):
+            raise ParamError("a projected path cannot be empty, nor have an empty key")
+        if max_length is not None and max_length < 1:
+            raise ParamError("max_length must be at least 1")
+        self._keep = _tree(self.keep) if self.keep is not None else None
+        self._drop = _tree(self.drop) if self.drop else None
+
+    def __call__(self, document: dict[str, Any]) -> dict[str, Any]:
+        if self._keep is not None:
+            kept = _keep(document, self._keep)
+            document = {} if kept is _NOTHING else kept
+        if self._drop is not None:
+            document = _drop(document, self._drop)
+        if self.max_length is not None:
+            document = _truncate(document, self.max_length)
+        return document
+
+    def __repr__(self) -> str:
+        return f"Projection(keep={self.keep!r}, drop={self.drop!r}, max_length={self.max_length!r})"
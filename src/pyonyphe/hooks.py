@@ -0,0 +1,94 @@
+"""Lifecycle events emitted by both clients.
+
+A hook is any callable taking an :class:`Event`. Register it on a client with
+``hooks=[...]`` or :meth:`~pyonyphe._base.BaseClient.add_hook`:
+
+>>> def log(event: Event) -> None:                       # doctest: +SKIP
+...     if event.name == RETRY_SCHEDULED:
+...         print(f"{event.endpoint}: retrying in {event.delay}s")
+>>> api = Onyphe(hooks=[log])                            # doctest: +SKIP
+
+With no hook registered, no event is built at all. Hooks run synchronously on
+the thread or task that made the request, and an exception raised by a hook
+propagates to the caller: keep them short and let them fail loudly.
+
+Events, in the order a call emits them:
+
+``request_prepared``
+    a spec was resolved into a request, before anything is sent
+``attempt_started`` / ``attempt_finished``
+    around each HTTP attempt; ``status`` or ``error`` and ``elapsed`` on finish
+``retry_scheduled``
+    a retryable failure, with the ``delay`` about to be slept
+``request_finished``
+    the call returned or raised, ``elapsed`` covering every attempt and sleep
+``stream_chunk``
+    a chunk of a streamed body was decoded, with its ``documents`` and ``bytes``
+``stream_finished``
+    a stream was exhausted or closed, with its totals
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ._base import PreparedRequest
+
+__all__ = [
+    "ATTEMPT_FINISHED",
+    "ATTEMPT_STARTED",
+    "REQUEST_FINISHED",
+    "REQUEST_PREPARED",
+    "RETRY_SCHEDULED",
+    "STREAM_CHUNK",
+    "STREAM_FINISHED",
+    "Event",
+    "Hook",
+]
+
+REQUEST_PREPARED = "request_prepared"
+ATTEMPT_STARTED = "attempt_started"
+ATTEMPT_FINISHED = "attempt_finished"
+RETRY_SCHEDULED = "retry_scheduled"
+REQUEST_FINISHED = "request_finished"
+STREAM_CHUNK = "stream_chunk"
+STREAM_FINISHED = "stream_finished"
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    """Something that happened while serving one call.
+
+    :param name: one of the event names above
+    :param request: the request concerned; the same object for every event of
+        a call, so it can key per-call state
+    :param attempt: 0-indexed attempt number
+    :param status: HTTP status, when a response came back
+    :param elapsed: seconds, for the ``*_finished`` events
+    :param delay: seconds about to be slept, for ``retry_scheduled``
+    :param documents: documents decoded from the chunk, for ``stream_chunk``;
+        documents yielded in all, for ``stream_finished``
+    :param bytes: bytes received, for the stream events
+    :param error: the exception, when the attempt or the call failed
+    """
+
+    name: str
+    request: PreparedRequest
+    attempt: int = 0
+    status: int | None = None
+    elapsed: float = 0.0
+    delay: float = 0.0
+    documents: int = 0
+    bytes: int = 0
+    error: BaseException | None = None
+
+    @property
+    def endpoint(self) -> str:
+        """Low-cardinality name of the endpoint, e.g. ``summary/ip``."""
+        return self.request.endpoint
+
+
+Hook = Callable[[Event], None]
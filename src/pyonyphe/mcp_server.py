@@ -187,8 +187,38 @@ async def user() -> dict[str, Any]:
     return {"results": [_trim(document) for document in response.results]}
 
 
+def _serve_metrics(port: int) -> None:
+    """Expose the client's Prometheus metrics on the loopback interface."""
+    # Imported here: prometheus-client is a separate extra, only needed when
+    # the metrics endpoint is asked for.
+    from prometheus_client import start_http_server
+
+    from .prometheus import instrument
+
+    instrument(_get_client())
+    start_http_server(port, addr="127.0.0.1")
+
+
+def _metrics_port(value: str) -> int:
+    """``ONYPHE_METRICS_PORT`` as a port number; exits with a message when it is not one."""
+    try:
+        port = int(value)
+    except ValueError:
+        port = 0
+    if not 0 < port < 65536:
+        raise SystemExit(f"ONYPHE_METRICS_PORT must be a port number, not {value!r}")
+    return port
+
+
 def main() -> None:
-    """Console-script entry point: serve over stdio."""
+    """Console-script entry point: serve over stdio.
+
+    With ``ONYPHE_METRICS_PORT`` set, Prometheus metrics are also served on
+    that port of ``127.0.0.1``; this needs the ``prometheus`` extra.
+    """
+    port = os.environ.get("ONYPHE_METRICS_PORT")
+    if port:
+        _serve_metrics(_metrics_port(port))
     server.run()
 
 
@@ -0,0 +1,189 @@
+"""In-memory metrics built from the client :mod:`~pyonyphe.hooks`.
+
+>>> metrics = MetricsCollector()
+>>> with Onyphe(hooks=[metrics]) as api:                  # doctest: +SKIP
+...     api.summary_ip("8.8.8.8")
+>>> metrics["summary/ip"].latency.quantile(0.95)          # doctest: +SKIP
+
+Everything is keyed on :attr:`~pyonyphe.hooks.Event.endpoint`, which drops
+the caller's values from the path, so one collector stays small however many
+assets it has seen. It is thread-safe, and cheap enough to leave on.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from .hooks import (
+    ATTEMPT_FINISHED,
+    REQUEST_FINISHED,
+    RETRY_SCHEDULED,
+    STREAM_FINISHED,
+    Event,
+)
+
+__all__ = ["DEFAULT_BUCKETS", "EndpointMetrics", "Histogram", "MetricsCollector"]
+
+#: Upper bounds, in seconds, of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+@dataclass(slots=True)
+class Histogram:
+    """Fixed-bucket histogram; the last bucket catches everything above the bounds."""
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    total: float = 0.0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    @property
+    def mean(self) -> float:
+        """Average of the observations, ``0.0`` when there is none."""
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile.
+
+        Accurate to the bucket width; ``inf`` when it falls past the last bound.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts, strict=True):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")  # pragma: no cover - rounding guard
+
+
+@dataclass(slots=True)
+class EndpointMetrics:
+    """Everything measured for one endpoint.
+
+    :param requests: calls finished, successful or not
+    :param errors: calls that raised
+    :param attempts: HTTP attempts, retries included
+    :param retries: retries scheduled
+    :param backoff: seconds spent sleeping before retries
+    :param statuses: answers by HTTP status, every attempt included
+    :param latency: duration of whole calls, retries and sleeps included
+    :param documents: documents streamed
+    :param bytes: bytes streamed
+    :param stream_seconds: time spent with a stream open
+    """
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    requests: int = 0
+    errors: int = 0
+    attempts: int = 0
+    retries: int = 0
+    backoff: float = 0.0
+    statuses: Counter[int] = field(default_factory=Counter)
+    latency: Histogram = field(init=False)
+    documents: int = 0
+    bytes: int = 0
+    stream_seconds: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.latency = Histogram(self.buckets)
+
+    @property
+    def documents_per_second(self) -> float:
+        """Average streaming throughput."""
+        return self.documents / self.stream_seconds if self.stream_seconds else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Plain-data view, ready for ``json.dumps``."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "backoff": self.backoff,
+            "statuses": dict(self.statuses),
+            "latency": {
+                "count": self.latency.count,
+                "mean": self.latency.mean,
+                "p50": self.latency.quantile(0.5),
+                "p95": self.latency.quantile(0.95),
+                "p99": self.latency.quantile(0.99),
+            },
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "documents_per_second": self.documents_per_second,
+        }
+
+
+class MetricsCollector:
+    """A hook aggregating events into per-endpoint :class:`EndpointMetrics`.
+
+    :param buckets: latency histogram bounds, in seconds
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._endpoints: dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> None:
+        name = event.name
+        if name not in _TRACKED:
+            return
+        with self._lock:
+            metrics = self._endpoints.get(event.endpoint)
+            if metrics is None:
+                metrics = self._endpoints[event.endpoint] = EndpointMetrics(self.buckets)
+            if name == ATTEMPT_FINISHED:
+                metrics.attempts += 1
+                if event.status is not None:
+                    metrics.statuses[event.status] += 1
+            elif name == RETRY_SCHEDULED:
+                metrics.retries += 1
+                metrics.backoff += event.delay
+            else:
+                metrics.requests += 1
+                metrics.errors += event.error is not None
+                metrics.latency.observe(event.elapsed)
+                if name == STREAM_FINISHED:
+                    metrics.documents += event.documents
+                    metrics.bytes += event.bytes
+                    metrics.stream_seconds += event.elapsed
+
+    def __getitem__(self, endpoint: str) -> EndpointMetrics:
+        return self._endpoints[endpoint]
+
+    def __contains__(self, endpoint: object) -> bool:
+        return endpoint in self._endpoints
+
+    def endpoints(self) -> list[str]:
+        """Endpoints seen so far."""
+        return sorted(self._endpoints)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Plain-data copy of every endpoint's metrics."""
+        with self._lock:
+            return {name: metrics.as_dict() for name, metrics in sorted(self._endpoints.items())}
+
+    def reset(self) -> None:
+        """Forget everything measured so far."""
+        with self._lock:
+            self._endpoints.clear()
+
+
+_TRACKED = frozenset((ATTEMPT_FINISHED, RETRY_SCHEDULED, REQUEST_FINISHED, STREAM_FINISHED))
@@ -0,0 +1,324 @@
+"""A sidecar index of an NDJSON file: straight to the lines of one IP or domain.
+
+>>> index = OffsetIndex.build("export.ndjson")                 # doctest: +SKIP
+>>> for doc in index.lookup("ip", "1.2.3.4"):                  # doctest: +SKIP
+...     ...
+
+Finding the documents of one asset in a large export otherwise means reading
+all of it. :meth:`OffsetIndex.build` reads it once and writes
+``export.ndjson.idx`` next to it: for each value of the indexed fields
+(``ip``, ``domain``, ``hostname`` and ``datamd5`` by default), the byte
+offset of every line holding it. A lookup then reads only those lines.
+
+The index file is a header followed by fixed-size entries -- an 8-byte hash
+of field and value, an 8-byte offset, little-endian -- sorted by hash. It is
+memory-mapped and binary-searched, so opening it costs nothing whatever its
+size, and a lookup touches a few pages. Lines found through the index are
+decoded and checked against the value, so a hash collision never returns a
+wrong document.
+
+Large files are indexed in parallel: each process takes a byte range of the
+file, from the first line starting in it, and writes its entries out sorted;
+the sorted runs are then merged into the index without holding them in
+memory. The file must not be compressed, since offsets are into the bytes
+on disk.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any
+
+from .errors import ParamError
+from .fields import getter
+from .sinks import compression_for
+
+__all__ = ["DEFAULT_FIELDS", "SUFFIX", "OffsetIndex", "index_path"]
+
+#: Fields indexed when none are named.
+DEFAULT_FIELDS = ("ip", "domain", "hostname", "datamd5")
+#: Added to the name of the indexed file, for that of its index.
+SUFFIX = ".idx"
+#: Bytes of the file each process indexes at a time.
+SPLIT_SIZE = 256 << 20
+
+MAGIC = b"PYOIDX\x00\x01"
+#: magic, entries, size and mtime of the indexed file, length of the fields.
+HEADER = struct.Struct("<8sQQQI4x")
+ENTRY = struct.Struct("<QQ")
+#: Entries read or written at a time while merging.
+CHUNK = 1 << 16
+
+Row = dict[str, Any]
+
+
+def index_path(source: str | Path) -> Path:
+    """Where the index of ``source`` goes: next to it, with :data:`SUFFIX` added."""
+    source = Path(source)
+    return source.with_name(source.name + SUFFIX)
+
+
+def _key(field: str, value: str) -> int:
+    digest = hashlib.blake2b(f"{field}\0{value}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _texts(value: Any) -> list[str]:
+    """The values of a field as indexed: each item of a list, lowercased."""
+    if value is None:
+        return []
+    items = value if isinstance(value, list) else [value]
+    return [str(item).lower() for item in items if item is not None and item != ""]
+
+
+def _little(entries: array[int]) -> array[int]:
+    if sys.byteorder == "big":
+        entries.byteswap()
+    return entries
+
+
+# -- building ----------------------------------------------------------------
+
+
+def _index_range(source: str, start: int, end: int, fields: Sequence[str], run: str) -> int:
+    """Index the lines starting in ``[start, end)`` of ``source`` into the sorted ``run``.
+
+    Runs in a worker process. Returns the number of entries.
+    """
+    getters = [(field, getter(field)) for field in fields]
+    keys: list[int] = []
+    with Path(source).open("rb") as handle:
+        position = start
+        if start > 0:
+            # Past the end of the line holding byte start - 1: the previous
+            # range indexes that one.
+            handle.seek(start - 1)
+            position = start - 1 + len(handle.readline())
+        for line in handle:
+            if position >= end:
+                break
+            offset, position = position, position + len(line)
+            try:
+                document = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(document, dict):
+                continue
+            for field, get in getters:
+                keys.extend(_key(field, text) << 64 | offset for text in _texts(get(document)))
+    keys.sort()
+    entries = array("Q")
+    mask = (1 << 64) - 1
+    for key in keys:
+        entries.append(key >> 64)
+        entries.append(key & mask)
+    with Path(run).open("wb") as handle:
+        _little(entries).tofile(handle)
+    return len(keys)
+
+
+def _read_run(run: Path) -> Iterator[tuple[int, int]]:
+    with run.open("rb") as handle:
+        while True:
+            entries = array("Q")
+            entries.frombytes(handle.read(CHUNK * ENTRY.size))
+            if not entries:
+                return
+            _little(entries)
+            pairs = iter(entries)
+            yield from zip(pairs, pairs, strict=True)
+
+
+def _ranges(size: int, split_size: int) -> list[tuple[int, int]]:
+    count = max(1, -(-size // split_size))
+    step = -(-size // count) if size else 1
+    return [(start, min(start + step, size)) for start in range(0, max(size, 1), step)]
+
+
+class OffsetIndex:
+    """The index of an NDJSON file, open for lookups.
+
+    :param source: the indexed file
+    :param path: its index; :func:`index_path` of ``source`` by default
+    :raises ParamError: when the index is missing, not an index, or older
+        than the file -- rebuild it then
+    """
+
+    def __init__(self, source: str | Path, path: str | Path | None = None) -> None:
+        self.source = Path(source)
+        self.path = Path(path) if path is not None else index_path(self.source)
+        try:
+            with self.path.open("rb") as handle:
+                self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            raise ParamError(f"cannot open the index {self.path}: {exc}") from exc
+        try:
+            magic, self.entries, size, mtime, length = HEADER.unpack_from(self._map)
+            if magic != MAGIC:
+                raise ParamError(f"{self.path} is not an index of pyonyphe")
+            self.fields: tuple[str, ...] = tuple(
+                json.loads(self._map[HEADER.size : HEADER.size + length])
+            )
+            self._start = _aligned(HEADER.size + length)
+            stat = self.source.stat()
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                raise ParamError(f"{self.path} is older than {self.source}: build it again")
+        except BaseException:
+            self._map.close()
+            raise
+        self._file: IO[bytes] = self.source.open("rb")
+
+    @classmethod
+    def build(
+        cls,
+        source: str | Path,
+        *,
+        fields: Iterable[str] = DEFAULT_FIELDS,
+        path: str | Path | None = None,
+        workers: int | None = None,
+        split_size: int = SPLIT_SIZE,
+    ) -> OffsetIndex:
+        """Index ``source``, replacing any index it had, and open the index.
+
+        :param fields: dotted paths of the fields to index; each item of a
+            list is indexed
+        :param path: where the index goes; :func:`index_path` of ``source`` by default
+        :param workers: processes indexing byte ranges of the file side by
+            side; as many as there are CPUs by default, and one for a file
+            of a single range. Workers are spawned processes, so a script
+            building with several must do so under ``if __name__ == "__main__":``
+        :param split_size: bytes of the file per range
+        :raises ParamError: for a compressed file, or no fields
+        """
+        source = Path(source)
+        fields = tuple(fields)
+        if not fields:
+            raise ParamError("an index needs at least one field")
+        if compression_for(source) is not None:
+            raise ParamError(f"{source} is compressed: offsets need the file decompressed")
+        if split_size < 1:
+            raise ParamError("split_size must be at least 1")
+        path = Path(path) if path is not None else index_path(source)
+        stat = source.stat()
+        ranges = _ranges(stat.st_size, split_size)
+        workers = min(workers or os.cpu_count() or 1, len(ranges))
+        with tempfile.TemporaryDirectory(prefix="pyonyphe-index-", dir=path.parent) as scratch:
+            runs = [str(Path(scratch) / f"run-{number:05d}") for number in range(len(ranges))]
+            jobs = [
+                (str(source), start, end, fields, run)
+                for (start, end), run in zip(ranges, runs, strict=True)
+            ]
+            if workers > 1:
+                # Spawned, not forked: forking a process with threads running
+                # -- a writer, an HTTP pool -- is unsafe.
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                    counts = list(pool.map(_index_range, *zip(*jobs, strict=True)))
+            else:
+                counts = [_index_range(*job) for job in jobs]
+            entries = sum(counts)
+            heading = json.dumps(list(fields)).encode()
+            partial = path.with_name(path.name + ".partial")
+            with partial.open("wb") as handle:
+                handle.write(
+                    HEADER.pack(MAGIC, entries, stat.st_size, stat.st_mtime_ns, len(heading))
+                )
+                handle.write(
+                    heading.ljust(_aligned(HEADER.size + len(heading)) - HEADER.size, b"\0")
+                )
+                merged = heapq.merge(*(_read_run(Path(run)) for run in runs))
+                chunk = array("Q")
+                for key, offset in merged:
+                    chunk.append(key)
+                    chunk.append(offset)
+                    if len(chunk) >= 2 * CHUNK:
+                        _little(chunk).tofile(handle)
+                        chunk = array("Q")
+                _little(chunk).tofile(handle)
+            partial.replace(path)
+        return cls(source, path)
+
+    # -- lookups -------------------------------------------------------------
+
+    def _entry(self, index: int) -> tuple[int, int]:
+        return ENTRY.unpack_from(self._map, self._start + index * ENTRY.size)
+
+    def offsets(self, field: str, value: Any) -> list[int]:
+        """Offsets of the lines that may hold ``value`` in ``field``, in file order.
+
+        May include a line whose value only shares its hash; :meth:`lookup`
+        and :meth:`lines` leave those out.
+
+        :raises ParamError: for a field the index does not cover
+        """
+        if field not in self.fields:
+            raise ParamError(f"{field!r} is not indexed, only {', '.join(self.fields)}")
+        found: set[int] = set()
+        for text in _texts(value):
+            key = _key(field, text)
+            low, high = 0, self.entries
+            while low < high:
+                middle = (low + high) // 2
+                if self._entry(middle)[0] < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            while low < self.entries and (entry := self._entry(low))[0] == key:
+                found.add(entry[1])
+                low += 1
+        return sorted(found)
+
+    def lines(self, field: str, value: Any) -> Iterator[bytes]:
+        """The lines holding ``value`` in ``field``, as they are in the file."""
+        wanted = set(_texts(value))
+        get = getter(field)
+        for offset in self.offsets(field, value):
+            self._file.seek(offset)
+            line = self._file.readline()
+            try:
+                document = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(document, dict) and wanted.intersection(_texts(get(document))):
+                yield line
+
+    def lookup(self, field: str, value: Any) -> Iterator[Row]:
+        """The documents holding ``value`` in ``field``, such as ``("ip", "1.2.3.4")``."""
+        for line in self.lines(field, value):
+            yield json.loads(line)
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> OffsetIndex:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def _aligned(size: int) -> int:
+    """``size``, rounded up so that entries start on a 16-byte boundary."""
+    return -(-size // ENTRY.size) * ENTRY.size
@@ -0,0 +1,555 @@
+"""ONYPHE Query Language, evaluated locally over documents already fetched.
+
+>>> query = Query("category:datascan port:>=8000 -country:FR")
+>>> query({"@category": "datascan", "port": 8080, "country": "DE"})
+True
+>>> for doc in query.scan("datascan.ndjson.gz"):            # doctest: +SKIP
+...     ...
+
+An export already paid for can be filtered again and again, without an API
+call. The common operators are covered:
+
+==========================  ==================================================
+``field:value``             equal; ``"quoted"`` with spaces or parentheses
+``-field:value``            not equal; ``-`` negates any term or group
+``?field:ngin*``            wildcard: ``*`` any run of characters, ``?`` one
+``~field:regex``            regular expression, matching the whole value
+``field:>1024``             also ``>=``, ``<`` and ``<=``: numbers or text
+``exists:field``            present, and neither null nor empty
+``a OR b``, ``(a b)``       terms side by side are all required; ``AND`` and
+                            ``NOT`` also work, and parentheses group
+==========================  ==================================================
+
+Fields are dotted paths, walked as :func:`~pyonyphe.fields.getter` does: a
+field holding a list matches when any of its items does. ``category`` is
+``@category``, as on the API. Text compares
+without regard to case, and ``port:80`` matches the number 80 as well as
+the string. Full-text search, where ``app.http.title:login`` would match
+any title containing the word, is not emulated: use ``?app.http.title:*login*``.
+
+Filtering goes a batch at a time and a term at a time, the cheapest terms
+first, so each term only looks at the documents the previous ones kept.
+When reading NDJSON, lines that cannot match -- they lack a word every
+match needs -- are skipped before they are decoded.
+
+:func:`canonical` spells a query one way whatever its term order, spacing
+or quoting, and :func:`fingerprint` hashes that spelling.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import re
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, Any, NoReturn
+
+from .errors import ParamError
+from .fields import Getter, getter
+from .sinks import batched, compression_for
+
+__all__ = [
+    "And",
+    "Node",
+    "Not",
+    "Or",
+    "Query",
+    "Term",
+    "canonical",
+    "fingerprint",
+    "normalise",
+    "parse",
+    "read_lines",
+]
+
+Row = dict[str, Any]
+
+#: Operators comparing a field with a bound.
+RANGES = (">=", "<=", ">", "<")
+#: Fields of OQL that documents hold under another name, when not under their own.
+ALIASES = {"category": "@category"}
+
+
+# -- syntax ------------------------------------------------------------------
+
+
+@dataclass(frozen=True, slots=True)
+class Term:
+    """One condition on one field."""
+
+    field: str
+    #: ``""`` for ``exists``.
+    value: str = ""
+    #: ``":"`` equal, ``">"``, ``">="``, ``"<"``, ``"<="``, ``"?"`` wildcard,
+    #: ``"~"`` regular expression, or ``"exists"``.
+    op: str = ":"
+
+    def __str__(self) -> str:
+        if self.op == "exists":
+            return f"exists:{self.field}"
+        if self.op in RANGES:
+            return f"{self.field}:{self.op}{quote(self.value)}"
+        prefix = self.op if self.op in ("?", "~") else ""
+        return f"{prefix}{self.field}:{quote(self.value)}"
+
+
+@dataclass(frozen=True, slots=True)
+class Not:
+    """The documents ``node`` does not match."""
+
+    node: Node
+
+    def __str__(self) -> str:
+        return f"-{_group(self.node)}"
+
+
+@dataclass(frozen=True, slots=True)
+class And:
+    """The documents every one of ``nodes`` matches."""
+
+    nodes: tuple[Node, ...]
+
+    def __str__(self) -> str:
+        return " ".join(_group(node) if isinstance(node, Or) else str(node) for node in self.nodes)
+
+
+@dataclass(frozen=True, slots=True)
+class Or:
+    """The documents any one of ``nodes`` matches."""
+
+    nodes: tuple[Node, ...]
+
+    def __str__(self) -> str:
+        return " OR ".join(
+            _group(node) if isinstance(node, And) else str(node) for node in self.nodes
+        )
+
+
+Node = Term | Not | And | Or
+
+
+def _group(node: Node) -> str:
+    return f"({node})" if isinstance(node, (And, Or)) else str(node)
+
+
+def quote(value: str) -> str:
+    """``value`` as it goes after ``field:``, quoted when it has to be."""
+    if value and not re.search(r'[\s()"\\]', value) and not value.startswith(("<", ">")):
+        return value
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+_TOKENS = re.compile(
+    r"""\s*(?:
+        (?P<open>-?\()
+      | (?P<close>\))
+      | (?P<term>(?P<prefix>[-?~]*)(?P<field>[^\s():"]+):
+            (?:"(?P<quoted>(?:[^"\\]|\\.)*)"|(?P<bare>[^\s()]*)))
+      | (?P<word>[^\s()]+)
+    )""",
+    re.VERBOSE,
+)
+
+
+class _Parser:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens: list[re.Match[str]] = []
+        position = 0
+        while text[position:].strip():
+            match = _TOKENS.match(text, position)
+            if match is None or match.end() == position:
+                self.fail(position, "unexpected character")
+            self.tokens.append(match)
+            position = match.end()
+        self.index = 0
+
+    def fail(self, position: int, message: str) -> NoReturn:
+        raise ParamError(f"invalid OQL at character {position + 1}: {message}: {self.text!r}")
+
+    def peek(self) -> re.Match[str] | None:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def keyword(self, *words: str) -> bool:
+        token = self.peek()
+        if token is not None and token["word"] in words:
+            self.index += 1
+            return True
+        return False
+
+    def expression(self) -> Node:
+        nodes = [self.conjunction()]
+        while self.keyword("OR"):
+            nodes.append(self.conjunction())
+        return nodes[0] if len(nodes) == 1 else Or(tuple(nodes))
+
+    def conjunction(self) -> Node:
+        nodes = [self.unary()]
+        while (token := self.peek()) is not None and not token["close"] and token["word"] != "OR":
+            self.keyword("AND")
+            nodes.append(self.unary())
+        return nodes[0] if len(nodes) == 1 else And(tuple(nodes))
+
+    def unary(self) -> Node:
+        if self.keyword("NOT"):
+            return Not(self.unary())
+        token = self.peek()
+        if token is None:
+            self.fail(len(self.text), "a term is missing")
+        self.index += 1
+        if token["open"]:
+            node = self.expression()
+            closing = self.peek()
+            if closing is None or not closing["close"]:
+                self.fail(token.start("open"), "unbalanced parenthesis")
+            self.index += 1
+            return Not(node) if token["open"].startswith("-") else node
+        if token["term"]:
+            return self.term(token)
+        self.fail(token.start("word"), f"expected field:value, got {token['word']!r}")
+
+    def term(self, token: re.Match[str]) -> Node:
+        prefix, field = token["prefix"], token["field"]
+        quoted = token["quoted"]
+        value = re.sub(r"\\(.)", r"\1", quoted) if quoted is not None else token["bare"]
+        kinds = prefix.replace("-", "")
+        if len(kinds) > 1:
+            self.fail(token.start("term"), f"{prefix!r}: one of ? and ~ at most")
+        if field == "exists" and not kinds:
+            if not value:
+                self.fail(token.start("term"), "exists needs a field")
+            node: Node = Term(value, op="exists")
+        elif kinds:
+            node = Term(field, value, kinds)
+        elif quoted is None and value.startswith(RANGES):
+            op = next(op for op in RANGES if value.startswith(op))
+            bound = value[len(op) :]
+            if not bound:
+                self.fail(token.start("term"), f"{field}:{op} needs a bound")
+            node = Term(field, bound, op)
+        else:
+            node = Term(field, value)
+        # Each - negates once: --a:b is a:b.
+        return Not(node) if prefix.count("-") % 2 else node
+
+
+def parse(text: str) -> Node:
+    """The syntax tree of an OQL expression.
+
+    :raises ParamError: on a syntax error, with its position
+    """
+    parser = _Parser(text)
+    if not parser.tokens:
+        raise ParamError("an OQL query cannot be empty")
+    node = parser.expression()
+    if (token := parser.peek()) is not None:
+        parser.fail(token.start("close"), "unbalanced parenthesis")
+    return node
+
+
+# -- canonical form ----------------------------------------------------------
+
+
+def normalise(node: Node) -> Node:
+    """``node`` spelt one way: what it matches does not change.
+
+    Nested groups of the same kind are flattened, the nodes of a group are
+    sorted and deduplicated, a group of one is that node, and a double
+    negation cancels. Fields and values are kept as they are: whether the
+    API compares them without regard to case depends on the field.
+    """
+    if isinstance(node, Not):
+        inner = normalise(node.node)
+        return inner.node if isinstance(inner, Not) else Not(inner)
+    if isinstance(node, (And, Or)):
+        kind = type(node)
+        nodes: dict[str, Node] = {}
+        for child in map(normalise, node.nodes):
+            for part in child.nodes if isinstance(child, kind) else (child,):
+                nodes.setdefault(str(part), part)
+        if len(nodes) == 1:
+            return next(iter(nodes.values()))
+        return kind(tuple(nodes[text] for text in sorted(nodes)))
+    return node
+
+
+@lru_cache(maxsize=1024)
+def canonical(query: str | Node) -> str:
+    """The canonical spelling of an OQL query.
+
+    >>> canonical("product:Nginx  country:FR") == canonical('country:"FR" product:Nginx')
+    True
+
+    Equivalent queries -- terms in another order, other spacing, needless
+    quotes, ``NOT`` for ``-``, ``AND`` spelt out -- have the same one, so a
+    cache or a recording keyed on it serves them all.
+
+    :raises ParamError: on a syntax error
+    """
+    return str(normalise(parse(query) if isinstance(query, str) else query))
+
+
+def fingerprint(query: str | Node) -> str:
+    """A stable hash of the :func:`canonical` spelling of ``query``: 32 hex digits."""
+    return hashlib.blake2b(canonical(query).encode(), digest_size=16).hexdigest()
+
+
+# -- evaluation --------------------------------------------------------------
+
+Test = Callable[[Any], bool]
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, str):
+        return value.lower()
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False).lower()
+    return str(value).lower()
+
+
+def _number(value: Any) -> float | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _any(test: Test) -> Test:
+    """``test`` over a field value, or over any of its items for a list."""
+
+    def check(value: Any) -> bool:
+        if value is None:
+            return False
+        if isinstance(value, list):
+            return any(test(item) for item in value if item is not None)
+        return test(value)
+
+    return check
+
+
+def _wildcard(pattern: str) -> re.Pattern[str]:
+    parts = (".*" if char == "*" else "." if char == "?" else re.escape(char) for char in pattern)
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+_COMPARE = {
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+def _getter(field: str) -> Getter:
+    alias = ALIASES.get(field)
+    if alias is None:
+        return getter(field)
+    get, fallback = getter(field), getter(alias)
+    return lambda row: value if (value := get(row)) is not None else fallback(row)
+
+
+def _term_test(term: Term) -> Test:
+    if term.op == "exists":
+        return lambda value: value is not None and value != "" and value != []
+    if term.op == ":":
+        target, number = term.value.lower(), _number(term.value)
+
+        def equal(value: Any) -> bool:
+            if number is not None and not isinstance(value, (str, bool)):
+                return _number(value) == number
+            return _text(value) == target
+
+        return _any(equal)
+    if term.op in ("?", "~"):
+        try:
+            pattern = (
+                _wildcard(term.value) if term.op == "?" else re.compile(term.value, re.IGNORECASE)
+            )
+        except re.error as exc:
+            raise ParamError(f"invalid regular expression in {term}: {exc}") from exc
+        fullmatch = pattern.fullmatch
+        return _any(lambda value: fullmatch(_text(value)) is not None)
+    compare, bound = _COMPARE[term.op], _number(term.value)
+
+    def within(value: Any) -> bool:
+        if bound is not None:
+            number = _number(value)
+            return number is not None and compare(number, bound)
+        return compare(_text(value), term.value.lower())
+
+    return _any(within)
+
+
+#: Relative cost of each kind of term: cheaper ones filter a batch first.
+_COSTS = {"exists": 0, ":": 1, ">": 2, ">=": 2, "<": 2, "<=": 2, "?": 3, "~": 4}
+
+Select = Callable[[list[Row]], list[Row]]
+
+
+def _cost(node: Node) -> int:
+    if isinstance(node, Term):
+        return _COSTS[node.op]
+    if isinstance(node, Not):
+        return _cost(node.node)
+    return 5 + sum(_cost(child) for child in node.nodes)
+
+
+def _compile(node: Node) -> tuple[Callable[[Row], bool], Select]:
+    """A test of one document, and a filter of a whole batch, for ``node``."""
+    if isinstance(node, Term):
+        get, test = _getter(node.field), _term_test(node)
+        return (
+            lambda row: test(get(row)),
+            lambda rows: [row for row in rows if test(get(row))],
+        )
+    if isinstance(node, Not):
+        match, select = _compile(node.node)
+
+        def select_not(rows: list[Row]) -> list[Row]:
+            hits = {id(row) for row in select(rows)}
+            return [row for row in rows if id(row) not in hits]
+
+        return lambda row: not match(row), select_not
+    children = [_compile(child) for child in sorted(node.nodes, key=_cost)]
+    matches = [match for match, _ in children]
+    selects = [select for _, select in children]
+    if isinstance(node, And):
+
+        def select_and(rows: list[Row]) -> list[Row]:
+            for select in selects:
+                if not rows:
+                    break
+                rows = select(rows)
+            return rows
+
+        return lambda row: all(match(row) for match in matches), select_and
+
+    def select_or(rows: list[Row]) -> list[Row]:
+        hits: set[int] = set()
+        remaining = rows
+        for select in selects:
+            hits.update(id(row) for row in select(remaining))
+            remaining = [row for row in remaining if id(row) not in hits]
+            if not remaining:
+                break
+        return [row for row in rows if id(row) in hits]
+
+    return lambda row: any(match(row) for match in matches), select_or
+
+
+#: A value that only ever appears in a JSON line as itself.
+_PLAIN = re.compile(r"[A-Za-z0-9_@-][A-Za-z0-9_.@-]*")
+
+
+def _needles(node: Node) -> list[bytes]:
+    """Words every line matching ``node`` contains, lowercased."""
+    if isinstance(node, And):
+        return [needle for child in node.nodes for needle in _needles(child)]
+    if not isinstance(node, Term) or node.op != ":" or not _PLAIN.fullmatch(node.value):
+        return []
+    # 80.0 or 080 match a port of 80, written 80: no needle for numbers
+    # unless written as JSON writes them.
+    number = _number(node.value)
+    if number is not None and (not number.is_integer() or node.value != str(int(number))):
+        return []
+    return [node.value.lower().encode("ascii")]
+
+
+class Query:
+    """An OQL expression, compiled to test documents.
+
+    Calling it tests one document; :meth:`filter` filters an iterable of
+    them, such as a stream, and :meth:`scan` an NDJSON file.
+
+    :param text: the expression
+    :raises ParamError: on a syntax error, or an invalid regular expression
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.node = parse(text)
+        self._match, self._select = _compile(self.node)
+        self._needles = _needles(self.node)
+
+    def __call__(self, document: Row) -> bool:
+        return self._match(document)
+
+    def __repr__(self) -> str:
+        return f"Query({self.text!r})"
+
+    def select(self, rows: list[Row]) -> list[Row]:
+        """The documents of ``rows`` that match, in order."""
+        return self._select(rows)
+
+    def filter(self, rows: Iterable[Row], *, batch_size: int = 1024) -> Iterator[Row]:
+        """The documents of ``rows`` that match, in order, ``batch_size`` at a time."""
+        for batch in batched(rows, batch_size):
+            yield from self._select(batch)
+
+    def may_match(self, line: bytes) -> bool:
+        """Whether the NDJSON ``line`` could match; ``False`` only when it surely cannot."""
+        if not self._needles:
+            return True
+        lowered = line.lower()
+        return all(needle in lowered for needle in self._needles)
+
+    def scan(self, source: str | Path | IO[bytes], *, batch_size: int = 4096) -> Iterator[Row]:
+        """The documents of an NDJSON file that match, in order.
+
+        :param source: a path, ``.gz`` or ``.zst`` ones decompressed, ``"-"``
+            for stdin, or a binary file object
+        """
+        may_match = self.may_match
+        decoded = (_decode(line) for line in read_lines(source) if may_match(line))
+        rows = (row for row in decoded if row is not None)
+        return self.filter(rows, batch_size=batch_size)
+
+
+def _decode(line: bytes) -> Row | None:
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return None
+    return row if isinstance(row, dict) else None
+
+
+def read_lines(source: str | Path | IO[bytes]) -> Iterator[bytes]:
+    """The non-blank lines of an NDJSON file, decompressed by suffix.
+
+    :param source: a path, ``"-"`` for stdin, or a binary file object
+    :raises ParamError: for a ``.zst`` file without the ``zstd`` extra
+    """
+    if not isinstance(source, (str, Path)):
+        yield from (line for line in source if line.strip())
+        return
+    if str(source) == "-":
+        yield from (line for line in sys.stdin.buffer if line.strip())
+        return
+    compression = compression_for(source)
+    with Path(source).open("rb") as handle:
+        stream: IO[bytes] = handle
+        if compression == "gzip":
+            stream = gzip.GzipFile(fileobj=handle)
+        elif compression == "zstd":
+            try:
+                # Imported here: zstandard is the `zstd` extra.
+                import zstandard
+            except ImportError as exc:
+                raise ParamError(
+                    "reading zstd needs the zstandard package: install the pyonyphe[zstd] extra"
+                ) from exc
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(handle))
+        yield from (line for line in stream if line.strip())
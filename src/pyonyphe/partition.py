@@ -0,0 +1,412 @@
+"""Split one OQL query into disjoint sub-queries, and merge their streams back.
+
+A single export is one long serial stream, and the Search API stops serving a
+query after :data:`~pyonyphe._specs.SEARCH_MAX_RESULTS` documents. Cutting the
+query into slices that do not overlap -- one per port, per country, per time
+window -- fixes both: every slice fits under the ceiling, and the slices can
+run side by side.
+
+>>> dims = [Dimension.values("country", ["FR", "DE"]), Dimension.values("port", [80, 443])]
+>>> with Onyphe() as api:                                      # doctest: +SKIP
+...     for doc in api.export_partitioned("category:datascan", dims):
+...         ...
+
+A :class:`Window` slices on time instead: it halves its range, and each half
+again, until every slice fits or the windows reach their ``minimum`` length.
+
+:func:`plan` only needs a way to count a query, so it stays independent of
+either transport; the clients hand it a cheap ``size=1`` search.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import queue
+import re
+import threading
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from ._specs import SEARCH_MAX_RESULTS
+from .errors import ParamError
+from .oql import Or, parse
+
+__all__ = ["Dimension", "Window", "aplan", "countries", "plan", "ports"]
+
+#: Documents buffered between the partition workers and the consumer.
+QUEUE_SIZE = 1_000
+#: Counts :func:`aplan` has in flight at most.
+COUNTS = 8
+
+_DONE = object()
+
+
+def _quote(value: object) -> str:
+    text = str(value)
+    if any(char.isspace() for char in text) or '"' in text:
+        escaped = text.replace('"', '\\"')
+        return f'"{escaped}"'
+    return text
+
+
+@dataclass(frozen=True, slots=True)
+class Dimension:
+    """One way of cutting a result set into disjoint slices.
+
+    :param clauses: OQL filters, one per slice; no two may match the same document
+    :param remainder: filter matching every document none of ``clauses`` does,
+        or ``None`` when the clauses already cover the whole result set
+
+    Use :meth:`values` for a field with a known set of values. For time
+    windows, pass the date filters your license supports as ``clauses`` with no
+    remainder: only the caller knows that the windows cover the full range.
+    """
+
+    clauses: tuple[str, ...]
+    remainder: str | None = None
+
+    def __post_init__(self) -> None:
+        if not self.clauses:
+            raise ParamError("a dimension needs at least one clause")
+
+    @classmethod
+    def values(cls, field: str, values: Iterable[object]) -> Dimension:
+        """Slice on ``field``, one slice per value, plus one for everything else."""
+        clauses = tuple(f"{field}:{_quote(value)}" for value in values)
+        return cls(clauses, " ".join(f"-{clause}" for clause in clauses) or None)
+
+    def slices(self) -> tuple[str, ...]:
+        """Every filter to apply, the remainder included."""
+        if self.remainder is None:
+            return self.clauses
+        return (*self.clauses, self.remainder)
+
+
+@dataclass(frozen=True, slots=True)
+class Window:
+    """Time windows over ``field``, halved while a window holds too many documents.
+
+    Slices the range ``[start, end)`` in two; :func:`plan` halves each half
+    again while it is over ``target`` and longer than ``2 * minimum``, then
+    moves on to the next dimension. Two more slices, before ``start`` and
+    from ``end`` on, make sure nothing is lost.
+
+    Bounds are compared as ONYPHE writes ``@timestamp``, such as
+    ``2025-01-01T00:00:00.000Z``; a naive datetime is taken as UTC.
+
+    :param start: first instant of the range
+    :param end: first instant past the range
+    :param field: the date field
+    :param minimum: shortest window; one that is still too large goes on to
+        the next dimension
+    :param outside: also slice the documents outside the range
+    """
+
+    start: datetime
+    end: datetime
+    field: str = "@timestamp"
+    minimum: timedelta = timedelta(hours=1)
+    outside: bool = True
+
+    def __post_init__(self) -> None:
+        if self.end <= self.start:
+            raise ParamError("a window must end after it starts")
+        if self.minimum <= timedelta(0):
+            raise ParamError("a window must last more than nothing")
+
+    def _bound(self, value: datetime) -> str:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        text = value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+        return f"{text[:-3]}Z"
+
+    def _range(self, start: datetime, end: datetime) -> str:
+        return f"{self.field}:>={self._bound(start)} {self.field}:<{self._bound(end)}"
+
+    def cuts(self, query: str, rest: Sequence[Slicer]) -> list[tuple[str, list[Slicer]]]:
+        """Each slice of ``query``, with the dimensions left to cut it further."""
+        own = f" {self._range(self.start, self.end)}"
+        if not self.outside and query.endswith(own):
+            # A half: its halves replace its range rather than add to it.
+            query = query[: -len(own)]
+        cuts: list[tuple[str, list[Slicer]]] = []
+        if self.end - self.start >= 2 * self.minimum:
+            middle = self.start + (self.end - self.start) / 2
+            for start, end in ((self.start, middle), (middle, self.end)):
+                half = replace(self, start=start, end=end, outside=False)
+                cuts.append((_narrow(query, self._range(start, end)), [half, *rest]))
+        elif self.outside:
+            cuts.append((_narrow(query, self._range(self.start, self.end)), list(rest)))
+        if self.outside:
+            cuts.append((_narrow(query, f"{self.field}:<{self._bound(self.start)}"), list(rest)))
+            cuts.append((_narrow(query, f"{self.field}:>={self._bound(self.end)}"), list(rest)))
+        return cuts
+
+
+#: What :func:`plan` slices on.
+Slicer = Dimension | Window
+
+
+def _cuts(query: str, head: Slicer, rest: Sequence[Slicer]) -> list[tuple[str, list[Slicer]]]:
+    """The sub-queries ``head`` cuts ``query`` into, each with the dimensions left."""
+    if isinstance(head, Window):
+        return head.cuts(query, rest)
+    return [(_narrow(query, clause), list(rest)) for clause in head.slices()]
+
+
+def ports(values: Iterable[int]) -> Dimension:
+    """Shortcut for ``Dimension.values("port", values)``."""
+    return Dimension.values("port", values)
+
+
+def countries(values: Iterable[str]) -> Dimension:
+    """Shortcut for ``Dimension.values("country", values)``."""
+    return Dimension.values("country", values)
+
+
+def _operand(query: str) -> str:
+    """``query``, parenthesised when it would not survive a term put next to it.
+
+    Terms side by side are all required, but ``OR`` binds looser:
+    ``a OR b port:80`` is ``a OR (b port:80)``. A query with an ``OR`` outside
+    any parentheses is wrapped, and so is one the local parser cannot read
+    but which has an ``OR`` somewhere.
+    """
+    if _enclosed(query):
+        return query
+    try:
+        wrap = isinstance(parse(query), Or)
+    except ParamError:
+        wrap = re.search(r"\bOR\b", query) is not None
+    return f"({query})" if wrap else query
+
+
+def _enclosed(query: str) -> bool:
+    """Whether ``query`` is a single parenthesised group."""
+    if not (query.startswith("(") and query.endswith(")")):
+        return False
+    depth, quoted = 0, False
+    for index, char in enumerate(query):
+        if char == '"' and query[index - 1 : index] != "\\":
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+            if depth == 0 and index < len(query) - 1:
+                return False
+    return True
+
+
+def _narrow(query: str, clause: str) -> str:
+    """``query``, restricted to the documents ``clause`` matches."""
+    return f"{_operand(query)} {_operand(clause)}"
+
+
+def plan(
+    count: Callable[[str], int],
+    query: str,
+    dimensions: Sequence[Slicer],
+    *,
+    target: int,
+    strict: bool = False,
+) -> list[str]:
+    """Split ``query`` until every sub-query counts at most ``target`` documents.
+
+    :param count: returns the number of documents a query matches
+    :param dimensions: applied in order, the next one only where a slice is
+        still too large
+    :param strict: raise on a slice still over ``target`` once every
+        dimension is used, rather than return it as is
+    :returns: disjoint sub-queries, empty ones dropped
+    :raises ParamError: on a slice that does not fit, when ``strict``
+    """
+    if target < 1:
+        raise ParamError("target must be at least 1")
+    return _plan(count, query, count(query), dimensions, target, strict)
+
+
+def _plan(
+    count: Callable[[str], int],
+    query: str,
+    total: int,
+    dimensions: Sequence[Slicer],
+    target: int,
+    strict: bool,
+) -> list[str]:
+    if total == 0:
+        return []
+    if total <= target:
+        return [query]
+    if not dimensions:
+        return [_oversized(query, total, target, strict)]
+    head, *rest = dimensions
+    cuts = _cuts(query, head, rest)
+    if not cuts:  # a window too short to halve, with nothing outside it
+        return _plan(count, query, total, rest, target, strict)
+    queries: list[str] = []
+    for narrowed, following in cuts:
+        queries.extend(_plan(count, narrowed, count(narrowed), following, target, strict))
+    return queries
+
+
+def check_target(target: int, use_export: bool) -> None:
+    """Reject a ``target`` too large for the Search API, when slices are walked with it."""
+    if not use_export and target > SEARCH_MAX_RESULTS:
+        raise ParamError(
+            f"target must be at most {SEARCH_MAX_RESULTS} without the Export API, "
+            "past which a search stops"
+        )
+
+
+def _oversized(query: str, total: int, target: int, strict: bool) -> str:
+    if strict:
+        raise ParamError(
+            f"{query!r} still matches {total} documents, over {target}: "
+            "slice it further, with another dimension or a shorter window minimum"
+        )
+    return query
+
+
+async def aplan(
+    count: Callable[[str], Awaitable[int]],
+    query: str,
+    dimensions: Sequence[Slicer],
+    *,
+    target: int,
+    strict: bool = False,
+    concurrency: int = COUNTS,
+) -> list[str]:
+    """Async :func:`plan`; the slices of one level are counted concurrently.
+
+    :param concurrency: counts in flight at most, across every level
+    """
+    if target < 1:
+        raise ParamError("target must be at least 1")
+    gate = asyncio.Semaphore(max(1, concurrency))
+
+    async def counted(query: str) -> int:
+        async with gate:
+            return await count(query)
+
+    async def split(query: str, total: int, dimensions: Sequence[Slicer]) -> list[str]:
+        if total == 0:
+            return []
+        if total <= target:
+            return [query]
+        if not dimensions:
+            return [_oversized(query, total, target, strict)]
+        head, *rest = dimensions
+        cuts = _cuts(query, head, rest)
+        if not cuts:
+            return await split(query, total, rest)
+
+        async def cut(narrowed: str, following: list[Slicer]) -> list[str]:
+            return await split(narrowed, await counted(narrowed), following)
+
+        nested = await asyncio.gather(*(cut(narrowed, following) for narrowed, following in cuts))
+        return [sub for group in nested for sub in group]
+
+    return await split(query, await counted(query), dimensions)
+
+
+def merge(
+    sources: Sequence[Callable[[], Iterable[dict[str, Any]]]], *, workers: int
+) -> Iterator[dict[str, Any]]:
+    """Drain ``sources`` on ``workers`` threads and yield their documents as they come.
+
+    The first error raised by a source is re-raised here once the other
+    workers have stopped. Closing the iterator early stops them as well.
+    """
+    if not sources:
+        return
+    buffer: queue.Queue[Any] = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def drain(source: Callable[[], Iterable[dict[str, Any]]]) -> None:
+        if stop.is_set():
+            return
+        documents: Iterable[dict[str, Any]] = ()
+        try:
+            documents = source()
+            for document in documents:
+                if not put(document):
+                    return
+        except Exception as exc:
+            put(exc)
+        finally:
+            # A stream left behind on stop or error releases its connection
+            # now, not whenever it happens to be collected.
+            close = getattr(documents, "close", None)
+            if close is not None:
+                close()
+            put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for source in sources:
+            pool.submit(contextvars.copy_context().run, drain, source)
+        pending = len(sources)
+        try:
+            while pending:
+                item = buffer.get()
+                if item is _DONE:
+                    pending -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+async def amerge(
+    sources: Sequence[Callable[[], AsyncIterator[dict[str, Any]]]], *, workers: int
+) -> AsyncIterator[dict[str, Any]]:
+    """Async :func:`merge`: at most ``workers`` sources are drained at once."""
+    if not sources:
+        return
+    buffer: asyncio.Queue[Any] = asyncio.Queue(maxsize=QUEUE_SIZE)
+    gate = asyncio.Semaphore(max(1, workers))
+
+    async def drain(source: Callable[[], AsyncIterator[dict[str, Any]]]) -> None:
+        async with gate:
+            documents: AsyncIterator[dict[str, Any]] | None = None
+            try:
+                documents = source()
+                async for document in documents:
+                    await buffer.put(document)
+            except Exception as exc:
+                await buffer.put(exc)
+            finally:
+                aclose = getattr(documents, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+                await buffer.put(_DONE)
+
+    tasks = [asyncio.create_task(drain(source)) for source in sources]
+    pending = len(tasks)
+    try:
+        while pending:
+            item = await buffer.get()
+            if item is _DONE:
+                pending -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,263 @@
+"""Many API keys, one connection pool.
+
+A platform serving many ONYPHE customers would otherwise build one client --
+and so one ``httpx`` pool and one set of TLS handshakes -- per customer. A pool
+keeps a single shared transport and hands out lightweight per-tenant clients:
+
+- each tenant client has an ``httpx`` client of its own over the shared
+  transport, so cookies and default headers never cross from one key to another
+- each carries its own :class:`~pyonyphe.config.Settings`, so its key is
+  applied when the request is prepared, never shared
+- each keeps its own retry state and, optionally, its own concurrency cap, so
+  one tenant draining its rate limit cannot hold every shared connection
+
+>>> with OnyphePool(max_connections=32) as pool:          # doctest: +SKIP
+...     pool.add("acme", "acme-api-key")
+...     pool["acme"].summary_ip("8.8.8.8")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+from contextlib import AbstractAsyncContextManager, AbstractContextManager, nullcontext
+from types import TracebackType
+from typing import Any
+
+import httpx
+
+from ._base import USER_AGENT
+from ._specs import Spec
+from .async_client import AsyncOnyphe
+from .client import Onyphe
+from .fields import Projection
+from .models import Response
+from .streaming import AsyncStreamHandle, StreamHandle
+
+__all__ = ["AsyncOnyphePool", "OnyphePool"]
+
+
+class _TenantOnyphe(Onyphe):
+    """:class:`Onyphe` over a shared pool, with an optional concurrency cap."""
+
+    def __init__(self, api_key: str, *, max_concurrency: int | None = None, **kwargs: Any) -> None:
+        super().__init__(api_key, **kwargs)
+        self._gate: AbstractContextManager[Any] = (
+            threading.BoundedSemaphore(max_concurrency) if max_concurrency else nullcontext()
+        )
+
+    def send(self, spec: Spec) -> Response:
+        with self._gate:
+            return super().send(spec)
+
+    def stream(self, spec: Spec, *, project: Projection | None = None) -> StreamHandle:
+        return self._stream(spec, gate=self._gate, project=project)
+
+
+class _TenantAsyncOnyphe(AsyncOnyphe):
+    """:class:`AsyncOnyphe` over a shared pool, with an optional concurrency cap."""
+
+    def __init__(self, api_key: str, *, max_concurrency: int | None = None, **kwargs: Any) -> None:
+        super().__init__(api_key, **kwargs)
+        self._gate: AbstractAsyncContextManager[Any] = (
+            asyncio.Semaphore(max_concurrency) if max_concurrency else _NullAsyncContext()
+        )
+
+    async def send(self, spec: Spec) -> Response:
+        async with self._gate:
+            return await super().send(spec)
+
+    def stream(self, spec: Spec, *, project: Projection | None = None) -> AsyncStreamHandle:
+        return self._stream(spec, gate=self._gate, project=project)
+
+
+class _NullAsyncContext:
+    async def __aenter__(self) -> None:
+        return None
+
+    async def __aexit__(self, *exc: object) -> None:
+        return None
+
+
+class _PoolBase:
+    """Tenant bookkeeping shared by both pools."""
+
+    def __init__(
+        self,
+        *,
+        timeout: float,
+        max_retries: int,
+        backoff: float,
+        user_agent: str,
+        max_concurrency: int | None,
+    ) -> None:
+        self._defaults: dict[str, Any] = {
+            "timeout": timeout,
+            "max_retries": max_retries,
+            "backoff": backoff,
+            "user_agent": user_agent,
+            "max_concurrency": max_concurrency,
+        }
+        self._tenants: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _options(self, overrides: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
+        """The tenant client's arguments, and those of its ``httpx`` client."""
+        options = {**self._defaults, **overrides}
+        return options, {"timeout": options["timeout"], "follow_redirects": True}
+
+    def __contains__(self, tenant: object) -> bool:
+        return tenant in self._tenants
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def tenants(self) -> list[str]:
+        """Identifiers of the registered tenants."""
+        return list(self._tenants)
+
+    def remove(self, tenant: str) -> None:
+        """Forget a tenant. The shared connections stay open for the others."""
+        with self._lock:
+            self._tenants.pop(tenant, None)
+
+
+class OnyphePool(_PoolBase):
+    """Blocking tenant clients sharing a single ``httpx.HTTPTransport``.
+
+    :param max_connections: connections open at once, across every tenant
+    :param max_keepalive: idle connections kept warm; defaults to ``max_connections``
+    :param timeout: per-request timeout in seconds, shared by every tenant
+    :param max_retries: default retry budget of a tenant
+    :param backoff: default base delay of a tenant's exponential backoff
+    :param max_concurrency: default cap on a tenant's in-flight calls, none when ``None``
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections: int = 20,
+        max_keepalive: int | None = None,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        user_agent: str = USER_AGENT,
+        max_concurrency: int | None = None,
+    ) -> None:
+        super().__init__(
+            timeout=timeout,
+            max_retries=max_retries,
+            backoff=backoff,
+            user_agent=user_agent,
+            max_concurrency=max_concurrency,
+        )
+        self._transport = httpx.HTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive or max_connections,
+            )
+        )
+        self._clients: weakref.WeakSet[httpx.Client] = weakref.WeakSet()
+
+    def add(self, tenant: str, api_key: str, **overrides: Any) -> Onyphe:
+        """Register a tenant, replacing any previous one with the same identifier.
+
+        :param overrides: per-tenant ``base_url``, ``unrated_email``,
+            ``timeout``, ``max_retries``, ``backoff``, ``max_concurrency``,
+            ``canonical_queries`` or ``hooks`` -- such as the hook of a
+            metrics exporter of its own
+        """
+        options, http_options = self._options(overrides)
+        http = httpx.Client(transport=self._transport, **http_options)
+        self._clients.add(http)
+        client = _TenantOnyphe(api_key, http_client=http, **options)
+        with self._lock:
+            self._tenants[tenant] = client
+        return client
+
+    def __getitem__(self, tenant: str) -> Onyphe:
+        return self._tenants[tenant]
+
+    def close(self) -> None:
+        """Close the shared connection pool; every tenant client stops working."""
+        for http in list(self._clients):
+            http.close()
+        self._transport.close()
+
+    def __enter__(self) -> OnyphePool:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class AsyncOnyphePool(_PoolBase):
+    """Async tenant clients sharing a single ``httpx.AsyncHTTPTransport``.
+
+    Takes the same arguments as :class:`OnyphePool`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections: int = 20,
+        max_keepalive: int | None = None,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        user_agent: str = USER_AGENT,
+        max_concurrency: int | None = None,
+    ) -> None:
+        super().__init__(
+            timeout=timeout,
+            max_retries=max_retries,
+            backoff=backoff,
+            user_agent=user_agent,
+            max_concurrency=max_concurrency,
+        )
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive or max_connections,
+            )
+        )
+        self._clients: weakref.WeakSet[httpx.AsyncClient] = weakref.WeakSet()
+
+    def add(self, tenant: str, api_key: str, **overrides: Any) -> AsyncOnyphe:
+        """Register a tenant, replacing any previous one with the same identifier.
+
+        :param overrides: as for :meth:`OnyphePool.add`
+        """
+        options, http_options = self._options(overrides)
+        http = httpx.AsyncClient(transport=self._transport, **http_options)
+        self._clients.add(http)
+        client = _TenantAsyncOnyphe(api_key, http_client=http, **options)
+        with self._lock:
+            self._tenants[tenant] = client
+        return client
+
+    def __getitem__(self, tenant: str) -> AsyncOnyphe:
+        return self._tenants[tenant]
+
+    async def aclose(self) -> None:
+        """Close the shared connection pool; every tenant client stops working."""
+        for http in list(self._clients):
+            await http.aclose()
+        await self._transport.aclose()
+
+    async def __aenter__(self) -> AsyncOnyphePool:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.aclose()
@@ -0,0 +1,188 @@
+"""Where the time of one run went, phase by phase.
+
+Backs the CLI's ``--profile`` option, and usable around any blocking client:
+
+>>> profile = Profile()
+>>> with Onyphe(transport=profile.transport(), hooks=[profile]) as api:  # doctest: +SKIP
+...     for doc in api.export("category:datascan"):
+...         with profile.phase("write"):
+...             sink.write(doc)
+...         profile.documents += 1
+>>> profile.finish()                                                      # doctest: +SKIP
+
+The network phases come from ``httpx``'s ``trace`` extension and from timing
+the response body as it is read:
+
+``connect``
+    TCP connection and TLS handshake
+``wait``
+    from sending the request to receiving the response headers
+``transfer``
+    reading the body off the socket
+``backoff``
+    sleeping before retries
+
+``serialize`` and ``write`` are timed, and documents counted, by whoever
+writes the output -- see :meth:`Profile.phase` -- and ``parse`` is what
+remains: decoding, validation, and the rest of the client's own work.
+
+Peak memory comes from :mod:`tracemalloc`, which slows allocation-heavy code
+noticeably; compare phases with each other, not with an unprofiled run.
+"""
+
+from __future__ import annotations
+
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any, cast
+
+import httpx
+
+from .hooks import RETRY_SCHEDULED, Event
+
+__all__ = ["PHASES", "Profile", "ProfilingTransport"]
+
+#: Phases in the order they are reported.
+PHASES = ("connect", "wait", "transfer", "parse", "backoff", "serialize", "write")
+
+
+class Profile:
+    """Time per phase, bytes, documents and peak memory of one run.
+
+    Starts measuring, :mod:`tracemalloc` included, when created.
+
+    :ivar phases: seconds spent in each of :data:`PHASES`
+    """
+
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.requests = 0
+        self.bytes = 0
+        self.documents = 0
+        self.peak_memory = 0
+        self.elapsed = 0.0
+        self._started = time.perf_counter()
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+
+    def transport(self, inner: httpx.BaseTransport | None = None) -> ProfilingTransport:
+        """A transport feeding the network phases of this profile."""
+        return ProfilingTransport(self, inner or httpx.HTTPTransport())
+
+    def __call__(self, event: Event) -> None:
+        if event.name == RETRY_SCHEDULED:
+            self.phases["backoff"] += event.delay
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Account ``seconds`` to ``phase``."""
+        self.phases[phase] += seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Account the time spent in the block to ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - started
+
+    def finish(self) -> None:
+        """Stop measuring; ``parse`` gets the time no other phase accounts for."""
+        self.elapsed = time.perf_counter() - self._started
+        if self._tracing:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self._tracing = False
+        measured = sum(seconds for name, seconds in self.phases.items() if name != "parse")
+        self.phases["parse"] = max(0.0, self.elapsed - measured)
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Plain-data view, ready for ``json.dumps``."""
+        return {
+            "elapsed": self.elapsed,
+            "phases": dict(self.phases),
+            "requests": self.requests,
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "documents_per_second": self.documents_per_second,
+            "megabytes_per_second": self.megabytes_per_second,
+            "peak_memory": self.peak_memory,
+        }
+
+
+class ProfilingTransport(httpx.BaseTransport):
+    """Wrap a transport, accounting connect, wait and transfer to a :class:`Profile`."""
+
+    def __init__(self, profile: Profile, inner: httpx.BaseTransport) -> None:
+        self.profile = profile
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        profile = self.profile
+        marks: dict[str, float] = {}
+        chained = request.extensions.get("trace")
+
+        def trace(name: str, info: dict[str, Any]) -> None:
+            # Event names look like "connection.connect_tcp.started" or
+            # "http11.receive_response_headers.complete": keep the step.
+            now = time.perf_counter()
+            _, _, step = name.partition(".")
+            step, _, stage = step.rpartition(".")
+            if stage == "started":
+                marks[step] = now
+            elif stage in ("complete", "failed") and step in marks:
+                spent = now - marks.pop(step)
+                if step in ("connect_tcp", "connect_unix_socket", "start_tls"):
+                    profile.phases["connect"] += spent
+            if step == "send_request_headers" and stage == "started":
+                marks["request"] = now
+            elif step == "receive_response_headers" and stage == "complete" and "request" in marks:
+                profile.phases["wait"] += now - marks.pop("request")
+            if chained is not None:
+                chained(name, info)
+
+        request.extensions["trace"] = trace
+        profile.requests += 1
+        response = self.inner.handle_request(request)
+        stream = _TimedStream(cast(httpx.SyncByteStream, response.stream), profile)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=stream,
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class _TimedStream(httpx.SyncByteStream):
+    def __init__(self, inner: httpx.SyncByteStream, profile: Profile) -> None:
+        self._inner = inner
+        self._profile = profile
+
+    def __iter__(self) -> Iterator[bytes]:
+        profile = self._profile
+        chunks = iter(self._inner)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            profile.phases["transfer"] += time.perf_counter() - started
+            if chunk is None:
+                return
+            profile.bytes += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        self._inner.close()
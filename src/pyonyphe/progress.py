@@ -0,0 +1,117 @@
+"""A live, one-line status for long streams.
+
+>>> progress = Progress(total=None)
+>>> api.add_hook(progress)                                 # doctest: +SKIP
+>>> for doc in progress.track(api.export("category:datascan")):  # doctest: +SKIP
+...     ...
+>>> progress.close()                                       # doctest: +SKIP
+
+Documents are counted as the consumer pulls them through :meth:`Progress.track`;
+bytes and retries come from the client hooks. The line is redrawn at most
+every ``interval`` seconds, so the only per-document cost is a counter and a
+clock read.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from typing import TextIO, TypeVar
+
+from .hooks import RETRY_SCHEDULED, STREAM_CHUNK, Event
+
+__all__ = ["Progress"]
+
+T = TypeVar("T")
+
+
+def _size(count: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1000:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1000
+    return f"{count:.1f} TB"
+
+
+def _clock(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+class Progress:
+    """Documents, bytes, rates, elapsed time, ETA and retries, on one line.
+
+    :param stream: where to draw; standard error by default
+    :param total: documents expected, for the ETA; none when unknown
+    :param interval: seconds between two redraws
+    """
+
+    def __init__(
+        self, stream: TextIO | None = None, *, total: int | None = None, interval: float = 0.25
+    ) -> None:
+        self.stream = stream or sys.stderr
+        self.total = total
+        self.interval = interval
+        self.documents = 0
+        self.bytes = 0
+        self.retries: Counter[str] = Counter()
+        self.backoff = 0.0
+        self._started = time.perf_counter()
+        self._next = self._started + interval
+        self._last = (self._started, 0)
+        self._rate = 0.0
+        self._drawn = False
+
+    def __call__(self, event: Event) -> None:
+        if event.name == STREAM_CHUNK:
+            self.bytes += event.bytes
+        elif event.name == RETRY_SCHEDULED:
+            self.retries[str(event.status) if event.status is not None else "transport"] += 1
+            self.backoff += event.delay
+            # A retry means a pause: show it now rather than after the sleep.
+            self.refresh(time.perf_counter())
+
+    def track(self, items: Iterable[T]) -> Iterator[T]:
+        """Yield ``items`` unchanged, counting them and redrawing when due."""
+        clock = time.perf_counter
+        for item in items:
+            self.documents += 1
+            if clock() >= self._next:
+                self.refresh(clock())
+            yield item
+
+    def refresh(self, now: float) -> None:
+        """Redraw the line."""
+        self._next = now + self.interval
+        since, seen = self._last
+        if now > since:
+            instant = (self.documents - seen) / (now - since)
+            # Smoothed, so the figure is readable rather than flickering.
+            self._rate = instant if not self._drawn else 0.7 * self._rate + 0.3 * instant
+        self._last = (now, self.documents)
+        elapsed = now - self._started
+        average = self.documents / elapsed if elapsed else 0.0
+        parts = [f"{self.documents:,} docs"]
+        if self.bytes:
+            parts.append(_size(self.bytes))
+        parts.append(f"{self._rate:,.0f} docs/s (avg {average:,.0f})")
+        parts.append(_clock(elapsed))
+        if self.total and average:
+            remaining = max(0, self.total - self.documents)
+            parts.append(f"ETA {_clock(remaining / average)}")
+        if self.retries:
+            reasons = ", ".join(f"{count} x {name}" for name, count in sorted(self.retries.items()))
+            parts.append(f"retries {reasons}, {self.backoff:.1f}s backoff")
+        self.stream.write("\r\x1b[2K" + "  ".join(parts))
+        self.stream.flush()
+        self._drawn = True
+
+    def close(self) -> None:
+        """Erase the line, leaving the terminal as it was."""
+        if self._drawn:
+            self.stream.write("\r\x1b[2K")
+            self.stream.flush()
+            self._drawn = False
@@ -0,0 +1,155 @@
+"""Prometheus metrics for both clients.
+
+Installed as an optional extra::
+
+    uv add 'pyonyphe[prometheus]'
+
+>>> from prometheus_client import start_http_server
+>>> from pyonyphe.prometheus import instrument
+>>> api = AsyncOnyphe()                                   # doctest: +SKIP
+>>> instrument(api)                                       # doctest: +SKIP
+>>> start_http_server(9464, addr="127.0.0.1")             # doctest: +SKIP
+
+Series are labelled by :attr:`~pyonyphe.hooks.Event.endpoint`, never by the
+queried value, so their number stays bounded however long the process runs.
+Several clients can share one :class:`PrometheusHook`; a second hook on the
+same registry needs its own ``namespace``.
+"""
+
+from __future__ import annotations
+
+import threading
+import weakref
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+
+from ._base import BaseClient, PreparedRequest
+from .hooks import (
+    REQUEST_FINISHED,
+    REQUEST_PREPARED,
+    RETRY_SCHEDULED,
+    STREAM_FINISHED,
+    Event,
+)
+from .metrics import DEFAULT_BUCKETS
+
+__all__ = ["PrometheusHook", "instrument"]
+
+
+class PrometheusHook:
+    """A hook publishing client events as Prometheus metrics.
+
+    :param registry: where to register the metrics; the default global one
+    :param namespace: prefix of every metric name
+    :param buckets: latency histogram bounds, in seconds
+
+    :ivar requests: calls finished, by ``endpoint`` and final ``status``
+        (``error`` when no response came back)
+    :ivar retries: retries scheduled, by ``endpoint`` and ``reason``
+        (the HTTP status, or ``transport``)
+    :ivar rate_limit_wait: seconds slept after a 429, by ``endpoint``
+    :ivar in_flight: calls started and not yet finished, by ``endpoint``
+    :ivar duration: whole-call latency, retries and sleeps included
+    :ivar documents: documents streamed, by ``endpoint``
+    :ivar bytes: bytes streamed, by ``endpoint``
+    """
+
+    def __init__(
+        self,
+        registry: CollectorRegistry | None = REGISTRY,
+        *,
+        namespace: str = "onyphe",
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        common = {"namespace": namespace, "registry": registry}
+        self.requests = Counter(
+            "requests", "ONYPHE calls finished.", ["endpoint", "status"], **common
+        )
+        self.retries = Counter(
+            "retries", "ONYPHE retries scheduled.", ["endpoint", "reason"], **common
+        )
+        self.rate_limit_wait = Counter(
+            "rate_limit_wait_seconds",
+            "Seconds slept waiting out ONYPHE rate limits.",
+            ["endpoint"],
+            **common,
+        )
+        self.in_flight = Gauge(
+            "in_flight_requests", "ONYPHE calls in progress.", ["endpoint"], **common
+        )
+        self.duration = Histogram(
+            "request_duration_seconds",
+            "ONYPHE call latency, retries included.",
+            ["endpoint"],
+            buckets=buckets,
+            **common,
+        )
+        self.documents = Counter(
+            "stream_documents", "Documents streamed from ONYPHE.", ["endpoint"], **common
+        )
+        self.bytes = Counter("stream_bytes", "Bytes streamed from ONYPHE.", ["endpoint"], **common)
+        # A call counts as in flight from its first event to its last. Calls
+        # are tracked so a stream that is never started, and so never
+        # finishes, cannot push the gauge below zero; and one dropped
+        # unfinished leaves the gauge once its request is collected.
+        self._started: dict[int, tuple[str, weakref.finalize]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> None:
+        name = event.name
+        endpoint = event.endpoint
+        if name == REQUEST_PREPARED:
+            self._enter(event.request)
+        elif name == RETRY_SCHEDULED:
+            reason = str(event.status) if event.status is not None else "transport"
+            self.retries.labels(endpoint, reason).inc()
+            if event.status == 429:
+                self.rate_limit_wait.labels(endpoint).inc(event.delay)
+        elif name in (REQUEST_FINISHED, STREAM_FINISHED):
+            self._leave(event.request)
+            status = "error" if event.status is None else str(event.status)
+            self.requests.labels(endpoint, status).inc()
+            self.duration.labels(endpoint).observe(event.elapsed)
+            if name == STREAM_FINISHED:
+                self.documents.labels(endpoint).inc(event.documents)
+                self.bytes.labels(endpoint).inc(event.bytes)
+
+    def _enter(self, request: PreparedRequest) -> None:
+        key = id(request)
+        # An id is only reused once its object is gone, and the finalizer
+        # forgets the call first: an entry is always the live request's.
+        finalizer = weakref.finalize(request, self._forget, key)
+        finalizer.atexit = False
+        with self._lock:
+            self._started[key] = (request.endpoint, finalizer)
+        self.in_flight.labels(request.endpoint).inc()
+
+    def _leave(self, request: PreparedRequest) -> None:
+        with self._lock:
+            entry = self._started.pop(id(request), None)
+        if entry is not None:
+            endpoint, finalizer = entry
+            finalizer.detach()
+            self.in_flight.labels(endpoint).dec()
+
+    def _forget(self, key: int) -> None:
+        """Leave the gauge for a call whose request was collected unfinished."""
+        with self._lock:
+            entry = self._started.pop(key, None)
+        if entry is not None:
+            self.in_flight.labels(entry[0]).dec()
+
+
+def instrument(
+    client: BaseClient,
+    registry: CollectorRegistry | None = REGISTRY,
+    *,
+    namespace: str = "onyphe",
+) -> PrometheusHook:
+    """Publish metrics for every call ``client`` makes from now on.
+
+    :returns: the hook, to share with other clients or to remove later
+    """
+    hook = PrometheusHook(registry, namespace=namespace)
+    client.add_hook(hook)
+    return hook
@@ -0,0 +1,995 @@
+"""Writing documents out, fast.
+
+>>> with NDJSONSink.open("datascan.ndjson") as sink:                   # doctest: +SKIP
+...     count = copy(api.export("category:datascan"), sink)
+
+An export has two halves: pulling documents off the network and decoding
+them, then encoding and writing them. :func:`copy` hands documents over in
+batches, an :class:`NDJSONSink` gathers their lines into large blocks, and
+a :class:`BackgroundWriter` -- which :meth:`NDJSONSink.open` puts under
+every file -- writes the blocks on a thread of its own, through a bounded
+queue. A disk, pipe or network share that stalls no longer stalls the
+socket, and the socket never waits on a ``write``.
+
+Decoding and encoding stay on the calling thread: both need the GIL, and
+splitting them across threads only makes each wait for the other.
+
+Output can be compressed on the way, chosen by file suffix or explicitly:
+
+>>> with NDJSONSink.open("datascan.ndjson.zst", threads=4) as sink:    # doctest: +SKIP
+...     copy(api.export("category:datascan"), sink)
+
+Compression runs on the writer thread, next to decoding on the calling one;
+``threads`` spreads it over more. gzip is written as a series of
+independent members, one per block, which is what lets it go parallel --
+``gzip -d``, ``zcat`` and :mod:`gzip` read them as a single stream. zstd
+needs the ``zstd`` extra. Flushing a compressed stream writes out what is
+already compressed but never ends a gzip member or a zstd block early, so
+the frequent flushes of a slow :func:`copy` cost nothing in ratio: a member
+ends once its block is full, and the last one on close.
+
+Anything with ``write_many``, ``flush`` and ``close`` -- the :class:`Sink`
+protocol -- can be copied to, and a :class:`TeeSink` copies to several at
+once.
+"""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import islice
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Protocol, TypeVar, cast
+
+from .errors import ParamError
+from .fields import Getter, getter, paths
+
+__all__ = [
+    "COMPRESSIONS",
+    "DEFAULT_BUFFER_SIZE",
+    "DEFAULT_LEVELS",
+    "Aggregator",
+    "BackgroundWriter",
+    "BinaryStream",
+    "DelimitedSink",
+    "GzipWriter",
+    "NDJSONSink",
+    "Shard",
+    "ShardedSink",
+    "SharedWriter",
+    "Sink",
+    "TeeSink",
+    "batched",
+    "compress",
+    "compression_for",
+    "copy",
+    "open_output",
+]
+
+#: Bytes an :class:`NDJSONSink` gathers before writing them out.
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+#: Compression formats, by the file suffixes that select them.
+COMPRESSIONS = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+#: Level used when none is given: that of the ``gzip`` and ``zstd`` commands.
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+Row = dict[str, Any]
+S = TypeVar("S", bound="NDJSONSink")
+
+
+class BinaryStream(Protocol):
+    """The part of a binary file a sink writes through."""
+
+    def write(self, data: bytes, /) -> int: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class Sink(Protocol):
+    """Where :func:`copy` writes documents to."""
+
+    def write_many(self, rows: Sequence[Row]) -> None: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class NDJSONSink:
+    """Newline-delimited JSON onto a binary stream, in large writes.
+
+    :param stream: where to write
+    :param buffer_size: bytes gathered before each write to ``stream``
+    :param owned: close ``stream`` with the sink; only flush it otherwise
+    """
+
+    def __init__(
+        self, stream: BinaryStream, *, buffer_size: int = DEFAULT_BUFFER_SIZE, owned: bool = False
+    ) -> None:
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.owned = owned
+        self._parts: list[bytes] = []
+        self._size = 0
+
+    @classmethod
+    def open(
+        cls: type[S],
+        path: str | Path,
+        *,
+        compression: str | None = "auto",
+        level: int | None = None,
+        threads: int = 0,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        **options: Any,
+    ) -> S:
+        """A sink writing to a new file at ``path``, from a background thread.
+
+        ``compression``, ``level`` and ``threads`` are those of :func:`open_output`;
+        ``options`` go to the sink.
+        """
+        stream = open_output(path, compression=compression, level=level, threads=threads)
+        writer = BackgroundWriter(stream, owned=True)
+        return cls(writer, buffer_size=buffer_size, owned=True, **options)
+
+    @staticmethod
+    def encode(rows: Sequence[Row]) -> bytes:
+        """The NDJSON lines of ``rows``."""
+        if not rows:
+            return b""
+        text = "\n".join([json.dumps(row, ensure_ascii=False) for row in rows])
+        return (text + "\n").encode("utf-8")
+
+    def write_bytes(self, data: bytes) -> None:
+        """Queue already encoded lines, writing them out once the buffer is full."""
+        self._parts.append(data)
+        self._size += len(data)
+        if self._size >= self.buffer_size:
+            self._drain()
+
+    def write_many(self, rows: Sequence[Row]) -> None:
+        self.write_bytes(self.encode(rows))
+
+    def write(self, row: Row) -> None:
+        self.write_bytes(self.encode((row,)))
+
+    def _drain(self) -> None:
+        if self._parts:
+            self.stream.write(b"".join(self._parts))
+            self._parts.clear()
+            self._size = 0
+
+    def flush(self) -> None:
+        """Write out whatever is buffered, down to the operating system."""
+        self._drain()
+        self.stream.flush()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            if self.owned:
+                self.stream.close()
+
+    def __enter__(self: S) -> S:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class DelimitedSink(NDJSONSink):
+    """CSV, or TSV with ``delimiter="\\t"``, one row per document.
+
+    Columns are dotted paths into the documents (see :mod:`pyonyphe.fields`);
+    without ``fields``, they are the leaves of the first document, and a
+    field only later documents have is left out -- ``on_dropped`` tells of
+    the first one. Lists are
+    joined with ``list_separator``; objects, and lists of objects, are
+    written as JSON. Rows are encoded a batch at a time and gathered into
+    large writes, as NDJSON lines are.
+
+    :param stream: where to write
+    :param fields: the columns, in order
+    :param delimiter: between two cells
+    :param list_separator: between the items of a list
+    :param header: start with a row of column names
+    :param buffer_size: bytes gathered before each write to ``stream``
+    :param owned: close ``stream`` with the sink; only flush it otherwise
+    :param on_dropped: without ``fields``, called with the first field left
+        out; documents are checked against the columns until then
+    """
+
+    def __init__(
+        self,
+        stream: BinaryStream,
+        fields: Sequence[str] | None = None,
+        *,
+        delimiter: str = ",",
+        list_separator: str = "|",
+        header: bool = True,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        owned: bool = False,
+        on_dropped: Callable[[str], Any] | None = None,
+    ) -> None:
+        super().__init__(stream, buffer_size=buffer_size, owned=owned)
+        self.fields: list[str] | None = None
+        self.list_separator = list_separator
+        self._on_dropped = on_dropped if fields is None else None
+        self._header = header
+        self._getters: list[Getter] = []
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text, delimiter=delimiter, lineterminator="\n")
+        if fields is not None:
+            self._columns(list(fields))
+
+    def _columns(self, fields: list[str]) -> None:
+        self.fields = fields
+        self._getters = [getter(field) for field in fields]
+        if self._header:
+            self._writer.writerow(fields)
+
+    def _dropped(self, rows: Sequence[Row]) -> str | None:
+        """The first field of ``rows`` no column covers, if any."""
+        columns = set(cast(list[str], self.fields))
+        for row in rows:
+            for path in paths(row):
+                # app.http.title is written with an app column, as JSON.
+                prefix = path
+                while prefix not in columns:
+                    prefix, dot, _ = prefix.rpartition(".")
+                    if not dot:
+                        return path
+        return None
+
+    def _cell(self, value: Any) -> Any:
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        if isinstance(value, list) and not any(isinstance(item, (dict, list)) for item in value):
+            return self.list_separator.join(str(self._cell(item)) for item in value)
+        return json.dumps(value, ensure_ascii=False)
+
+    def encode(self, rows: Sequence[Row]) -> bytes:  # type: ignore[override]
+        """The lines of ``rows``, after the header if this is the first batch."""
+        if self.fields is None:
+            if not rows:
+                return b""
+            self._columns(list(paths(rows[0])))
+        if self._on_dropped is not None and (field := self._dropped(rows)) is not None:
+            on_dropped, self._on_dropped = self._on_dropped, None
+            on_dropped(field)
+        cell, getters = self._cell, self._getters
+        self._writer.writerows([[cell(get(row)) for get in getters] for row in rows])
+        text = self._text.getvalue()
+        self._text.seek(0)
+        self._text.truncate()
+        return text.encode("utf-8")
+
+
+# -- compression -------------------------------------------------------------
+
+
+def compression_for(path: str | Path) -> str | None:
+    """The compression format the suffix of ``path`` asks for, if any."""
+    return COMPRESSIONS.get(Path(path).suffix.lower())
+
+
+class GzipWriter:
+    """Gzip onto a binary stream, one member per ``block_size`` bytes.
+
+    Members are independent, so with ``threads`` they are compressed side by
+    side -- :mod:`zlib` releases the GIL -- and written in order.
+
+    :param stream: where the compressed data goes
+    :param level: 1 (fastest) to 9 (smallest)
+    :param threads: compressing threads; ``0`` compresses on the writing one
+    :param owned: close ``stream`` with the writer; only flush it otherwise
+    """
+
+    def __init__(
+        self,
+        stream: BinaryStream,
+        *,
+        level: int = DEFAULT_LEVELS["gzip"],
+        threads: int = 0,
+        block_size: int = DEFAULT_BUFFER_SIZE,
+        owned: bool = False,
+    ) -> None:
+        self.stream = stream
+        self.level = level
+        self.block_size = block_size
+        self.owned = owned
+        self._pending = bytearray()
+        self._pool = ThreadPoolExecutor(threads, "pyonyphe-gzip") if threads > 0 else None
+        self._window = 2 * threads
+        self._members: deque[Future[bytes]] = deque()
+
+    def _member(self, block: bytes) -> bytes:
+        return gzip.compress(block, self.level, mtime=0)
+
+    def _submit(self, block: bytes) -> None:
+        if self._pool is None:
+            self.stream.write(self._member(block))
+            return
+        self._members.append(self._pool.submit(self._member, block))
+        while len(self._members) > self._window:
+            self.stream.write(self._members.popleft().result())
+
+    def _drain(self, *, wait: bool) -> None:
+        while self._members and (wait or self._members[0].done()):
+            self.stream.write(self._members.popleft().result())
+
+    def write(self, data: bytes) -> int:
+        self._pending += data
+        while len(self._pending) >= self.block_size:
+            self._submit(bytes(self._pending[: self.block_size]))
+            del self._pending[: self.block_size]
+        return len(data)
+
+    def flush(self) -> None:
+        """Write out the members already compressed, and flush ``stream``.
+
+        What is pending waits for its block to fill, or for :meth:`close`:
+        a member per flush would make many small ones.
+        """
+        self._drain(wait=False)
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Compress what is pending and write every member out."""
+        try:
+            if self._pending:
+                self._submit(bytes(self._pending))
+                self._pending.clear()
+            self._drain(wait=True)
+            self.stream.flush()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+            if self.owned:
+                self.stream.close()
+
+
+class _ZstdWriter:
+    """A zstd frame onto a binary stream, only ended by :meth:`close`.
+
+    The writer of :mod:`zstandard` ends a block on each ``flush``; here,
+    flushing only flushes ``stream``.
+    """
+
+    def __init__(self, stream: BinaryStream, compressor: Any, *, owned: bool) -> None:
+        self.stream = stream
+        self.owned = owned
+        self._writer = compressor.stream_writer(stream, closefd=owned)
+
+    def write(self, data: bytes) -> int:
+        self._writer.write(data)
+        return len(data)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def close(self) -> None:
+        # Ends the frame, and closes stream when owned.
+        self._writer.close()
+        if not self.owned:
+            self.stream.flush()
+
+
+def compress(
+    stream: BinaryStream,
+    compression: str | None,
+    *,
+    level: int | None = None,
+    threads: int = 0,
+    owned: bool = False,
+) -> BinaryStream:
+    """Wrap ``stream`` so that what is written to it gets compressed.
+
+    :param compression: ``"gzip"``, ``"zstd"``, or ``None`` for ``stream`` itself
+    :param level: compression level; :data:`DEFAULT_LEVELS` when ``None``
+    :param threads: compressing threads besides the writing one
+    :param owned: close ``stream`` when the compressing one is closed
+    :raises ParamError: on an unknown format, or zstd without its extra
+    """
+    if compression is None:
+        return stream
+    if compression in DEFAULT_LEVELS and level is None:
+        level = DEFAULT_LEVELS[compression]
+    if compression == "gzip":
+        return GzipWriter(stream, level=cast(int, level), threads=threads, owned=owned)
+    if compression == "zstd":
+        # Imported here: zstandard is the `zstd` extra.
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise ParamError(
+                "zstd output needs the zstandard package: install the pyonyphe[zstd] extra"
+            ) from exc
+        compressor = zstandard.ZstdCompressor(
+            level=level or DEFAULT_LEVELS["zstd"], threads=threads
+        )
+        return _ZstdWriter(stream, compressor, owned=owned)
+    known = ", ".join(sorted(set(COMPRESSIONS.values())))
+    raise ParamError(f"unknown compression {compression!r}, expected one of {known}")
+
+
+def open_output(
+    path: str | Path,
+    *,
+    compression: str | None = "auto",
+    level: int | None = None,
+    threads: int = 0,
+) -> BinaryStream:
+    """Create the file at ``path``, compressed as asked.
+
+    :param compression: ``"auto"`` to go by the suffix of ``path`` (``.gz``,
+        ``.zst``), ``"gzip"``, ``"zstd"``, or ``None`` for none
+    :raises ParamError: as :func:`compress` does
+    """
+    if compression == "auto":
+        compression = compression_for(path)
+    handle = Path(path).open("wb")  # noqa: SIM115 - closed with the returned stream
+    try:
+        return compress(handle, compression, level=level, threads=threads, owned=True)
+    except BaseException:
+        handle.close()
+        raise
+
+
+# -- the pipeline ------------------------------------------------------------
+
+
+class BackgroundWriter:
+    """A binary stream whose writes happen on a thread of their own.
+
+    Blocks are queued, at most ``depth`` of them, and written in order; the
+    caller only waits when the queue is full. An error while writing is
+    raised by the next call to :meth:`write`, :meth:`flush` or :meth:`close`.
+
+    :param stream: where the blocks end up
+    :param depth: blocks queued at most
+    :param owned: close ``stream`` with the writer; only flush it otherwise
+    """
+
+    _FLUSH = b""
+
+    def __init__(self, stream: BinaryStream, *, depth: int = 8, owned: bool = False) -> None:
+        self.stream = stream
+        self.owned = owned
+        self._blocks: queue.Queue[bytes | None] = queue.Queue(maxsize=depth)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="pyonyphe-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while (block := self._blocks.get()) is not None:
+            if self._error is not None:
+                continue  # drain, so that the caller never blocks on a full queue
+            try:
+                if block is self._FLUSH:
+                    self.stream.flush()
+                else:
+                    self.stream.write(block)
+            except BaseException as exc:  # re-raised on the caller's thread
+                self._error = exc
+
+    def _check(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, data: bytes) -> int:
+        self._check()
+        if data:
+            self._blocks.put(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        """Have what was written so far handed to the operating system, soon."""
+        self._check()
+        self._blocks.put(self._FLUSH)
+
+    def close(self) -> None:
+        """Wait for every block to be written."""
+        if self._thread.is_alive():
+            self._blocks.put(self._FLUSH)
+            self._blocks.put(None)
+            self._thread.join()
+        try:
+            self._check()
+        finally:
+            if self.owned:
+                self.stream.close()
+
+
+class SharedWriter:
+    """Writes to many streams, on a single thread of its own.
+
+    :meth:`lane` gives a stream per file; writes, flushes and closes of all
+    lanes are queued, at most ``depth`` of them, and carried out in order.
+    An error is raised by the next call on any lane, or by :meth:`close`.
+    """
+
+    def __init__(self, *, depth: int = 32) -> None:
+        self._queue: queue.Queue[tuple[BinaryStream, bytes | None] | None] = queue.Queue(
+            maxsize=depth
+        )
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="pyonyphe-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while (item := self._queue.get()) is not None:
+            stream, data = item
+            if self._error is not None:
+                continue
+            try:
+                if data is None:
+                    stream.close()
+                elif data:
+                    stream.write(data)
+                else:
+                    stream.flush()
+            except BaseException as exc:  # re-raised on the caller's thread
+                self._error = exc
+
+    def put(self, stream: BinaryStream, data: bytes | None) -> None:
+        """Queue ``data`` for ``stream``: empty to flush it, ``None`` to close it."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        self._queue.put((stream, data))
+
+    def lane(self, stream: BinaryStream) -> BinaryStream:
+        """``stream``, written from the thread."""
+        return _Lane(self, stream)
+
+    def close(self) -> None:
+        """Wait for everything queued to be done."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+class _Lane:
+    def __init__(self, writer: SharedWriter, stream: BinaryStream) -> None:
+        self.writer = writer
+        self.stream = stream
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self.writer.put(self.stream, bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        self.writer.put(self.stream, b"")
+
+    def close(self) -> None:
+        self.writer.put(self.stream, None)
+
+
+# -- sharding ----------------------------------------------------------------
+
+
+#: Suffix of each compression format, for the shards of a :class:`ShardedSink`.
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+#: Hive's name for the shard of documents without the routing field.
+DEFAULT_SHARD = "__HIVE_DEFAULT_PARTITION__"
+
+
+@dataclass(slots=True)
+class Shard:
+    """One file of a :class:`ShardedSink`, as its manifest lists it."""
+
+    #: Relative to the output directory, with ``/`` separators.
+    path: str
+    #: Value of the routing field, ``None`` when not routing.
+    key: str | None
+    documents: int = 0
+    #: Bytes written, before compression.
+    bytes: int = 0
+    #: Bytes on disk, once closed.
+    size: int = 0
+
+
+class _Open:
+    def __init__(self, shard: Shard, sink: NDJSONSink) -> None:
+        self.shard = shard
+        self.sink = sink
+
+
+class ShardedSink:
+    """Documents spread over many files, for downstream jobs to read in parallel.
+
+    Documents go to a shard by the value of the ``by`` field, into Hive-style
+    directories such as ``category=datascan/`` (for ``by="@category"``), and
+    a shard rolls over to a new part, ``part-00001.ndjson`` and on, once it
+    holds ``max_documents`` documents or ``max_bytes`` bytes. At most
+    ``max_open`` files are open at once: the least recently used is closed
+    beyond that, and continues in a new part if its key comes back.
+
+    Every file is written from a single background thread, compressed as
+    ``compression`` says. ``manifest.json`` lists the shards, their key,
+    documents and size once the sink is closed.
+
+    :param directory: where the shards go; created if need be
+    :param by: dotted path of the field routing documents, such as
+        ``"@category"``, ``"country"`` or ``"port"``; one series of parts if ``None``
+    :param max_documents: documents per part, at most
+    :param max_bytes: bytes per part before compression; a part rolls over
+        once it reaches that, so it may end a batch beyond
+    :param max_open: files open at once
+    :param compression: ``"gzip"``, ``"zstd"`` or ``None``, with ``level``
+    :param kind: the sink writing each file, such as :class:`DelimitedSink`
+    :param suffix: of each file, before that of the compression
+    :param buffer_size: bytes each shard gathers before each write
+    :param options: for ``kind``, such as ``fields``
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        by: str | None = None,
+        max_documents: int | None = None,
+        max_bytes: int | None = None,
+        max_open: int = 64,
+        compression: str | None = None,
+        level: int | None = None,
+        kind: type[NDJSONSink] = NDJSONSink,
+        suffix: str = ".ndjson",
+        buffer_size: int = 256 * 1024,
+        **options: Any,
+    ) -> None:
+        if compression is not None and compression not in SUFFIXES:
+            known = ", ".join(SUFFIXES)
+            raise ParamError(f"unknown compression {compression!r}, expected one of {known}")
+        for name, value in (
+            ("max_documents", max_documents),
+            ("max_bytes", max_bytes),
+            ("max_open", max_open),
+        ):
+            if value is not None and value < 1:
+                raise ParamError(f"{name} must be at least 1")
+        self.directory = Path(directory)
+        self.by = by
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.max_open = max_open
+        self.compression = compression
+        self.level = level
+        self.kind = kind
+        self.suffix = suffix + SUFFIXES.get(compression or "", "")
+        self.buffer_size = buffer_size
+        self.options = options
+        self.shards: list[Shard] = []
+        self._route = getter(by) if by else None
+        # category=datascan/, as ParquetSink does: no @ in directory names.
+        self._name = (by or "").lstrip("@")
+        self._open: OrderedDict[str | None, _Open] = OrderedDict()
+        self._parts: dict[str | None, int] = {}
+        self._writer = SharedWriter()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, row: Row) -> str | None:
+        if self._route is None:
+            return None
+        value = self._route(row)
+        if isinstance(value, list):
+            value = ",".join(str(item) for item in value)
+        text = str(value) if value not in (None, "") else DEFAULT_SHARD
+        # A value is a directory name: keep it one, and a reasonable one.
+        return text.replace("/", "_").replace("\\", "_")[:200]
+
+    def _shard(self, key: str | None) -> _Open:
+        current = self._open.get(key)
+        if current is not None:
+            self._open.move_to_end(key)
+            return current
+        if len(self._open) >= self.max_open:
+            _, oldest = self._open.popitem(last=False)
+            oldest.sink.close()
+        part = self._parts.get(key, 0)
+        self._parts[key] = part + 1
+        relative = f"part-{part:05d}{self.suffix}"
+        if key is not None:
+            relative = f"{self._name}={key}/{relative}"
+        path = self.directory / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stream = open_output(path, compression=self.compression, level=self.level)
+        sink = self.kind(
+            self._writer.lane(stream), buffer_size=self.buffer_size, owned=True, **self.options
+        )
+        current = self._open[key] = _Open(Shard(relative, key), sink)
+        self.shards.append(current.shard)
+        return current
+
+    def write_many(self, rows: Sequence[Row]) -> None:
+        groups: dict[str | None, list[Row]] = {}
+        for row in rows:
+            key = self._key(row)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = []
+            group.append(row)
+        for key, group in groups.items():
+            start = 0
+            while start < len(group):
+                current = self._shard(key)
+                shard = current.shard
+                room = len(group) - start
+                if self.max_documents is not None:
+                    room = min(room, self.max_documents - shard.documents)
+                data = current.sink.encode(group[start : start + room])
+                current.sink.write_bytes(data)
+                shard.documents += room
+                shard.bytes += len(data)
+                start += room
+                if self._full(shard):
+                    del self._open[key]
+                    current.sink.close()
+
+    def _full(self, shard: Shard) -> bool:
+        if self.max_documents is not None and shard.documents >= self.max_documents:
+            return True
+        return self.max_bytes is not None and shard.bytes >= self.max_bytes
+
+    def write(self, row: Row) -> None:
+        self.write_many((row,))
+
+    def flush(self) -> None:
+        for current in self._open.values():
+            current.sink.flush()
+
+    def close(self) -> None:
+        """Close every shard, then write the manifest."""
+        try:
+            for current in self._open.values():
+                current.sink.close()
+        finally:
+            self._open.clear()
+            self._writer.close()
+        for shard in self.shards:
+            shard.size = (self.directory / shard.path).stat().st_size
+        manifest = {
+            "by": self.by,
+            "documents": sum(shard.documents for shard in self.shards),
+            "shards": [asdict(shard) for shard in self.shards],
+        }
+        text = json.dumps(manifest, indent=2, ensure_ascii=False) + "\n"
+        (self.directory / self.MANIFEST).write_text(text, encoding="utf-8")
+
+    def __enter__(self) -> ShardedSink:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+# -- fan-out -----------------------------------------------------------------
+
+
+class _Branch:
+    """One sink of a :class:`TeeSink`, fed from a thread of its own."""
+
+    def __init__(self, sink: Sink, depth: int) -> None:
+        self.sink = sink
+        self.error: BaseException | None = None
+        self._queue: queue.Queue[Sequence[Row] | None] = queue.Queue(maxsize=depth)
+        self._thread = threading.Thread(target=self._run, name="pyonyphe-tee", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while (batch := self._queue.get()) is not None:
+            if self.error is not None:
+                continue  # drain, so that the caller never blocks on a full queue
+            try:
+                if batch:
+                    self.sink.write_many(batch)
+                else:
+                    self.sink.flush()
+            except BaseException as exc:  # re-raised on the caller's thread
+                self.error = exc
+        try:
+            self.sink.close()
+        except BaseException as exc:
+            self.error = self.error or exc
+
+    def put(self, batch: Sequence[Row]) -> None:
+        self._queue.put(batch)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+class TeeSink:
+    """The same documents written to several sinks, in one pass.
+
+    >>> with TeeSink([NDJSONSink.open("datascan.ndjson.gz"),                # doctest: +SKIP
+    ...               SQLiteStore("onyphe.db"), Aggregator(["country"])]) as tee:
+    ...     copy(api.export("category:datascan"), tee)
+
+    Each sink is fed batches from a thread of its own, through a queue of at
+    most ``depth`` batches: a slow sink -- a store, a network share -- falls
+    behind the others by that much, and only holds them up once its queue is
+    full. Batches are shared, not copied, so sinks must not change them.
+
+    An error in a sink stops feeding it and is raised by the next call to
+    :meth:`write_many`, :meth:`flush` or :meth:`close`; the other sinks are
+    still closed.
+
+    :param sinks: where the documents go
+    :param depth: batches queued per sink, at most
+    """
+
+    def __init__(self, sinks: Sequence[Sink], *, depth: int = 16) -> None:
+        if not sinks:
+            raise ParamError("a tee needs at least one sink")
+        self.sinks = list(sinks)
+        self._branches = [_Branch(sink, depth) for sink in self.sinks]
+
+    def _check(self) -> None:
+        for branch in self._branches:
+            if branch.error is not None:
+                error, branch.error = branch.error, None
+                raise error
+
+    def write_many(self, rows: Sequence[Row]) -> None:
+        self._check()
+        if rows:
+            # A list of its own: copy() hands over batches it no longer uses,
+            # but other callers may refill theirs.
+            batch = list(rows)
+            for branch in self._branches:
+                branch.put(batch)
+
+    def write(self, row: Row) -> None:
+        self.write_many((row,))
+
+    def flush(self) -> None:
+        """Have every sink flush, once it is done with what came before."""
+        self._check()
+        for branch in self._branches:
+            branch.put(())
+
+    def close(self) -> None:
+        """Wait for every sink to write what it was given, and close it."""
+        for branch in self._branches:
+            branch.close()
+        self._check()
+
+    def __enter__(self) -> TeeSink:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class Aggregator:
+    """A sink counting the values of a few fields, rather than writing documents.
+
+    >>> counts = Aggregator(["country", "port"])
+    >>> counts.write_many([{"country": "FR", "port": 443}, {"country": "FR", "port": 80}])
+    >>> counts.most_common("country")
+    [('FR', 2)]
+
+    Each item of a list counts once; a document without the field, or with
+    an empty list, counts as ``None``.
+
+    :param fields: dotted paths of the fields to count
+    """
+
+    def __init__(self, fields: Sequence[str]) -> None:
+        self.fields = list(fields)
+        self.documents = 0
+        self.counts: dict[str, Counter[Any]] = {field: Counter() for field in self.fields}
+        self._getters = [(self.counts[field], getter(field)) for field in self.fields]
+
+    def write_many(self, rows: Sequence[Row]) -> None:
+        for counts, get in self._getters:
+            for row in rows:
+                value = get(row)
+                if isinstance(value, list):
+                    counts.update([_hashable(item) for item in value] or [None])
+                else:
+                    counts[_hashable(value)] += 1
+        self.documents += len(rows)
+
+    def write(self, row: Row) -> None:
+        self.write_many((row,))
+
+    def most_common(self, field: str, n: int | None = None) -> list[tuple[Any, int]]:
+        """The ``n`` most frequent values of ``field``, with their count."""
+        return self.counts[field].most_common(n)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return value
+
+
+def batched(rows: Iterable[Row], size: int) -> Iterator[list[Row]]:
+    """Lists of ``size`` rows, the last one shorter; ``itertools.batched`` before 3.12."""
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def copy(rows: Iterable[Row], sink: Sink, *, batch_size: int = 512, linger: float = 0.1) -> int:
+    """Write ``rows`` to ``sink`` in batches, returning how many were written.
+
+    :param batch_size: documents handed to the sink at once
+    :param linger: seconds at most between two flushes of ``sink``, so that a
+        reader downstream sees a slow stream as it comes rather than when a
+        buffer fills; checked as documents arrive. Compressed output still
+        moves on by whole blocks (see :class:`GzipWriter`)
+    :raises: whatever iterating ``rows`` raised, once what came before is written
+    """
+    clock = time.perf_counter
+    count = 0
+    flushed = clock()
+    batch: list[Row] = []
+    append = batch.append
+    try:
+        for row in rows:
+            append(row)
+            if len(batch) >= batch_size or clock() - flushed >= linger:
+                full, batch = batch, []
+                append = batch.append
+                sink.write_many(full)
+                count += len(full)
+                if clock() - flushed >= linger:
+                    sink.flush()
+                    flushed = clock()
+    finally:
+        # Also when fetching failed: what arrived before the error is kept.
+        if batch:
+            sink.write_many(batch)
+            count += len(batch)
+    sink.flush()
+    return count
@@ -0,0 +1,301 @@
+"""Documents in a local SQLite or DuckDB database, to query again and again.
+
+>>> with SQLiteStore("onyphe.db") as store:                    # doctest: +SKIP
+...     copy(api.export("category:datascan"), store)
+
+Each category gets a table of its own, named after it::
+
+    datascan(key PRIMARY KEY, ip, port, timestamp, document)
+
+``ip``, ``port`` and ``timestamp`` (``@timestamp``) are pulled out of each
+document and indexed; ``document`` holds the whole document as JSON, for the
+long tail of fields -- ``document ->> '$.app.http.title'`` in SQLite,
+``document ->> 'app.http.title'`` in DuckDB. ``domain`` and ``hostname``,
+which are lists, get a table of their own with one row per value, indexed
+too, such as ``datascan_domain(key, domain)``.
+
+Storing a document again replaces it rather than adding a copy: each has a
+``key``, the values of the fields identifying it. By default those are the
+fields of :data:`DEFAULT_KEYS` for its category -- ``ip`` and ``port`` for
+a datascan, so a store keeps the latest document per service -- and a hash
+of the whole document when it lacks one of them, or its category has none.
+``key=`` names the fields for every category instead. Rows are inserted a
+batch at a time, one transaction per batch.
+
+SQLite is the standard library; DuckDB needs the ``duckdb`` extra.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+from collections.abc import Sequence
+from pathlib import Path
+from types import TracebackType
+from typing import Any, TypeVar
+
+from .errors import ParamError
+from .fields import getter
+
+__all__ = ["COLUMNS", "DEFAULT_KEYS", "LISTS", "DuckDBStore", "SQLiteStore", "table_name"]
+
+Row = dict[str, Any]
+S = TypeVar("S", bound="SQLiteStore")
+
+#: Fields pulled out of each document into an indexed column, by column name.
+COLUMNS = {"ip": "ip", "port": "port", "timestamp": "@timestamp"}
+#: Fields holding lists, each stored in a ``<table>_<field>`` table of its own.
+LISTS = ("domain", "hostname")
+#: DuckDB types of the columns of a category table, in order.
+ROW_TYPES = ("VARCHAR", "VARCHAR", "INTEGER", "VARCHAR", "VARCHAR")
+#: Table of the documents that do not say their ``@category``.
+DEFAULT_TABLE = "documents"
+#: Fields identifying a document, by ``@category``, when no ``key`` is given.
+DEFAULT_KEYS: dict[str, tuple[str, ...]] = {
+    "ctl": ("fingerprint.sha256",),
+    "datascan": ("ip", "port"),
+    "datashot": ("ip", "port"),
+    "geoloc": ("ip",),
+    "inetnum": ("subnet",),
+    "onionscan": ("hostname", "port"),
+    "onionshot": ("hostname", "port"),
+    "resolver": ("ip", "hostname"),
+    "sniffer": ("ip", "port"),
+    "synscan": ("ip", "port"),
+    "threatlist": ("ip", "threatlist"),
+    "vulnscan": ("ip", "port", "cve"),
+    "whois": ("domain",),
+}
+
+_DEFAULT_GETTERS = {
+    category: [getter(field) for field in fields] for category, fields in DEFAULT_KEYS.items()
+}
+
+
+def table_name(category: Any) -> str:
+    """The table of a category: itself, with anything but letters, digits and _ replaced."""
+    if not category:
+        return DEFAULT_TABLE
+    name = re.sub(r"\W", "_", str(category), flags=re.ASCII).lower()
+    return name if name[0].isalpha() else f"c_{name}"
+
+
+def _integer(value: Any) -> int | None:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _scalar(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _values(value: Any) -> list[str]:
+    if value is None:
+        return []
+    items = value if isinstance(value, list) else [value]
+    return [str(item) for item in items if item is not None]
+
+
+class SQLiteStore:
+    """Documents in a SQLite database file, one table per category.
+
+    Follows the :class:`~pyonyphe.sinks.Sink` protocol, so
+    :func:`~pyonyphe.sinks.copy` fills it.
+
+    :param path: the database file; created if need be
+    :param key: fields identifying a document, as dotted paths; those of
+        :data:`DEFAULT_KEYS` for its category when ``None``
+    :param batch_rows: documents inserted per transaction
+    """
+
+    #: Column type of ``document``.
+    JSON_TYPE = "TEXT"
+
+    def __init__(
+        self, path: str | Path, *, key: Sequence[str] | None = None, batch_rows: int = 5000
+    ) -> None:
+        self.path = Path(path)
+        self.key = tuple(key) if key else None
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._key_getters = [getter(field) for field in self.key or ()]
+        self._pending: list[Row] = []
+        self._tables: set[str] = set()
+        self.connection = self._connect()
+
+    def _connect(self) -> Any:
+        # Used from one thread at a time, but not always the one that opened
+        # it: a TeeSink writes from a thread of its own.
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def document_key(self, document: Row) -> str:
+        """What identifies ``document`` in the store.
+
+        The values of the ``key`` fields, or of its category's
+        :data:`DEFAULT_KEYS` when it has them all; a hash of its content otherwise.
+        """
+        if self._key_getters:
+            return json.dumps([get(document) for get in self._key_getters], ensure_ascii=False)
+        getters = _DEFAULT_GETTERS.get(document.get("@category"), ())
+        values = [get(document) for get in getters]
+        if values and all(value not in (None, "", []) for value in values):
+            return json.dumps(values, ensure_ascii=False)
+        text = json.dumps(document, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(text.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+    def tables(self) -> list[str]:
+        """The category tables written to through this store, so far."""
+        return sorted(self._tables)
+
+    # -- the Sink protocol ---------------------------------------------------
+
+    def write_many(self, rows: Sequence[Row]) -> None:
+        self._pending.extend(rows)
+        if len(self._pending) >= self.batch_rows:
+            self._commit()
+
+    def write(self, row: Row) -> None:
+        self.write_many((row,))
+
+    def flush(self) -> None:
+        """Insert what is pending, in a transaction of its own."""
+        self._commit()
+
+    def close(self) -> None:
+        try:
+            self._commit()
+        finally:
+            self.connection.close()
+
+    def __enter__(self: S) -> S:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    # -- writing -------------------------------------------------------------
+
+    def _commit(self) -> None:
+        if not self._pending:
+            return
+        # By table, then by key: the last of two copies in a batch wins.
+        tables: dict[str, dict[str, Row]] = {}
+        for document in self._pending:
+            table = tables.setdefault(table_name(document.get("@category")), {})
+            table[self.document_key(document)] = document
+        count = len(self._pending)
+        self._pending = []
+        execute = self.connection.execute
+        execute("BEGIN")
+        try:
+            for table, documents in tables.items():
+                self._create(table)
+                self._upsert(table, documents)
+        except BaseException:
+            execute("ROLLBACK")
+            raise
+        execute("COMMIT")
+        self.rows += count
+
+    def _create(self, table: str) -> None:
+        if table in self._tables:
+            return
+        execute = self.connection.execute
+        execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, ip TEXT,"
+            f" port INTEGER, timestamp TEXT, document {self.JSON_TYPE})"
+        )
+        for column in COLUMNS:
+            execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})")
+        for field in LISTS:
+            execute(f"CREATE TABLE IF NOT EXISTS {table}_{field} (key TEXT, {field} TEXT)")
+            execute(f"CREATE INDEX IF NOT EXISTS {table}_{field}_key ON {table}_{field} (key)")
+            execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_{field}_{field} ON {table}_{field} ({field})"
+            )
+        self._tables.add(table)
+
+    def _upsert(self, table: str, documents: dict[str, Row]) -> None:
+        rows = [
+            (
+                key,
+                _scalar(document.get("ip")),
+                _integer(document.get("port")),
+                _scalar(document.get("@timestamp")),
+                json.dumps(document, ensure_ascii=False),
+            )
+            for key, document in documents.items()
+        ]
+        keys = list(documents)
+        self._insert(f"INSERT OR REPLACE INTO {table}", rows, ROW_TYPES)
+        for field in LISTS:
+            values = [
+                (key, value)
+                for key, document in documents.items()
+                for value in _values(document.get(field))
+            ]
+            self._delete(f"{table}_{field}", keys)
+            self._insert(f"INSERT INTO {table}_{field}", values, ("VARCHAR", "VARCHAR"))
+
+    def _insert(self, statement: str, rows: list[tuple[Any, ...]], types: Sequence[str]) -> None:
+        if rows:
+            marks = ", ".join("?" * len(rows[0]))
+            self.connection.executemany(f"{statement} VALUES ({marks})", rows)
+
+    def _delete(self, table: str, keys: list[str]) -> None:
+        # Table names come out of table_name(), never straight from a document.
+        statement = f"DELETE FROM {table} WHERE key = ?"  # noqa: S608
+        self.connection.executemany(statement, [(key,) for key in keys])
+
+
+class DuckDBStore(SQLiteStore):
+    """Documents in a DuckDB database file, laid out as in :class:`SQLiteStore`.
+
+    Needs the ``duckdb`` extra.
+
+    :raises ParamError: when duckdb is not installed
+    """
+
+    JSON_TYPE = "JSON"
+
+    def _connect(self) -> Any:
+        try:
+            # Imported here: duckdb is an optional extra.
+            import duckdb
+        except ImportError as exc:
+            message = "DuckDB needs the duckdb extra: pip install 'pyonyphe[duckdb]'"
+            raise ParamError(message) from exc
+        return duckdb.connect(str(self.path))
+
+    def _insert(self, statement: str, rows: list[tuple[Any, ...]], types: Sequence[str]) -> None:
+        if not rows:
+            return
+        # DuckDB binds parameters one Python object at a time, slowly: hand it
+        # each column as a single JSON array, unnested on its side.
+        columns = list(zip(*rows, strict=True))
+        select = ", ".join(f"unnest(from_json(?, '[\"{kind}\"]'))" for kind in types)
+        parameters = [json.dumps(column, ensure_ascii=False) for column in columns]
+        self.connection.execute(f"{statement} SELECT {select}", parameters)
+
+    def _delete(self, table: str, keys: list[str]) -> None:
+        self.connection.execute(
+            f"DELETE FROM {table} WHERE key IN"  # noqa: S608 - see SQLiteStore._delete
+            " (SELECT unnest(from_json(?, '[\"VARCHAR\"]')))",
+            [json.dumps(keys)],
+        )
@@ -0,0 +1,333 @@
+"""Handles over the NDJSON streams returned by ``export`` and the bulk APIs.
+
+A bare generator only releases its HTTP connection once it is exhausted or
+garbage collected, so a consumer that breaks out of the loop early keeps a
+pooled connection busy until then. A handle is still a plain iterator, but it
+is also a context manager whose exit -- or an explicit :meth:`close` --
+returns the connection to the pool immediately:
+
+>>> with api.export("domain:example.com") as stream:         # doctest: +SKIP
+...     for doc in stream:
+...         if done(doc):
+...             break
+...     print(stream.stats.documents, stream.stats.bytes_received)
+
+Nothing is sent until the handle is entered or first iterated. With a
+:class:`~pyonyphe.fields.Projection`, each document is projected as soon as
+its line is decoded.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import AsyncGenerator, Generator
+from contextlib import AbstractAsyncContextManager, AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, cast
+
+import httpx
+
+from .errors import TransportError
+from .hooks import (
+    ATTEMPT_FINISHED,
+    ATTEMPT_STARTED,
+    REQUEST_PREPARED,
+    STREAM_CHUNK,
+    STREAM_FINISHED,
+)
+
+if TYPE_CHECKING:
+    from ._base import BaseClient, PreparedRequest
+    from .fields import Projection
+
+__all__ = ["AsyncStreamHandle", "StreamHandle", "StreamStats"]
+
+
+@dataclass(slots=True)
+class StreamStats:
+    """Live counters of one stream, updated as it is consumed.
+
+    :param bytes_received: bytes read off the wire, before decompression
+    :param documents: documents yielded so far
+    :param skipped: non-blank lines that did not decode to a JSON object
+    :param started: :func:`time.perf_counter` when the request was sent
+    :param finished: :func:`time.perf_counter` when the stream was closed
+    """
+
+    bytes_received: int = 0
+    documents: int = 0
+    skipped: int = 0
+    started: float | None = None
+    finished: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the request was sent, or until the stream closed."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+
+class _HandleBase:
+    """Line splitting and bookkeeping shared by both handles."""
+
+    def __init__(
+        self,
+        owner: BaseClient,
+        prepared: PreparedRequest,
+        kwargs: dict[str, Any],
+        project: Projection | None = None,
+    ) -> None:
+        self.stats = StreamStats()
+        self.project = project
+        self._owner = owner
+        self._prepared = prepared
+        self._kwargs = kwargs
+        self._closed = False
+        self._status: int | None = None
+        self._error: BaseException | None = None
+
+    @property
+    def closed(self) -> bool:
+        """Whether the connection has been released."""
+        return self._closed
+
+    def _start(self) -> None:
+        self.stats.started = time.perf_counter()
+        self._owner.emit(REQUEST_PREPARED, self._prepared)
+        self._owner.emit(ATTEMPT_STARTED, self._prepared)
+
+    def _headers(self, response: httpx.Response) -> None:
+        self._status = response.status_code
+        elapsed = self.stats.elapsed
+        self._owner.emit(ATTEMPT_FINISHED, self._prepared, status=self._status, elapsed=elapsed)
+        if response.status_code >= 400:
+            self._owner.raise_for_status(response, self._owner._decode(response))
+
+    def _decode_chunk(
+        self, response: httpx.Response, pending: bytes, chunk: bytes
+    ) -> tuple[list[dict[str, Any]], bytes]:
+        """Split a chunk into complete lines, decode them, and keep the tail."""
+        lines = (pending + chunk).split(b"\n") if pending else chunk.split(b"\n")
+        tail = lines.pop()
+        items = [item for item in map(self._parse, lines) if item is not None]
+        self.stats.bytes_received = response.num_bytes_downloaded
+        if self._owner._hooks:
+            self._owner.emit(STREAM_CHUNK, self._prepared, documents=len(items), bytes=len(chunk))
+        return items, tail
+
+    def _parse(self, line: bytes) -> dict[str, Any] | None:
+        item = self._owner.parse_ndjson_line(line)
+        if item is None:
+            if line.strip():
+                self.stats.skipped += 1
+            return None
+        # Projected right away: what is cut goes with the line it came from.
+        return item if self.project is None else self.project(item)
+
+    def _finish(self) -> None:
+        self._closed = True
+        stats = self.stats
+        if stats.started is not None and stats.finished is None:
+            stats.finished = time.perf_counter()
+            self._owner.emit(
+                STREAM_FINISHED,
+                self._prepared,
+                status=self._status,
+                elapsed=stats.elapsed,
+                documents=stats.documents,
+                bytes=stats.bytes_received,
+                error=self._error,
+            )
+
+
+class StreamHandle(_HandleBase):
+    """Iterator and context manager over a blocking NDJSON stream.
+
+    :ivar stats: a :class:`StreamStats`, updated while iterating
+    :ivar project: the :class:`~pyonyphe.fields.Projection` of each document, if any
+    """
+
+    def __init__(
+        self,
+        owner: BaseClient,
+        http: httpx.Client,
+        prepared: PreparedRequest,
+        kwargs: dict[str, Any],
+        *,
+        gate: AbstractContextManager[Any] | None = None,
+        project: Projection | None = None,
+    ) -> None:
+        super().__init__(owner, prepared, kwargs, project)
+        self._http = http
+        self._gate = gate or nullcontext()
+        self._documents: Generator[dict[str, Any] | None, None, None] | None = None
+
+    def _run(self) -> Generator[dict[str, Any] | None, None, None]:
+        # The connection lives inside this generator, so closing it -- or
+        # collecting it, for a handle simply dropped -- releases the connection.
+        prepared = self._prepared
+        with (
+            self._gate,
+            self._http.stream(prepared.method, prepared.url, **self._kwargs) as response,
+        ):
+            if response.status_code >= 400:
+                response.read()
+            self._headers(response)
+            yield None
+            pending = b""
+            for chunk in response.iter_bytes():
+                items, pending = self._decode_chunk(response, pending, chunk)
+                yield from items
+            item = self._parse(pending)
+            if item is not None:
+                yield item
+
+    def _advance(self) -> dict[str, Any] | None:
+        if self._documents is None:
+            self._start()
+            self._documents = self._run()
+        try:
+            return next(self._documents)
+        except StopIteration:
+            self.close()
+            raise
+        except httpx.HTTPError as exc:
+            self._error = exc
+            self.close()
+            raise TransportError(f"unable to reach ONYPHE: {exc}") from exc
+        except BaseException as exc:
+            self._error = exc
+            self.close()
+            raise
+
+    def __iter__(self) -> StreamHandle:
+        return self
+
+    def __next__(self) -> dict[str, Any]:
+        if self._closed:
+            raise StopIteration
+        item = self._advance()
+        if item is None:  # the headers are in, the first document is next
+            item = self._advance()
+        # Counted once handed over: a chunk decoded ahead is not yet yielded.
+        self.stats.documents += 1
+        return cast(dict[str, Any], item)
+
+    def close(self) -> None:
+        """Release the connection now. Safe to call more than once."""
+        if self._closed:
+            return
+        try:
+            if self._documents is not None:
+                self._documents.close()
+        finally:
+            self._finish()
+
+    def __enter__(self) -> StreamHandle:
+        if self._documents is None and not self._closed:
+            self._advance()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class AsyncStreamHandle(_HandleBase):
+    """Async iterator and context manager over an NDJSON stream.
+
+    Cancelling the task consuming it releases the connection as well.
+    """
+
+    def __init__(
+        self,
+        owner: BaseClient,
+        http: httpx.AsyncClient,
+        prepared: PreparedRequest,
+        kwargs: dict[str, Any],
+        *,
+        gate: AbstractAsyncContextManager[Any] | None = None,
+        project: Projection | None = None,
+    ) -> None:
+        super().__init__(owner, prepared, kwargs, project)
+        self._http = http
+        self._gate = gate or nullcontext()
+        self._documents: AsyncGenerator[dict[str, Any] | None, None] | None = None
+
+    async def _run(self) -> AsyncGenerator[dict[str, Any] | None, None]:
+        prepared = self._prepared
+        async with (
+            self._gate,
+            self._http.stream(prepared.method, prepared.url, **self._kwargs) as response,
+        ):
+            if response.status_code >= 400:
+                await response.aread()
+            self._headers(response)
+            yield None
+            pending = b""
+            async for chunk in response.aiter_bytes():
+                items, pending = self._decode_chunk(response, pending, chunk)
+                for item in items:
+                    yield item
+            item = self._parse(pending)
+            if item is not None:
+                yield item
+
+    async def _advance(self) -> dict[str, Any] | None:
+        if self._documents is None:
+            self._start()
+            self._documents = self._run()
+        try:
+            return await anext(self._documents)
+        except StopAsyncIteration:
+            await self.aclose()
+            raise
+        except httpx.HTTPError as exc:
+            self._error = exc
+            await self.aclose()
+            raise TransportError(f"unable to reach ONYPHE: {exc}") from exc
+        except BaseException as exc:
+            self._error = exc
+            await self.aclose()
+            raise
+
+    def __aiter__(self) -> AsyncStreamHandle:
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        if self._closed:
+            raise StopAsyncIteration
+        item = await self._advance()
+        if item is None:
+            item = await self._advance()
+        self.stats.documents += 1
+        return cast(dict[str, Any], item)
+
+    async def aclose(self) -> None:
+        """Release the connection now. Safe to call more than once."""
+        if self._closed:
+            return
+        try:
+            if self._documents is not None:
+                await self._documents.aclose()
+        finally:
+            self._finish()
+
+    async def __aenter__(self) -> AsyncStreamHandle:
+        if self._documents is None and not self._closed:
+            await self._advance()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.aclose()
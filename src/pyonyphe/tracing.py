@@ -0,0 +1,280 @@
+"""OpenTelemetry tracing for both clients.
+
+Installed as an optional extra::
+
+    uv add 'pyonyphe[otel]'
+
+>>> from pyonyphe.tracing import instrument
+>>> api = Onyphe()                                        # doctest: +SKIP
+>>> instrument(api)                                       # doctest: +SKIP
+
+Each call gets a ``CLIENT`` span named after its endpoint -- ``onyphe
+search``, ``onyphe export``, ``onyphe bulk/summary/ip`` -- parented on whatever
+span is current when the call is made. Under it, one ``onyphe attempt`` span
+per HTTP attempt and one ``onyphe backoff`` span per retry sleep show how much
+of a slow call was ONYPHE and how much was waiting to retry.
+
+The fan-out helpers (``send_many``, ``export_partitioned``) copy the caller's
+context into their threads, and asyncio tasks inherit it, so calls made there
+stay in the trace that started them. With :func:`instrument`, the helpers
+making many calls for one result -- ``search_iter``, one search per page, and
+``export_partitioned``, counts then one stream per slice -- also get a span
+of their own, ``onyphe search_iter`` or ``onyphe export_partitioned``, over
+all of their calls.
+
+A stream dropped before it finishes never sends its last event: its span
+ends, marked ``onyphe.abandoned``, once its request is garbage-collected.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import time
+import weakref
+from collections.abc import AsyncIterator, Callable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from opentelemetry import trace
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode, Tracer, TracerProvider
+
+from . import __version__
+from ._base import BaseClient, PreparedRequest
+from .hooks import (
+    ATTEMPT_FINISHED,
+    ATTEMPT_STARTED,
+    REQUEST_FINISHED,
+    REQUEST_PREPARED,
+    RETRY_SCHEDULED,
+    STREAM_FINISHED,
+    Event,
+)
+
+__all__ = ["TracingHook", "instrument"]
+
+
+#: The client methods making many calls for one result, spanned as a whole.
+MULTI_CALL = ("search_iter", "export_partitioned")
+
+
+@dataclass(slots=True)
+class _Call:
+    span: Span
+    finalizer: weakref.finalize
+    attempt: Span | None = None
+
+
+class TracingHook:
+    """A hook turning client events into OpenTelemetry spans.
+
+    :param tracer_provider: where to get the tracer; the global provider by default
+    """
+
+    def __init__(self, tracer_provider: TracerProvider | None = None) -> None:
+        self.tracer: Tracer = trace.get_tracer(
+            "pyonyphe", __version__, tracer_provider=tracer_provider
+        )
+        # By id of the request; each entry is dropped by the time its
+        # request is collected, so an id reused later cannot find it.
+        self._calls: dict[int, _Call] = {}
+
+    def __call__(self, event: Event) -> None:
+        handler = _HANDLERS.get(event.name)
+        if handler is not None:
+            handler(self, event)
+
+    def _prepared(self, event: Event) -> None:
+        request = event.request
+        attributes: dict[str, Any] = {
+            "http.request.method": request.method,
+            "onyphe.endpoint": event.endpoint,
+            "url.full": request.url,
+        }
+        for name in ("page", "size"):
+            if name in request.params:
+                attributes[f"onyphe.{name}"] = int(request.params[name])
+        span = self.tracer.start_span(
+            f"onyphe {event.endpoint}", kind=SpanKind.CLIENT, attributes=attributes
+        )
+        finalizer = weakref.finalize(request, self._abandoned, id(request))
+        finalizer.atexit = False
+        self._calls[id(request)] = _Call(span, finalizer)
+
+    def _call(self, request: PreparedRequest) -> _Call | None:
+        return self._calls.get(id(request))
+
+    def _abandoned(self, key: int) -> None:
+        """End the spans of a call whose request was collected unfinished."""
+        call = self._calls.pop(key, None)
+        if call is None:
+            return
+        if call.attempt is not None:
+            call.attempt.end()
+        call.span.set_attribute("onyphe.abandoned", True)
+        call.span.end()
+
+    def _attempt_started(self, event: Event) -> None:
+        call = self._call(event.request)
+        if call is None:
+            return
+        call.attempt = self.tracer.start_span(
+            "onyphe attempt",
+            context=trace.set_span_in_context(call.span),
+            attributes={"onyphe.attempt": event.attempt},
+        )
+
+    def _attempt_finished(self, event: Event) -> None:
+        call = self._call(event.request)
+        if call is None or call.attempt is None:
+            return
+        _close(call.attempt, event)
+        call.attempt = None
+
+    def _retry(self, event: Event) -> None:
+        call = self._call(event.request)
+        if call is None:
+            return
+        # The sleep starts right after this event, so its end is known upfront.
+        start = time.time_ns()
+        span = self.tracer.start_span(
+            "onyphe backoff",
+            context=trace.set_span_in_context(call.span),
+            start_time=start,
+            attributes={"onyphe.attempt": event.attempt, "onyphe.delay": event.delay},
+        )
+        span.end(end_time=start + int(event.delay * 1e9))
+
+    def _finished(self, event: Event) -> None:
+        call = self._calls.pop(id(event.request), None)
+        if call is None:
+            return
+        call.finalizer.detach()
+        if call.attempt is not None:
+            _close(call.attempt, event)
+        if event.name == STREAM_FINISHED:
+            call.span.set_attribute("onyphe.documents", event.documents)
+            call.span.set_attribute("onyphe.bytes", event.bytes)
+        _close(call.span, event)
+
+
+def _close(span: Span, event: Event) -> None:
+    if event.status is not None:
+        span.set_attribute("http.response.status_code", event.status)
+    if event.error is not None:
+        span.record_exception(event.error)
+        span.set_status(Status(StatusCode.ERROR, str(event.error)))
+    elif event.status is not None and event.status >= 400:
+        span.set_status(Status(StatusCode.ERROR))
+    span.end()
+
+
+_HANDLERS = {
+    REQUEST_PREPARED: TracingHook._prepared,
+    ATTEMPT_STARTED: TracingHook._attempt_started,
+    ATTEMPT_FINISHED: TracingHook._attempt_finished,
+    RETRY_SCHEDULED: TracingHook._retry,
+    REQUEST_FINISHED: TracingHook._finished,
+    STREAM_FINISHED: TracingHook._finished,
+}
+
+
+def _spanned(
+    client: BaseClient, hook: TracingHook, name: str, method: Callable[..., Iterator[Any]]
+) -> Callable[..., Iterator[Any]]:
+    """``method``, its calls under one span for as long as it is iterated.
+
+    The span is current only while ``method`` runs -- on each ``next()`` --
+    never in the caller's code between two documents.
+    """
+
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Iterator[Any]:
+        if hook not in client._hooks:
+            return method(*args, **kwargs)
+        span = hook.tracer.start_span(f"onyphe {name}", kind=SpanKind.INTERNAL)
+        try:
+            with trace.use_span(span):
+                documents = iter(method(*args, **kwargs))
+        except BaseException:
+            span.end()
+            raise
+        return _walk(span, documents)
+
+    return wrapper
+
+
+def _walk(span: Span, documents: Iterator[Any]) -> Iterator[Any]:
+    count = 0
+    try:
+        while True:
+            with trace.use_span(span):
+                try:
+                    document = next(documents)
+                except StopIteration:
+                    return
+            count += 1
+            yield document
+    finally:
+        with trace.use_span(span):
+            close = getattr(documents, "close", None)
+            if close is not None:
+                close()
+        span.set_attribute("onyphe.documents", count)
+        span.end()
+
+
+def _aspanned(
+    client: BaseClient, hook: TracingHook, name: str, method: Callable[..., AsyncIterator[Any]]
+) -> Callable[..., AsyncIterator[Any]]:
+    """Async :func:`_spanned`."""
+
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        if hook not in client._hooks:
+            return method(*args, **kwargs)
+        return _awalk(hook.tracer.start_span(f"onyphe {name}"), method(*args, **kwargs))
+
+    return wrapper
+
+
+async def _awalk(span: Span, documents: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    count = 0
+    try:
+        while True:
+            with trace.use_span(span):
+                try:
+                    document = await anext(documents)
+                except StopAsyncIteration:
+                    return
+            count += 1
+            yield document
+    finally:
+        with trace.use_span(span):
+            aclose = getattr(documents, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        span.set_attribute("onyphe.documents", count)
+        span.end()
+
+
+def instrument(client: BaseClient, tracer_provider: TracerProvider | None = None) -> TracingHook:
+    """Trace every call ``client`` makes from now on.
+
+    ``search_iter`` and ``export_partitioned`` of ``client`` are also wrapped,
+    so that each gets a span enclosing all of its calls.
+
+    :returns: the hook, to pass to :meth:`~pyonyphe._base.BaseClient.remove_hook`;
+        once removed, the two helpers are no longer spanned either
+    """
+    hook = TracingHook(tracer_provider)
+    client.add_hook(hook)
+    for name in MULTI_CALL:
+        method = getattr(client, name, None)
+        if method is None:
+            continue
+        if inspect.isasyncgenfunction(method):
+            setattr(client, name, _aspanned(client, hook, name, method))
+        else:
+            setattr(client, name, _spanned(client, hook, name, method))
+    return hook
@@ -0,0 +1,128 @@
+"""Parquet and Arrow IPC output, and schema inference across categories."""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from pyonyphe.arrow import (  # noqa: E402
+    ArrowStreamSink,
+    ParquetSink,
+    _ArrowSink,
+    _Output,
+    evolve,
+    read_dataset,
+    record_batch,
+)
+from pyonyphe.errors import ParamError  # noqa: E402
+
+DATASCAN = [
+    {
+        "@category": "datascan",
+        "@timestamp": f"2025-01-0{1 + n % 2}T10:00:00.000Z",
+        "ip": f"10.0.0.{n}",
+        "port": 80 + n,
+        "tls": None,
+        "app": {"http": {"title": "home"}},
+    }
+    for n in range(10)
+]
+VULNSCAN = [
+    {
+        "@category": "vulnscan",
+        "@timestamp": "2025-01-02T11:00:00.000Z",
+        "ip": f"10.0.1.{n}",
+        "port": "443",
+        "tls": "true",
+        "cve": ["CVE-2024-0001"],
+        "app": {"http": {"status": 200}},
+    }
+    for n in range(10)
+]
+
+
+def test_columns_that_do_not_share_a_type_become_text() -> None:
+    batch = record_batch([{"a": 1, "b": {"x": 1}}, {"a": "one", "b": 2, "c": True}])
+    assert batch.schema.names == ["a", "b", "c"]
+    assert batch.column("a").to_pylist() == ["1", "one"]
+    assert batch.column("b").to_pylist() == ['{"x": 1}', "2"]
+
+
+def test_schema_evolves_across_categories() -> None:
+    schema = evolve(record_batch(DATASCAN).schema, record_batch(VULNSCAN).schema)
+    assert schema.field("port").type == pa.string()
+    assert schema.field("tls").type == pa.string()
+    assert schema.field("cve").type == pa.list_(pa.string())
+    assert set(schema.field("app").type.field("http").type.names) == {"title", "status"}
+
+
+def test_parquet_dataset_holds_every_document(tmp_path: Path) -> None:
+    with ParquetSink(tmp_path, batch_rows=4) as sink:
+        sink.write_many(DATASCAN + VULNSCAN)
+    parts = sorted(tmp_path.glob("part-*.parquet"))
+    # The vulnscan documents widened the schema: a second part holds them.
+    assert len(parts) == 2
+    table = read_dataset(tmp_path)
+    assert table.num_rows == 20
+    assert table.schema.field("port").type == pa.string()
+    assert sorted(table.column("ip").to_pylist()) == sorted(
+        row["ip"] for row in DATASCAN + VULNSCAN
+    )
+    assert pq.ParquetFile(parts[0]).metadata.num_row_groups == 2
+
+
+@pytest.mark.parametrize(
+    ("partition_by", "directories"),
+    [
+        ("category", {"category=datascan", "category=vulnscan"}),
+        ("date", {"date=2025-01-01", "date=2025-01-02"}),
+    ],
+)
+def test_parquet_partitions(tmp_path: Path, partition_by: str, directories: set[str]) -> None:
+    with ParquetSink(tmp_path, partition_by=partition_by, max_open=1) as sink:  # type: ignore[arg-type]
+        sink.write_many(DATASCAN + VULNSCAN + [{"ip": "10.9.9.9"}])
+    found = {path.name for path in tmp_path.iterdir()}
+    assert found == {*directories, f"{partition_by}=__HIVE_DEFAULT_PARTITION__"}
+    table = read_dataset(tmp_path)
+    assert table.num_rows == 21
+    assert None in table.column(partition_by).to_pylist()
+    with pytest.raises(ParamError, match="unknown partition"):
+        ParquetSink(tmp_path, partition_by="port")  # type: ignore[arg-type]
+
+
+def test_arrow_stream_starts_again_when_the_schema_grows() -> None:
+    stream = io.BytesIO()
+    with ArrowStreamSink(stream, batch_rows=10) as sink:
+        sink.write_many(DATASCAN[:5])
+        sink.flush()
+        sink.write_many(DATASCAN[5:] + VULNSCAN)
+    assert sink.streams == 2
+    source = pa.BufferReader(stream.getvalue())
+    tables = []
+    while True:
+        try:
+            reader = pa.ipc.open_stream(source)
+        except pa.ArrowInvalid:
+            break
+        tables.append(reader.read_all())
+    assert [table.num_rows for table in tables] == [5, 15]
+
+
+def test_an_output_missing_a_method_cannot_be_created() -> None:
+    class Unfinished(_Output):
+        def open(self, schema: pa.Schema) -> None:
+            pass
+
+    class Sink(_ArrowSink):
+        def close(self) -> None:
+            pass
+
+    with pytest.raises(TypeError, match="write_batch"):
+        Unfinished()
+    with pytest.raises(TypeError, match="_output"):
+        Sink(batch_rows=1)
@@ -7,6 +7,7 @@ import pytest
 import respx
 
 from pyonyphe import AsyncOnyphe
+from pyonyphe import _specs as specs
 from pyonyphe.errors import AuthenticationError, ServerError, TransportError
 
 from .conftest import API_KEY, BASE, envelope
@@ -111,3 +112,25 @@ async def test_gives_up_after_max_retries() -> None:
         with pytest.raises(ServerError):
             await client.user()
     assert route.call_count == 3  # the initial attempt plus two retries
+
+
+@respx.mock
+async def test_send_many_in_order(async_client: AsyncOnyphe) -> None:
+    def answer(request: httpx.Request) -> httpx.Response:
+        ip = request.url.path.rsplit("/", 1)[-1]
+        if ip == "10.0.0.3":
+            return httpx.Response(403, json={"text": "nope"})
+        return httpx.Response(200, json=envelope([{"ip": ip}]))
+
+    respx.get(url__startswith=f"{BASE}/summary/ip/").mock(side_effect=answer)
+    ips = [f"10.0.0.{n}" for n in range(10)]
+    async with async_client as client:
+        results = [
+            result
+            async for result in client.send_many(
+                (specs.summary("ip", ip) for ip in ips), workers=3, ordered=True
+            )
+        ]
+    assert [result.index for result in results] == list(range(10))
+    assert isinstance(results[3].error, AuthenticationError)
+    assert results[4].result.results == [{"ip": "10.0.0.4"}]
@@ -0,0 +1,73 @@
+"""Load generation with pyonyphe.bench, against the in-process fake server."""
+
+from __future__ import annotations
+
+import httpx
+import pytest
+
+from pyonyphe import AsyncOnyphe
+from pyonyphe.bench import parse_mix, run
+from pyonyphe.errors import ParamError
+from pyonyphe.fake_server import FakeOnyphe, Faults
+
+from .conftest import API_KEY
+
+
+def fake(app: FakeOnyphe, **kwargs: object) -> AsyncOnyphe:
+    return AsyncOnyphe(
+        API_KEY,
+        base_url="http://fake/api/v2",
+        transport=httpx.ASGITransport(app),
+        **kwargs,  # type: ignore[arg-type]
+    )
+
+
+def test_parse_mix() -> None:
+    assert parse_mix("summary/ip=3, search ,simple/whois/best=0.5") == {
+        "summary/ip": 3.0,
+        "search": 1.0,
+        "simple/whois/best": 0.5,
+    }
+    for bad in ("", "nope", "search=0", "search=x", "simple/nope"):
+        with pytest.raises(ParamError):
+            parse_mix(bad)
+
+
+async def test_closed_loop_run() -> None:
+    app = FakeOnyphe(Faults(seed=7))
+    async with fake(app) as client:
+        report = await run(
+            client, parse_mix("summary/ip=3,search=1"), concurrency=4, requests=80, seed=1
+        )
+    assert report.calls == 80
+    assert sum(app.requests.values()) == 80
+    assert report.endpoints["summary/ip"].calls == app.requests["summary/ip"]
+    assert report.latency(0.5) <= report.latency(0.99) <= report.latency(1.0)
+    assert report.throughput > 0
+    data = report.as_dict()
+    assert data["calls"] == 80
+    assert set(data["endpoints"]) == {"summary/ip", "search"}
+
+
+async def test_errors_and_retries_are_broken_down() -> None:
+    app = FakeOnyphe(Faults(rate_limit_rate=0.3, error_rate=0.2, retry_after=0, seed=3))
+    async with fake(app, max_retries=1, backoff=0.0) as client:
+        report = await run(client, {"user": 1.0}, concurrency=2, requests=50)
+    assert report.calls == 50
+    assert report.retries
+    assert set(report.retries) <= {"429", "500", "502", "503"}
+    assert set(report.errors) <= {"RateLimitError", "ServerError"}
+    assert report.endpoints["user"].errors == report.errors
+
+
+async def test_open_loop_rate_and_duration() -> None:
+    async with fake(FakeOnyphe()) as client:
+        report = await run(client, {"user": 1.0}, rate=200, duration=0.2, concurrency=4)
+    assert 20 <= report.calls <= 50
+    assert report.rate == 200
+
+
+async def test_run_needs_a_bound() -> None:
+    async with fake(FakeOnyphe()) as client:
+        with pytest.raises(ParamError):
+            await run(client, {"user": 1.0})
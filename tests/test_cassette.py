@@ -0,0 +1,100 @@
+"""Recording exchanges into a cassette and replaying them."""
+
+from __future__ import annotations
+
+import gzip
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from pyonyphe import AsyncOnyphe, Onyphe
+from pyonyphe.cassette import CassetteError, RecordingTransport, ReplayTransport
+from pyonyphe.fake_server import FakeOnyphe, Faults, serve
+
+from .conftest import API_KEY, envelope
+
+
+def answer(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/export/"):
+        return httpx.Response(200, content=b'{"n":1}\n{"n":2}\n\xff\n')
+    return httpx.Response(200, json=envelope([{"ip": request.url.path.rsplit("/", 1)[-1]}]))
+
+
+def test_record_then_replay(tmp_path: Path) -> None:
+    cassette = tmp_path / "session.cassette"
+    transport = RecordingTransport(cassette, httpx.MockTransport(answer))
+    with Onyphe(API_KEY, transport=transport) as api:
+        recorded = api.summary_ip("8.8.8.8").results
+        streamed = list(api.export("x"))
+    assert API_KEY not in gzip.decompress(cassette.read_bytes()).decode()
+
+    replay = ReplayTransport(cassette)
+    with Onyphe("another-key", transport=replay) as api:
+        assert api.summary_ip("8.8.8.8").results == recorded
+        assert list(api.export("x")) == streamed == [{"n": 1}, {"n": 2}]
+        # The last answer repeats once a request's recordings run out.
+        assert api.summary_ip("8.8.8.8").results == recorded
+        with pytest.raises(CassetteError, match=r"1\.1\.1\.1"):
+            api.summary_ip("1.1.1.1")
+    assert replay.replayed == 3
+
+
+def test_equivalent_queries_replay_one_recording(tmp_path: Path) -> None:
+    cassette = tmp_path / "canonical.cassette"
+    transport = RecordingTransport(cassette, httpx.MockTransport(answer))
+    with Onyphe(API_KEY, transport=transport, canonical_queries=True) as api:
+        recorded = list(api.export("product:Nginx country:FR"))
+    with Onyphe(API_KEY, transport=ReplayTransport(cassette), canonical_queries=True) as api:
+        assert list(api.export('country:"FR"   product:Nginx')) == recorded
+
+
+def test_unrated_key_is_never_recorded(tmp_path: Path) -> None:
+    cassette = tmp_path / "unrated.cassette"
+    transport = RecordingTransport(cassette, httpx.MockTransport(answer))
+    with Onyphe("SECRETKEY123", unrated_email="me@example.com", transport=transport) as api:
+        recorded = api.summary_ip("8.8.8.8").results
+    text = gzip.decompress(cassette.read_bytes()).decode()
+    assert "SECRETKEY123" not in text
+    assert "example.com" not in text
+    replay = ReplayTransport(cassette)
+    with Onyphe("another-key", unrated_email="me@example.com", transport=replay) as api:
+        assert api.summary_ip("8.8.8.8").results == recorded
+
+
+async def test_async_record_and_replay(tmp_path: Path) -> None:
+    cassette = tmp_path / "async.cassette"
+    inner = httpx.ASGITransport(FakeOnyphe(Faults(total=30, seed=3)))
+    async with AsyncOnyphe(API_KEY, transport=RecordingTransport(cassette, inner)) as api:
+        recorded = [doc async for doc in api.export("x")]
+        summary = (await api.summary_domain("example.com")).results
+
+    async with AsyncOnyphe(API_KEY, transport=ReplayTransport(cassette)) as api:
+        assert [doc async for doc in api.export("x")] == recorded
+        assert (await api.summary_domain("example.com")).results == summary
+
+
+def test_replay_at_the_recorded_pace(tmp_path: Path) -> None:
+    cassette = tmp_path / "paced.cassette"
+    app = FakeOnyphe(Faults(total=300, chunk_documents=100, stream_rate=2000))
+    with serve(app) as base_url:
+        transport = RecordingTransport(cassette)
+        with Onyphe(API_KEY, base_url=base_url, transport=transport) as api:
+            recorded = list(api.export("x"))
+
+    replay = ReplayTransport(cassette, speed=1.0)
+    chunks = replay.interactions[0].chunks
+    assert len(chunks) >= 3
+    started = time.perf_counter()
+    with Onyphe(API_KEY, base_url=base_url, transport=replay) as api:
+        assert list(api.export("x")) == recorded
+    assert time.perf_counter() - started >= chunks[-1][0] * 0.9
+    assert chunks[-1][0] >= 0.1
+
+
+def test_unreadable_cassette(tmp_path: Path) -> None:
+    bogus = tmp_path / "bogus.cassette"
+    bogus.write_bytes(b"not gzip")
+    with pytest.raises(CassetteError):
+        ReplayTransport(bogus)
@@ -2,7 +2,10 @@
 
 from __future__ import annotations
 
+import gzip
 import json
+import pstats
+import sqlite3
 from pathlib import Path
 
 import httpx
@@ -11,6 +14,7 @@ import respx
 from typer.testing import CliRunner
 
 from pyonyphe.cli import app
+from pyonyphe.fake_server import FakeOnyphe, serve
 
 from .conftest import API_KEY, BASE, envelope
 
@@ -111,3 +115,228 @@ def test_config_masks_the_key() -> None:
     result = runner.invoke(app, ["--api-key", API_KEY, "config"])
     assert result.exit_code == 0
     assert API_KEY not in result.stdout
+
+
+def test_bench_against_the_fake_server(tmp_path: Path) -> None:
+    output = tmp_path / "bench.json"
+    with serve(FakeOnyphe()) as base_url:
+        args = ["--api-key", API_KEY, "--base-url", base_url, "bench", "--mix", "user,search"]
+        table = runner.invoke(app, [*args, "-n", "20", "-c", "4"])
+        result = runner.invoke(app, [*args, "-n", "10", "--format", "json", "-o", str(output)])
+    assert table.exit_code == 0, table.output
+    assert "throughput" in table.stdout
+    assert result.exit_code == 0, result.output
+    report = json.loads(output.read_text())
+    assert report["calls"] == 10
+    assert set(report["endpoints"]) == {"user", "search"}
+
+
+def test_bench_rejects_an_unknown_endpoint() -> None:
+    result = runner.invoke(app, ["--api-key", API_KEY, "bench", "--mix", "nope"])
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize("option", [["--rate", "0"], ["--rate", "-1"], ["--concurrency", "0"]])
+def test_bench_rejects_a_rate_or_concurrency_out_of_range(option: list[str]) -> None:
+    result = runner.invoke(app, ["--api-key", API_KEY, "bench", *option])
+    assert result.exit_code == 2
+
+
+def test_profile_reports_every_phase(tmp_path: Path) -> None:
+    output = tmp_path / "export.ndjson"
+    stats = tmp_path / "export.pstats"
+    with serve(FakeOnyphe()) as base_url:
+        result = runner.invoke(
+            app,
+            [
+                *("--api-key", API_KEY, "--base-url", base_url),
+                *("--profile", "--profile-stats", str(stats)),
+                *("export", "x", "-o", str(output)),
+            ],
+        )
+    assert result.exit_code == 0, result.output
+    for phase in ("connect", "wait", "transfer", "parse", "serialize", "write", "total"):
+        assert phase in result.stderr
+    # Rich wraps to the terminal width: compare on normalised whitespace.
+    report = " ".join(result.stderr.split())
+    assert "1000 document(s)" in report
+    assert "peak Python memory" in report
+    assert pstats.Stats(str(stats)).total_calls > 0
+
+
+@respx.mock
+def test_progress_line_on_request(tmp_path: Path) -> None:
+    respx.get(f"{BASE}/export/").mock(
+        return_value=httpx.Response(200, text='{"ip":"1.1.1.1"}\n' * 3)
+    )
+    target = tmp_path / "out.ndjson"
+    args = ["--api-key", API_KEY, "export", "x", "-o", str(target)]
+    # Off by default when stderr is not a terminal, as under the runner.
+    assert "\x1b[2K" not in runner.invoke(app, args).stderr
+    result = runner.invoke(app, ["--progress", *args])
+    assert result.exit_code == 0
+    assert result.stderr.endswith("3 document(s)\n")
+    assert target.read_text(encoding="utf-8").count("\n") == 3
+
+
+@respx.mock
+def test_compressed_output(tmp_path: Path) -> None:
+    zstandard = pytest.importorskip("zstandard")
+    body = '{"ip":"1.1.1.1"}\n{"ip":"8.8.8.8"}\n'
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    target = tmp_path / "out.ndjson.gz"
+    result = runner.invoke(app, ["--api-key", API_KEY, "export", "x", "-o", str(target)])
+    assert result.exit_code == 0, result.output
+    assert gzip.decompress(target.read_bytes()).decode() == '{"ip": "1.1.1.1"}\n{"ip": "8.8.8.8"}\n'
+    result = runner.invoke(app, ["--api-key", API_KEY, "--compression", "zstd", "export", "x"])
+    assert result.exit_code == 0, result.output
+    assert (
+        zstandard.ZstdDecompressor().decompressobj().decompress(result.stdout_bytes).count(b"\n")
+        == 2
+    )
+    result = runner.invoke(app, ["--api-key", API_KEY, "--compression", "lzma", "export", "x"])
+    assert result.exit_code == 2
+
+
+@respx.mock
+def test_csv_output_with_fields() -> None:
+    body = '{"ip":"1.1.1.1","app":{"http":{"title":"home"}},"cve":["a","b"]}\n{"ip":"8.8.8.8"}\n'
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    args = ["--api-key", API_KEY, "export", "x", "-f", "tsv", "--fields", "ip,app.http.title,cve"]
+    result = runner.invoke(app, [*args, "--list-sep", ","])
+    assert result.exit_code == 0, result.output
+    assert result.stdout.splitlines() == [
+        "ip\tapp.http.title\tcve",
+        "1.1.1.1\thome\ta,b",
+        "8.8.8.8\t\t",
+    ]
+    result = runner.invoke(app, ["--api-key", API_KEY, "export", "x", "-f", "xml"])
+    assert result.exit_code == 2
+
+
+@respx.mock
+def test_csv_output_warns_of_a_field_left_out() -> None:
+    body = '{"ip":"1.1.1.1"}\n{"ip":"8.8.8.8","port":53,"os":"linux"}\n{"port":80}\n'
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    result = runner.invoke(app, ["--api-key", API_KEY, "export", "x", "-f", "csv"])
+    assert result.exit_code == 0, result.output
+    assert result.stdout.splitlines() == ["ip", "1.1.1.1", "8.8.8.8", '""']
+    assert result.stderr.count("left out") == 1
+    assert "port" in result.stderr and "--fields" in result.stderr
+
+
+@respx.mock
+def test_sharded_output(tmp_path: Path) -> None:
+    body = "".join(
+        f'{{"ip":"10.0.0.{n}","country":"{"FR" if n % 2 else "DE"}"}}\n' for n in range(9)
+    )
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    args = ["--api-key", API_KEY, "export", "x", "-f", "csv", "--fields", "ip"]
+    shards = ["--shard-by", "country", "--shard-documents", "3", "-o", str(tmp_path)]
+    result = runner.invoke(app, [*args, *shards])
+    assert result.exit_code == 0, result.output
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert sorted(shard["path"] for shard in manifest["shards"]) == [
+        "country=DE/part-00000.csv",
+        "country=DE/part-00001.csv",
+        "country=FR/part-00000.csv",
+        "country=FR/part-00001.csv",
+    ]
+    assert (tmp_path / "country=FR/part-00001.csv").read_text() == "ip\n10.0.0.7\n"
+    result = runner.invoke(app, [*args, "--shard-size", "lots", "-o", str(tmp_path)])
+    assert result.exit_code == 2
+
+
+@respx.mock
+def test_store_output(tmp_path: Path) -> None:
+    body = '{"@category":"datascan","ip":"1.1.1.1","port":80}\n{"ip":"8.8.8.8"}\n'
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    target = tmp_path / "onyphe.db"
+    for _ in range(2):
+        args = ["--api-key", API_KEY, "export", "x", "-f", "sqlite", "--key", "ip,port"]
+        result = runner.invoke(app, [*args, "-o", str(target)])
+        assert result.exit_code == 0, result.output
+    with sqlite3.connect(target) as connection:
+        assert connection.execute("SELECT ip, port FROM datascan").fetchall() == [("1.1.1.1", 80)]
+    result = runner.invoke(app, ["--api-key", API_KEY, "export", "x", "-f", "sqlite"])
+    assert result.exit_code == 2
+
+
+@respx.mock
+def test_parquet_and_arrow_output(tmp_path: Path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    body = '{"@category":"datascan","port":80}\n{"@category":"vulnscan","port":"443"}\n'
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    target = tmp_path / "dataset"
+    args = ["--api-key", API_KEY, "export", "x", "-f", "parquet", "--partition-by", "category"]
+    result = runner.invoke(app, [*args, "-o", str(target)])
+    assert result.exit_code == 0, result.output
+    assert {path.name for path in target.iterdir()} == {"category=datascan", "category=vulnscan"}
+    result = runner.invoke(app, ["--api-key", API_KEY, "export", "x", "-f", "arrow"])
+    assert result.exit_code == 0, result.output
+    table = pa.ipc.open_stream(result.stdout_bytes).read_all()
+    assert table.column("port").to_pylist() == ["80", "443"]
+    result = runner.invoke(app, ["--api-key", API_KEY, "export", "x", "-f", "parquet"])
+    assert result.exit_code == 2
+
+
+@respx.mock
+def test_tee_output(tmp_path: Path) -> None:
+    body = '{"@category":"datascan","ip":"1.1.1.1","country":"FR"}\n{"ip":"8.8.8.8"}\n'
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    args = ["--api-key", API_KEY, "export", "x", "--tee", str(tmp_path / "out.ndjson.gz")]
+    args += ["--tee", f"csv:{tmp_path / 'hosts.txt'}", "--tee", str(tmp_path / "onyphe.db")]
+    result = runner.invoke(app, [*args, "--fields", "ip", "--summary", "country"])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line)["ip"] for line in result.stdout.splitlines()] == [
+        "1.1.1.1",
+        "8.8.8.8",
+    ]
+    assert "FR" in result.stderr
+    with gzip.open(tmp_path / "out.ndjson.gz", "rt") as handle:
+        assert len(handle.readlines()) == 2
+    assert (tmp_path / "hosts.txt").read_text() == "ip\n1.1.1.1\n8.8.8.8\n"
+    with sqlite3.connect(tmp_path / "onyphe.db") as connection:
+        assert connection.execute("SELECT count(*) FROM datascan").fetchone() == (1,)
+    for tee in ("hosts.xyz", "ndjson:-"):
+        result = runner.invoke(app, ["--api-key", API_KEY, "export", "x", "--tee", tee])
+        assert result.exit_code == 2
+
+
+@respx.mock
+def test_projection_options() -> None:
+    body = '{"ip":"1.1.1.1","port":80,"data":"banner","app":{"http":{"title":"home"}}}\n'
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    args = ["--api-key", API_KEY, "export", "x", "--keep", "ip,app", "--drop", "app.http.title"]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.stdout) == {"ip": "1.1.1.1", "app": {"http": {}}}
+    result = runner.invoke(app, ["--api-key", API_KEY, "export", "x", "--max-length", "0"])
+    assert result.exit_code == 2
+
+
+def test_filter_locally(tmp_path: Path) -> None:
+    source = tmp_path / "export.ndjson"
+    source.write_text('{"ip":"1.1.1.1","port":80}\n{"ip":"8.8.8.8","port":53}\n')
+    result = runner.invoke(app, ["filter", "port:<100 -port:53", str(source), "-f", "csv"])
+    assert result.exit_code == 0, result.output
+    assert result.stdout.splitlines() == ["ip,port", "1.1.1.1,80"]
+    result = runner.invoke(app, ["filter", "exists:ip", str(source), "--count"])
+    assert result.stdout.strip() == "2"
+    assert runner.invoke(app, ["filter", "port", str(source)]).exit_code == 2
+    assert runner.invoke(app, ["filter", "port:80", str(tmp_path / "missing")]).exit_code == 1
+
+
+def test_index_build_and_lookup(tmp_path: Path) -> None:
+    source = tmp_path / "export.ndjson"
+    source.write_text('{"ip":"1.1.1.1","port":80}\n{"ip":"8.8.8.8","port":53}\n{"ip":"1.1.1.1"}\n')
+    result = runner.invoke(app, ["index", "build", str(source), "--field", "ip", "--workers", "1"])
+    assert result.exit_code == 0, result.output
+    # Three lines, two distinct addresses: the note counts lines indexed.
+    assert result.stderr.startswith("3 entries over ip in ")
+    result = runner.invoke(app, ["index", "lookup", str(source), "ip", "1.1.1.1", "9.9.9.9"])
+    assert result.exit_code == 0, result.output
+    assert result.stdout.splitlines() == ['{"ip":"1.1.1.1","port":80}', '{"ip":"1.1.1.1"}']
+    assert runner.invoke(app, ["index", "lookup", str(source), "domain", "x"]).exit_code == 2
+    source.write_text("{}\n")
+    assert runner.invoke(app, ["index", "lookup", str(source), "ip", "x"]).exit_code == 2
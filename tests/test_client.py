@@ -10,9 +10,11 @@ import pytest
 import respx
 
 from pyonyphe import Onyphe
+from pyonyphe import _specs as specs
 from pyonyphe.errors import (
     AuthenticationError,
     NotFoundError,
+    ParamError,
     RateLimitError,
     ServerError,
     TransportError,
@@ -53,6 +55,20 @@ def test_search_returns_the_envelope(client: Onyphe) -> None:
     assert route.calls.last.request.url.params["q"] == "protocol:rdp"
 
 
+@respx.mock
+def test_canonical_queries_make_equivalent_queries_one_request() -> None:
+    route = respx.get(f"{BASE}/search/").mock(return_value=httpx.Response(200, json=envelope([])))
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=""))
+    with Onyphe(API_KEY, max_retries=0, canonical_queries=True) as client:
+        client.search("product:Nginx  country:FR")
+        client.search('country:"FR" AND product:Nginx')
+        client.search("country:FR OR (")  # not parsed locally: sent as written
+        list(client.export("NOT NOT product:Nginx country:FR"))
+    sent = [call.request.url.params["q"] for call in respx.calls]
+    assert sent == ["country:FR product:Nginx"] * 2 + ["country:FR OR ("] + sent[:1]
+    assert route.call_count == 3
+
+
 @respx.mock
 def test_response_is_iterable(client: Onyphe) -> None:
     respx.get(f"{BASE}/search/").mock(
@@ -205,3 +221,38 @@ def test_request_escape_hatch(client: Onyphe) -> None:
     )
     client.request("GET", "some/new/endpoint", params={"a": "b"})
     assert route.calls.last.request.url.params["a"] == "b"
+
+
+@respx.mock
+def test_send_many_captures_errors_per_item(client: Onyphe) -> None:
+    def answer(request: httpx.Request) -> httpx.Response:
+        ip = request.url.path.rsplit("/", 1)[-1]
+        if ip == "192.0.2.1":
+            return httpx.Response(404, json={"text": "unknown"})
+        return httpx.Response(200, json=envelope([{"ip": ip}]))
+
+    respx.get(url__startswith=f"{BASE}/summary/ip/").mock(side_effect=answer)
+    ips = ["1.1.1.1", "192.0.2.1", "8.8.8.8", "9.9.9.9"]
+    results = list(client.send_many((specs.summary("ip", ip) for ip in ips), workers=2))
+    assert sorted(result.index for result in results) == [0, 1, 2, 3]
+    failed = [result for result in results if not result.ok]
+    assert len(failed) == 1
+    assert isinstance(failed[0].error, NotFoundError)
+
+
+@respx.mock
+def test_send_many_ordered_accepts_callables(client: Onyphe) -> None:
+    respx.get(url__startswith=f"{BASE}/summary/ip/").mock(
+        side_effect=lambda request: httpx.Response(
+            200, json=envelope([{"ip": request.url.path.rsplit("/", 1)[-1]}])
+        )
+    )
+    ips = [f"10.0.0.{n}" for n in range(20)]
+    calls = [lambda api, ip=ip: api.summary_ip(ip) for ip in ips]
+    results = list(client.send_many(calls, workers=4, ordered=True))
+    assert [result.result.results[0]["ip"] for result in results] == ips
+
+
+def test_send_many_rejects_streaming_specs(client: Onyphe) -> None:
+    (result,) = client.send_many([specs.export("x")])
+    assert isinstance(result.error, ParamError)
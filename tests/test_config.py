@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 import pytest
 
+from pyonyphe import config
 from pyonyphe.config import DEFAULT_BASE_URL, UNRATED_BASE_URL, load_settings
 from pyonyphe.errors import ConfigError
 
@@ -28,6 +30,24 @@ def test_toml_config(tmp_path: Path) -> None:
     assert load_settings(config_path=path).api_key == "from-toml"
 
 
+def test_config_file_is_parsed_once_until_it_changes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "config.toml"
+    path.write_text('[onyphe]\napi_key = "first"\n', encoding="utf-8")
+    reads: list[Path] = []
+    original = config._read_toml
+    monkeypatch.setattr(config, "_read_toml", lambda p: reads.append(p) or original(p))
+    assert load_settings(config_path=path).api_key == "first"
+    assert load_settings(config_path=path).api_key == "first"
+    assert reads == [path]
+    path.write_text('[onyphe]\napi_key = "second"\n', encoding="utf-8")
+    stamp = path.stat().st_mtime_ns + 1_000_000_000  # coarse clocks: force a new mtime
+    os.utime(path, ns=(stamp, stamp))
+    assert load_settings(config_path=path).api_key == "second"
+    assert len(reads) == 2
+
+
 def test_onyphe_ini_is_read(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     # HOME on POSIX, USERPROFILE on Windows -- Path.home() looks at both.
     monkeypatch.setenv("HOME", str(tmp_path))
@@ -0,0 +1,78 @@
+"""The local fake ONYPHE server, in-process and over a socket."""
+
+from __future__ import annotations
+
+import httpx
+import pytest
+
+from pyonyphe import AsyncOnyphe, Onyphe
+from pyonyphe.errors import AuthenticationError, ParamError, RateLimitError, TransportError
+from pyonyphe.fake_server import FakeOnyphe, Faults, serve
+
+from .conftest import API_KEY
+
+
+def in_process(app: FakeOnyphe, **kwargs: object) -> AsyncOnyphe:
+    return AsyncOnyphe(
+        API_KEY,
+        base_url="http://fake/api/v2",
+        transport=httpx.ASGITransport(app),
+        **kwargs,  # type: ignore[arg-type]
+    )
+
+
+async def test_serves_every_endpoint_family() -> None:
+    app = FakeOnyphe(Faults(total=250, seed=1))
+    async with in_process(app) as client:
+        assert (await client.user()).results[0]["credits"] > 0
+        hits = [hit async for hit in client.search_iter("x", size=100)]
+        assert len(hits) == 250
+        summary = await client.summary_ip("192.0.2.1")
+        assert {doc["ip"] for doc in summary.results} == {"192.0.2.1"}
+        assert (await client.simple_best("whois", "192.0.2.1")).results
+        bulk = [doc async for doc in client.bulk_summary("ip", ["192.0.2.1", "192.0.2.2"])]
+        assert [doc["ip"] for doc in bulk] == ["192.0.2.1", "192.0.2.2"]
+        assert len([doc async for doc in client.export("x")]) == 250
+        await client.add_alert("new", "x", "me@example.com")
+        alerts = await client.alerts()
+        assert [alert.name for alert in alerts] == ["new"]
+    assert app.requests["search"] == 3
+    assert app.requests["simple/whois/best"] == 1
+
+
+async def test_rate_limits_and_errors_are_injected() -> None:
+    app = FakeOnyphe(Faults(rate_limit_rate=1.0, retry_after=0))
+    async with in_process(app, max_retries=2, backoff=0.0) as client:
+        with pytest.raises(RateLimitError) as caught:
+            await client.user()
+    assert caught.value.retry_after == 0
+    assert app.requests["user"] == 0
+
+
+async def test_api_key_is_checked() -> None:
+    async with in_process(FakeOnyphe(Faults(api_key="right"))) as client:
+        with pytest.raises(AuthenticationError):
+            await client.user()
+
+
+def test_throttled_stream_over_a_socket() -> None:
+    app = FakeOnyphe(Faults(total=300, chunk_documents=100, stream_rate=10_000))
+    with serve(app) as base_url, Onyphe(API_KEY, base_url=base_url) as client:
+        with client.export("x") as stream:
+            assert sum(1 for _ in stream) == 300
+        assert stream.stats.documents == 300
+
+
+def test_mid_stream_disconnect() -> None:
+    app = FakeOnyphe(Faults(total=1000, chunk_documents=50, disconnect_rate=1.0))
+    with serve(app) as base_url, Onyphe(API_KEY, base_url=base_url) as client:
+        seen = 0
+        with pytest.raises(TransportError):
+            for _ in client.export("x"):
+                seen += 1
+    assert 50 <= seen < 1000
+
+
+def test_transport_and_http_client_are_exclusive() -> None:
+    with httpx.Client() as http, pytest.raises(ParamError):
+        Onyphe(API_KEY, http_client=http, transport=httpx.MockTransport(lambda r: None))
@@ -0,0 +1,63 @@
+"""Dotted paths into nested documents."""
+
+from __future__ import annotations
+
+import pytest
+
+from pyonyphe.errors import ParamError
+from pyonyphe.fields import Projection, getter, parse_fields, paths
+
+DOCUMENT = {
+    "ip": "1.1.1.1",
+    "app": {"http": {"title": "home", "headers": None}},
+    "cpe": [{"vendor": "nginx", "product": ["a", "b"]}, {"vendor": "openssl"}, "bare"],
+    "tls.version": "1.3",
+    "empty": {},
+}
+
+
+def test_paths_walk_objects_and_lists() -> None:
+    assert getter("ip")(DOCUMENT) == "1.1.1.1"
+    assert getter("app.http.title")(DOCUMENT) == "home"
+    assert getter("app.http.headers.server")(DOCUMENT) is None
+    assert getter("app.ftp")(DOCUMENT) is None
+    assert getter("cpe.vendor")(DOCUMENT) == ["nginx", "openssl"]
+    assert getter("cpe.product")(DOCUMENT) == ["a", "b"]
+    assert getter("cpe.version")(DOCUMENT) is None
+    assert getter("tls.version")(DOCUMENT) == "1.3"
+    assert getter("ip.octet")(DOCUMENT) is None
+
+
+def test_leaves_and_field_lists() -> None:
+    assert list(paths(DOCUMENT)) == [
+        "ip",
+        "app.http.title",
+        "app.http.headers",
+        "cpe",
+        "tls.version",
+        "empty",
+    ]
+    assert parse_fields(" ip, app.http.title ,,port") == ["ip", "app.http.title", "port"]
+
+
+def test_projection_keeps_drops_and_truncates() -> None:
+    keep = Projection(["ip", "app.http.title", "cpe.vendor", "missing", "app.http.title.x"])
+    assert keep(DOCUMENT) == {
+        "ip": "1.1.1.1",
+        "app": {"http": {"title": "home"}},
+        "cpe": [{"vendor": "nginx"}, {"vendor": "openssl"}],
+    }
+    # A shorter path takes everything under it, whatever the order.
+    assert Projection(["app.http.title", "app"])(DOCUMENT) == {"app": DOCUMENT["app"]}
+    assert Projection(["nowhere"])(DOCUMENT) == {}
+    dropped = Projection(drop=["app.http", "cpe.product", "empty"], max_length=3)(DOCUMENT)
+    assert dropped == {
+        "ip": "1.1",
+        "app": {},
+        "cpe": [{"vendor": "ngi"}, {"vendor": "ope"}, "bar"],
+        "tls.version": "1.3",
+    }
+    assert DOCUMENT["cpe"][0] == {"vendor": "nginx", "product": ["a", "b"]}  # never changed
+    for bad in ({"keep": ["app..http"]}, {"drop": [""]}, {"max_length": 0}):
+        with pytest.raises(ParamError):
+            Projection(**bad)
@@ -0,0 +1,62 @@
+"""Startup cost: what importing the package and the CLI loads."""
+
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+
+import pytest
+
+import pyonyphe
+
+#: Modules that must wait until a client or a table is actually needed.
+DEFERRED = {
+    "pyonyphe": ("httpx", "pydantic", "rich", "typer", "click"),
+    "pyonyphe.cli": ("httpx", "pydantic", "rich", "asyncio", "pyarrow"),
+}
+
+#: Import-time budgets in microseconds, several times what they take today so
+#: that only a regression -- not a slow machine -- trips them.
+BUDGETS = {"pyonyphe": 50_000, "pyonyphe.cli": 300_000}
+
+
+def _loaded(module: str) -> set[str]:
+    script = f"import sys, {module}; print(','.join(sys.modules))"
+    result = subprocess.run(  # noqa: S603 - our own interpreter and a fixed script
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.strip().split(","))
+
+
+@pytest.mark.parametrize("module", sorted(DEFERRED))
+def test_import_stays_light(module: str) -> None:
+    loaded = _loaded(module)
+    assert not [name for name in DEFERRED[module] if name in loaded]
+
+
+def _import_time(module: str) -> int:
+    """Microseconds ``-X importtime`` reports for ``module``, its imports included."""
+    result = subprocess.run(  # noqa: S603 - our own interpreter and a fixed script
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    match = re.search(rf"\|\s*(\d+) \| {re.escape(module)}$", result.stderr, re.MULTILINE)
+    assert match, result.stderr
+    return int(match.group(1))
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_import_fits_its_budget(module: str) -> None:
+    # Best of three: a single run picks up whatever else the machine is doing.
+    assert min(_import_time(module) for _ in range(3)) < BUDGETS[module]
+
+
+def test_public_names_resolve_lazily() -> None:
+    for name in pyonyphe.__all__:
+        assert getattr(pyonyphe, name) is not None
+    assert set(pyonyphe.__all__) <= set(dir(pyonyphe))
+    with pytest.raises(AttributeError, match="no_such_name"):
+        _ = pyonyphe.no_such_name  # type: ignore[attr-defined]
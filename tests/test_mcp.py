@@ -121,3 +121,13 @@ async def test_user() -> None:
 
 def test_every_tool_is_registered() -> None:
     assert mcp_server.server.name == "pyonyphe"
+
+
+@pytest.mark.parametrize("value", ["nine", "0", "70000"])
+def test_a_bad_metrics_port_exits_with_a_message(
+    monkeypatch: pytest.MonkeyPatch, value: str
+) -> None:
+    monkeypatch.setenv("ONYPHE_METRICS_PORT", value)
+    monkeypatch.setattr(mcp_server.server, "run", lambda: pytest.fail("served anyway"))
+    with pytest.raises(SystemExit, match="ONYPHE_METRICS_PORT must be a port number"):
+        mcp_server.main()
@@ -0,0 +1,88 @@
+"""Lifecycle hooks and the in-memory metrics collector."""
+
+from __future__ import annotations
+
+import httpx
+import pytest
+import respx
+
+from pyonyphe import AsyncOnyphe, Event, MetricsCollector, Onyphe
+from pyonyphe.errors import ServerError
+from pyonyphe.metrics import Histogram
+
+from .conftest import API_KEY, BASE, envelope
+
+
+@respx.mock
+def test_events_of_a_retried_call() -> None:
+    respx.get(f"{BASE}/summary/ip/8.8.8.8").mock(
+        side_effect=[
+            httpx.Response(429, headers={"Retry-After": "0"}, json={"text": "slow down"}),
+            httpx.Response(200, json=envelope()),
+        ]
+    )
+    events: list[Event] = []
+    with Onyphe(API_KEY, max_retries=1, hooks=[events.append]) as client:
+        client.summary_ip("8.8.8.8")
+    assert [event.name for event in events] == [
+        "request_prepared",
+        "attempt_started",
+        "attempt_finished",
+        "retry_scheduled",
+        "attempt_started",
+        "attempt_finished",
+        "request_finished",
+    ]
+    assert {event.endpoint for event in events} == {"summary/ip"}
+    assert len({id(event.request) for event in events}) == 1
+    assert events[2].status == 429
+    assert events[-1].status == 200
+
+
+@respx.mock
+def test_collector_aggregates_per_endpoint() -> None:
+    respx.get(url__startswith=f"{BASE}/summary/ip/").mock(
+        side_effect=[
+            httpx.Response(503, json={"text": "busy"}),
+            httpx.Response(200, json=envelope()),
+            httpx.Response(500, json={"text": "broken"}),
+        ]
+    )
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text='{"n":1}\n{"n":2}\n'))
+    metrics = MetricsCollector()
+    with Onyphe(API_KEY, max_retries=1, backoff=0.0, hooks=[metrics]) as client:
+        client.summary_ip("1.1.1.1")
+        client.max_retries = 0
+        with pytest.raises(ServerError):
+            client.summary_ip("8.8.8.8")
+        assert list(client.export("x")) == [{"n": 1}, {"n": 2}]
+    summary = metrics["summary/ip"]
+    assert summary.requests == 2
+    assert summary.errors == 1
+    assert summary.attempts == 3
+    assert summary.retries == 1
+    assert summary.statuses == {503: 1, 200: 1, 500: 1}
+    assert summary.latency.count == 2
+    export = metrics.snapshot()["export"]
+    assert export["documents"] == 2
+    assert export["bytes"] == len('{"n":1}\n{"n":2}\n')
+
+
+@respx.mock
+async def test_async_client_emits_the_same_events() -> None:
+    respx.get(f"{BASE}/user").mock(return_value=httpx.Response(200, json=envelope()))
+    metrics = MetricsCollector()
+    async with AsyncOnyphe(API_KEY, max_retries=0, hooks=[metrics]) as client:
+        await client.user()
+    assert metrics.endpoints() == ["user"]
+    assert metrics["user"].requests == 1
+
+
+def test_histogram_quantiles() -> None:
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert histogram.mean == pytest.approx(1.4)
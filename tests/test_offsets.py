@@ -0,0 +1,69 @@
+"""The NDJSON offset index of pyonyphe.offsets."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from pyonyphe.errors import ParamError
+from pyonyphe.offsets import OffsetIndex, index_path
+
+
+def write(path: Path, count: int = 300) -> list[dict[str, object]]:
+    documents = [
+        {
+            "ip": f"10.0.{n // 256}.{n % 256}",
+            "port": n,
+            "domain": [f"d{n % 7}.example", "shared.example"] if n % 3 else [],
+            "datamd5": f"{n % 11:032x}",
+        }
+        for n in range(count)
+    ]
+    lines = [json.dumps(document) for document in documents]
+    # A blank line and one that is not JSON are skipped, not fatal.
+    lines[10:10] = ["", "not json"]
+    path.write_text("\n".join(lines) + "\n")
+    return documents
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_lookups_find_every_line_holding_the_value(tmp_path: Path, workers: int) -> None:
+    source = tmp_path / "export.ndjson"
+    documents = write(source)
+    # Ranges far smaller than the file, so most start mid-line.
+    with OffsetIndex.build(source, workers=workers, split_size=997) as index:
+        assert index.path == index_path(source) == tmp_path / "export.ndjson.idx"
+        assert list(index.lookup("ip", "10.0.1.4")) == [documents[260]]
+        wanted = [d for d in documents if "d3.example" in d["domain"]]
+        assert list(index.lookup("domain", "D3.Example")) == wanted
+        assert len(list(index.lookup("domain", "shared.example"))) == 200
+        assert [d["port"] for d in index.lookup("datamd5", f"{4:032x}")] == list(range(4, 300, 11))
+        assert list(index.lookup("ip", "192.0.2.1")) == []
+        with pytest.raises(ParamError, match="not indexed"):
+            index.offsets("port", 80)
+        offsets = index.offsets("ip", "10.0.0.0")
+        assert offsets == [0]
+        assert next(index.lines("ip", "10.0.0.0")).startswith(b'{"ip": "10.0.0.0"')
+
+
+def test_index_is_refused_once_the_file_changes(tmp_path: Path) -> None:
+    source = tmp_path / "export.ndjson"
+    write(source, 5)
+    OffsetIndex.build(source, fields=["ip"]).close()
+    with OffsetIndex(source) as index:
+        assert index.fields == ("ip",)
+        assert len(index) == 5
+    with source.open("a") as handle:
+        handle.write('{"ip": "10.9.9.9"}\n')
+    with pytest.raises(ParamError, match="build it again"):
+        OffsetIndex(source)
+    with pytest.raises(ParamError, match="cannot open"):
+        OffsetIndex(source, tmp_path / "missing.idx")
+    (tmp_path / "bogus.idx").write_bytes(os.urandom(64))
+    with pytest.raises(ParamError, match="not an index"):
+        OffsetIndex(source, tmp_path / "bogus.idx")
+    with pytest.raises(ParamError, match="compressed"):
+        OffsetIndex.build(tmp_path / "export.ndjson.gz")
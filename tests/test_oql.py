@@ -0,0 +1,104 @@
+"""The local OQL evaluator of pyonyphe.oql."""
+
+from __future__ import annotations
+
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from pyonyphe.errors import ParamError
+from pyonyphe.oql import And, Not, Or, Query, Term, canonical, fingerprint, parse
+
+DOCUMENTS = [
+    {"@category": "datascan", "port": 8080, "country": "DE", "product": "Nginx", "tag": ["a", "b"]},
+    {"@category": "datascan", "port": "80", "country": "FR", "product": "Apache httpd"},
+    {"@category": "vulnscan", "port": 443, "cve": [], "app": {"http": {"title": "Login"}}},
+]
+
+
+def test_parse_builds_the_tree_and_prints_it_back() -> None:
+    node = parse('category:datascan (port:>=8000 OR -?product:"apache *") NOT exists:cve')
+    assert node == And(
+        (
+            Term("category", "datascan"),
+            Or((Term("port", "8000", ">="), Not(Term("product", "apache *", "?")))),
+            Not(Term("cve", op="exists")),
+        )
+    )
+    assert str(node) == 'category:datascan (port:>=8000 OR -?product:"apache *") -exists:cve'
+    assert parse(str(node)) == node
+    assert parse('title:"<b> \\"x\\""') == Term("title", '<b> "x"')
+    assert parse("--a:b") == Term("a", "b")
+
+
+@pytest.mark.parametrize(
+    ("query", "matches"),
+    [
+        ("category:datascan", [0, 1]),
+        ("port:80", [1]),
+        ('port:"8080.0"', [0]),
+        ("product:nginx", [0]),
+        ("tag:b", [0]),
+        ("port:>=443 -country:DE", [2]),
+        ("port:>100 port:<1000", [2]),
+        ("?product:apache*", [1]),
+        ("?product:ng?nx", [0]),
+        ('~product:"(nginx|apache).*"', [0, 1]),
+        ("exists:cve", []),
+        ("-exists:country", [2]),
+        ("app.http.title:login", [2]),
+        ("product:nginx OR @category:vulnscan", [0, 2]),
+        ("NOT (port:80 OR port:443)", [0]),
+        ("(country:FR OR country:DE) AND -product:nginx", [1]),
+    ],
+)
+def test_query_matches(query: str, matches: list[int]) -> None:
+    compiled = Query(query)
+    assert [index for index, document in enumerate(DOCUMENTS) if compiled(document)] == matches
+    # The batch filter agrees with the document test, and keeps the order.
+    assert compiled.select(DOCUMENTS) == [DOCUMENTS[index] for index in matches]
+
+
+@pytest.mark.parametrize("query", ["", "nginx", "(a:b", "a:b)", "port:>", "?~a:b", '~a:"("'])
+def test_invalid_queries(query: str) -> None:
+    with pytest.raises(ParamError):
+        Query(query)
+
+
+def test_scan_skips_lines_that_cannot_match(tmp_path: Path) -> None:
+    path = tmp_path / "export.ndjson.gz"
+    lines = [json.dumps(document) for document in DOCUMENTS] * 500
+    path.write_bytes(gzip.compress(("\n".join([*lines, "junk", "[1]"]) + "\n").encode()))
+    query = Query("category:datascan country:fr")
+    assert not query.may_match(b'{"country": "DE", "@category": "datascan"}')
+    found = list(query.scan(path, batch_size=100))
+    assert found == [DOCUMENTS[1]] * 500
+    assert list(Query("port:80").filter(iter(DOCUMENTS))) == [DOCUMENTS[1]]
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ('product:Nginx  country:"FR"', "country:FR product:Nginx"),
+        ("country:FR AND product:Nginx country:FR", "country:FR product:Nginx"),
+        ("NOT NOT port:80", "port:80"),
+        ("(c:3 OR (b:2 OR a:1)) (d:4)", "(a:1 OR b:2 OR c:3) d:4"),
+        ("z:1 OR (y:2 x:3)", "(x:3 y:2) OR z:1"),
+        ("-(b:2 a:1) ?p:ngin*", "-(a:1 b:2) ?p:ngin*"),
+    ],
+)
+def test_canonical_spelling(query: str, expected: str) -> None:
+    assert canonical(query) == expected
+    assert canonical(expected) == expected
+    assert Query(expected).select(DOCUMENTS) == Query(query).select(DOCUMENTS)
+    assert fingerprint(query) == fingerprint(expected)
+    assert len(fingerprint(query)) == 32
+
+
+def test_canonical_keeps_what_changes_the_matches() -> None:
+    assert canonical("product:Nginx") != canonical("product:nginx")
+    assert fingerprint("a:1 b:2") != fingerprint("a:1 OR b:2")
+    with pytest.raises(ParamError):
+        canonical("a:1 (")
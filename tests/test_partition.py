@@ -0,0 +1,217 @@
+"""Query partitioning: pure planning, then concurrent fan-out against a mock."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+import respx
+
+from pyonyphe import AsyncOnyphe, Dimension, Onyphe, Window
+from pyonyphe.errors import AuthenticationError, ParamError
+from pyonyphe.oql import Query
+from pyonyphe.partition import aplan, countries, merge, plan, ports
+
+from .conftest import BASE, envelope
+
+COUNTS = {
+    "q": 30,
+    "q country:FR": 12,
+    "q country:DE": 8,
+    "q -country:FR -country:DE": 10,
+    "q country:FR port:80": 5,
+    "q country:FR port:443": 7,
+    "q country:FR -port:80 -port:443": 0,
+}
+
+
+def test_values_dimension_adds_a_remainder() -> None:
+    dimension = Dimension.values("product", ["Apache httpd", "nginx"])
+    assert dimension.slices() == (
+        'product:"Apache httpd"',
+        "product:nginx",
+        '-product:"Apache httpd" -product:nginx',
+    )
+
+
+def test_custom_dimension_has_no_remainder() -> None:
+    assert Dimension(("a:1", "a:2")).slices() == ("a:1", "a:2")
+
+
+def test_empty_dimension_is_rejected() -> None:
+    with pytest.raises(ParamError):
+        Dimension(())
+
+
+def test_plan_recurses_only_where_needed() -> None:
+    queries = plan(COUNTS.__getitem__, "q", [countries(["FR", "DE"]), ports([80, 443])], target=10)
+    assert queries == [
+        "q country:FR port:80",
+        "q country:FR port:443",
+        "q country:DE",
+        "q -country:FR -country:DE",
+    ]
+
+
+def test_plan_keeps_a_small_query_whole() -> None:
+    assert plan(lambda _: 5, "q", [ports([80])], target=10) == ["q"]
+    assert plan(lambda _: 0, "q", [ports([80])], target=10) == []
+
+
+HOURLY = [
+    {
+        "@timestamp": (datetime(2025, 1, 1) + timedelta(hours=hour)).strftime(
+            "%Y-%m-%dT%H:%M:%S.000Z"
+        ),
+        "port": 80 + hour % 2,
+    }
+    for hour in range(-5, 60)
+]
+
+
+def _count(query: str) -> int:
+    return len(Query(query).select(HOURLY))
+
+
+def test_windows_are_halved_until_each_fits() -> None:
+    window = Window(datetime(2025, 1, 1), datetime(2025, 1, 3), minimum=timedelta(hours=3))
+    queries = plan(_count, "port:80 OR port:81", [window, ports([80])], target=6)
+    assert [_count(query) for query in queries] == [6] * 8 + [5, 6, 6]
+    assert queries[0] == (
+        "(port:80 OR port:81) @timestamp:>=2025-01-01T00:00:00.000Z"
+        " @timestamp:<2025-01-01T06:00:00.000Z"
+    )
+    # After the range: 12 documents, cut by the next dimension instead.
+    assert queries[-1] == "(port:80 OR port:81) @timestamp:>=2025-01-03T00:00:00.000Z -port:80"
+    matched = [id(doc) for query in queries for doc in Query(query).select(HOURLY)]
+    assert len(matched) == len(set(matched)) == len(HOURLY)
+
+
+def test_a_slice_that_never_fits_raises_when_strict() -> None:
+    window = Window(datetime(2025, 1, 1), datetime(2025, 1, 3), minimum=timedelta(days=1))
+    assert plan(_count, "port:80", [window], target=6)[-1].endswith("2025-01-03T00:00:00.000Z")
+    with pytest.raises(ParamError, match="still matches"):
+        plan(_count, "port:80", [window], target=6, strict=True)
+    with pytest.raises(ParamError):
+        Window(datetime(2025, 1, 2), datetime(2025, 1, 1))
+
+
+async def test_aplan_bounds_the_counts_in_flight() -> None:
+    flying = peak = 0
+
+    async def count(query: str) -> int:
+        nonlocal flying, peak
+        flying += 1
+        peak = max(peak, flying)
+        await asyncio.sleep(0.01)
+        flying -= 1
+        return _count(query)
+
+    window = Window(datetime(2025, 1, 1), datetime(2025, 1, 3), minimum=timedelta(hours=3))
+    queries = await aplan(count, "port:80 OR port:81", [window, ports([80])], target=6)
+    assert queries == plan(_count, "port:80 OR port:81", [window, ports([80])], target=6)
+    peak = 0
+    await aplan(count, "port:80", [ports(range(40))], target=1)
+    assert peak == 8
+    peak = 0
+    await aplan(count, "port:80", [ports(range(40))], target=1, concurrency=2)
+    assert peak == 2
+
+
+def test_plan_keeps_slices_of_an_or_query_disjoint() -> None:
+    documents = [
+        {"product": product, "country": country, "port": port}
+        for product in ("nginx", "apache", "iis")
+        for country in ("FR", "DE")
+        for port in (80, 443)
+    ]
+
+    def count(query: str) -> int:
+        return len(Query(query).select(documents))
+
+    queries = plan(count, "product:nginx OR product:apache", [countries(["FR"])], target=1)
+    assert queries == [
+        "(product:nginx OR product:apache) country:FR",
+        "(product:nginx OR product:apache) -country:FR",
+    ]
+    matched = [id(doc) for query in queries for doc in Query(query).select(documents)]
+    assert len(matched) == len(set(matched)) == count("product:nginx OR product:apache")
+
+
+def test_merge_closes_the_sources_it_abandons() -> None:
+    closed = []
+
+    class Endless:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+        def __iter__(self) -> Iterator[dict[str, str]]:
+            while True:
+                yield {"source": self.name}
+
+        def close(self) -> None:
+            closed.append(self.name)
+
+    documents = merge([lambda: Endless("a"), lambda: Endless("b")], workers=2)
+    seen = set()
+    while len(seen) < 2:
+        seen.add(next(documents)["source"])
+    documents.close()
+    assert sorted(closed) == ["a", "b"]
+
+
+def _count_from_query(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json=envelope(total=COUNTS[request.url.params["q"]]))
+
+
+@respx.mock
+def test_export_partitioned_merges_every_slice(client: Onyphe) -> None:
+    respx.get(f"{BASE}/search/").mock(side_effect=_count_from_query)
+    respx.get(f"{BASE}/export/").mock(
+        side_effect=lambda request: httpx.Response(
+            200, text=f'{{"q":"{request.url.params["q"]}"}}\n'
+        )
+    )
+    dims = [countries(["FR", "DE"]), ports([80, 443])]
+    rows = list(client.export_partitioned("q", dims, target=10, workers=3))
+    assert sorted(row["q"] for row in rows) == sorted(client.partition("q", dims, target=10))
+    assert len(rows) == 4
+
+
+@respx.mock
+def test_export_partitioned_surfaces_errors(client: Onyphe) -> None:
+    respx.get(f"{BASE}/search/").mock(side_effect=_count_from_query)
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(403, json={"text": "no"}))
+    with pytest.raises(AuthenticationError):
+        list(client.export_partitioned("q", [countries(["FR", "DE"])], target=20))
+
+
+@respx.mock
+async def test_async_export_partitioned_falls_back_to_search() -> None:
+    def search(request: httpx.Request) -> httpx.Response:
+        query = request.url.params["q"]
+        if request.url.params["size"] == "1":
+            return httpx.Response(200, json=envelope(total=COUNTS[query]))
+        return httpx.Response(200, json=envelope([{"q": query}], max_page=1))
+
+    respx.get(f"{BASE}/search/").mock(side_effect=search)
+    async with AsyncOnyphe("k", max_retries=0) as client:
+        rows = [
+            row
+            async for row in client.export_partitioned(
+                "q", [countries(["FR", "DE"])], target=20, use_export=False
+            )
+        ]
+    assert sorted(row["q"] for row in rows) == [
+        "q -country:FR -country:DE",
+        "q country:DE",
+        "q country:FR",
+    ]
+
+
+def test_walking_slices_needs_a_target_the_search_api_reaches() -> None:
+    with Onyphe("k", max_retries=0) as client, pytest.raises(ParamError, match="at most 10000"):
+        client.export_partitioned("q", [ports([80])], target=20_000, use_export=False)
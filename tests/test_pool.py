@@ -0,0 +1,96 @@
+"""Tenant clients share one connection pool but never each other's credentials."""
+
+from __future__ import annotations
+
+import threading
+
+import httpx
+import respx
+
+from pyonyphe import AsyncOnyphePool, OnyphePool
+
+from .conftest import BASE, envelope
+
+
+@respx.mock
+def test_tenants_share_the_transport_not_the_key() -> None:
+    route = respx.get(f"{BASE}/user").mock(return_value=httpx.Response(200, json=envelope()))
+    with OnyphePool(max_retries=0) as pool:
+        acme = pool.add("acme", "acme-key")
+        globex = pool.add("globex", "globex-key")
+        acme.user()
+        globex.user()
+        assert acme._client is not globex._client
+        assert acme._client._transport is globex._client._transport
+        assert pool.tenants() == ["acme", "globex"]
+    seen = [call.request.headers["Authorization"] for call in route.calls]
+    assert seen == ["bearer acme-key", "bearer globex-key"]
+
+
+@respx.mock
+def test_tenants_never_share_cookies() -> None:
+    route = respx.get(f"{BASE}/user").mock(
+        return_value=httpx.Response(200, json=envelope(), headers={"Set-Cookie": "session=acme"})
+    )
+    with OnyphePool(max_retries=0) as pool:
+        pool.add("acme", "acme-key").user()
+        pool.add("globex", "globex-key").user()
+    assert "cookie" not in route.calls.last.request.headers
+
+
+@respx.mock
+def test_closing_a_tenant_keeps_the_pool_open() -> None:
+    respx.get(f"{BASE}/user").mock(return_value=httpx.Response(200, json=envelope()))
+    with OnyphePool(max_retries=0) as pool:
+        with pool.add("acme", "acme-key") as acme:
+            acme.user()
+        pool.add("globex", "globex-key").user()
+        pool.remove("acme")
+        assert "acme" not in pool
+        assert len(pool) == 1
+
+
+def test_per_tenant_overrides() -> None:
+    with OnyphePool(max_retries=5) as pool:
+        client = pool.add("acme", "k", base_url="https://onyphe.example/api/v2", max_retries=1)
+        assert pool["acme"] is client
+        assert client.base_url == "https://onyphe.example/api/v2"
+        assert client.max_retries == 1
+        assert pool.add("globex", "k").max_retries == 5
+
+
+@respx.mock
+def test_concurrency_cap_is_per_tenant() -> None:
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def slow(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        release.wait(0.05)
+        with lock:
+            active -= 1
+        return httpx.Response(200, json=envelope())
+
+    respx.get(f"{BASE}/user").mock(side_effect=slow)
+    with OnyphePool(max_retries=0, max_concurrency=2) as pool:
+        acme = pool.add("acme", "acme-key")
+        results = list(acme.send_many([lambda api: api.user()] * 8, workers=8))
+    assert all(result.ok for result in results)
+    assert peak <= 2
+
+
+@respx.mock
+async def test_async_pool() -> None:
+    route = respx.get(f"{BASE}/user").mock(return_value=httpx.Response(200, json=envelope()))
+    async with AsyncOnyphePool(max_retries=0, max_concurrency=1) as pool:
+        await pool.add("acme", "acme-key").user()
+        await pool.add("globex", "globex-key").user()
+    assert [call.request.headers["Authorization"] for call in route.calls] == [
+        "bearer acme-key",
+        "bearer globex-key",
+    ]
@@ -0,0 +1,48 @@
+"""Phase accounting of pyonyphe.profiling."""
+
+from __future__ import annotations
+
+import time
+
+import httpx
+
+from pyonyphe import Onyphe
+from pyonyphe.fake_server import FakeOnyphe, Faults, constant, serve
+from pyonyphe.profiling import PHASES, Profile
+
+from .conftest import API_KEY
+
+
+def test_network_phases_over_a_socket() -> None:
+    profile = Profile()
+    app = FakeOnyphe(Faults(latency=constant(0.05), total=500, stream_rate=5000))
+    with (
+        serve(app) as base_url,
+        Onyphe(API_KEY, base_url=base_url, transport=profile.transport(), hooks=[profile]) as api,
+    ):
+        documents = list(api.export("x"))
+        with profile.phase("write"):
+            time.sleep(0.02)
+    profile.finish()
+    phases = profile.phases
+    assert len(documents) == 500
+    assert profile.requests == 1
+    assert profile.bytes > 0
+    assert phases["connect"] > 0
+    assert phases["wait"] >= 0.05
+    assert phases["transfer"] >= 0.05
+    assert phases["write"] >= 0.02
+    assert profile.peak_memory > 0
+    assert sum(phases.values()) <= profile.elapsed * 1.01
+    assert list(profile.as_dict()["phases"]) == list(PHASES)
+
+
+def test_backoff_comes_from_the_hooks() -> None:
+    answers = iter([httpx.Response(503), httpx.Response(200, json={"results": []})])
+    profile = Profile()
+    transport = profile.transport(httpx.MockTransport(lambda request: next(answers)))
+    with Onyphe(API_KEY, transport=transport, hooks=[profile], backoff=0.01) as api:
+        api.user()
+    profile.finish()
+    assert profile.requests == 2
+    assert profile.phases["backoff"] > 0
@@ -0,0 +1,51 @@
+"""The live status line of pyonyphe.progress."""
+
+from __future__ import annotations
+
+import io
+
+import httpx
+
+from pyonyphe import Onyphe
+from pyonyphe.progress import Progress
+
+from .conftest import API_KEY, envelope
+
+
+def test_counts_what_goes_through_unchanged() -> None:
+    stream = io.StringIO()
+    progress = Progress(stream, interval=3600)
+    rows = [{"n": n} for n in range(1000)]
+    assert list(progress.track(rows)) == rows
+    assert progress.documents == 1000
+    # Not due yet: nothing drawn, and nothing to erase.
+    progress.close()
+    assert stream.getvalue() == ""
+
+
+def test_line_shows_bytes_eta_and_retries() -> None:
+    page = envelope([{"ip": "1.1.1.1"}] * 50, total=50)
+    answers = iter(
+        [httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(200, json=page)]
+    )
+    transport = httpx.MockTransport(lambda request: next(answers))
+    stream = io.StringIO()
+    progress = Progress(stream, total=200, interval=0)
+    with Onyphe(API_KEY, transport=transport, hooks=[progress], backoff=0.01) as api:
+        assert len(list(progress.track(api.search_iter("x", size=50, max_pages=1)))) == 50
+    line = stream.getvalue().rsplit("\r\x1b[2K", 1)[-1]
+    assert line.startswith("50 docs  ")
+    assert "ETA " in line
+    assert "retries 1 x 429, 0.0s backoff" in line
+    progress.close()
+    assert stream.getvalue().endswith("\r\x1b[2K")
+
+
+def test_stream_bytes_come_from_the_hooks() -> None:
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, text='{"ip":"1.1.1.1"}\n' * 50)
+    )
+    progress = Progress(io.StringIO(), interval=3600)
+    with Onyphe(API_KEY, transport=transport, hooks=[progress]) as api:
+        assert len(list(progress.track(api.export("x")))) == 50
+    assert progress.bytes == 850
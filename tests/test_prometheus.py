@@ -0,0 +1,90 @@
+"""Prometheus metrics fed by the client hooks."""
+
+from __future__ import annotations
+
+import gc
+
+import httpx
+import pytest
+import respx
+from prometheus_client import CollectorRegistry
+
+from pyonyphe import AsyncOnyphe, Onyphe
+from pyonyphe.errors import ServerError, TransportError
+from pyonyphe.prometheus import PrometheusHook, instrument
+
+from .conftest import API_KEY, BASE, envelope
+
+
+def sample(registry: CollectorRegistry, name: str, **labels: str) -> float:
+    return registry.get_sample_value(name, labels) or 0.0
+
+
+@respx.mock
+def test_calls_retries_and_rate_limit_waits() -> None:
+    respx.get(url__startswith=f"{BASE}/summary/ip/").mock(
+        side_effect=[
+            httpx.Response(429, headers={"Retry-After": "0"}, json={"text": "slow down"}),
+            httpx.Response(200, json=envelope()),
+            httpx.Response(500, json={"text": "broken"}),
+        ]
+    )
+    registry = CollectorRegistry()
+    with Onyphe(API_KEY, max_retries=1, backoff=0.0) as client:
+        instrument(client, registry)
+        client.summary_ip("1.1.1.1")
+        client.max_retries = 0
+        with pytest.raises(ServerError):
+            client.summary_ip("8.8.8.8")
+    endpoint = {"endpoint": "summary/ip"}
+    assert sample(registry, "onyphe_requests_total", status="200", **endpoint) == 1
+    assert sample(registry, "onyphe_requests_total", status="500", **endpoint) == 1
+    assert sample(registry, "onyphe_retries_total", reason="429", **endpoint) == 1
+    assert sample(registry, "onyphe_rate_limit_wait_seconds_total", **endpoint) == 0.0
+    assert sample(registry, "onyphe_request_duration_seconds_count", **endpoint) == 2
+    assert sample(registry, "onyphe_in_flight_requests", **endpoint) == 0
+
+
+@respx.mock
+def test_streams_and_in_flight() -> None:
+    respx.get(f"{BASE}/export/").mock(
+        return_value=httpx.Response(200, text='{"n":1}\n{"n":2}\n{"n":3}\n')
+    )
+    registry = CollectorRegistry()
+    hook = PrometheusHook(registry)
+    with Onyphe(API_KEY, hooks=[hook]) as client:
+        stream = client.export("x")
+        first = next(stream)
+        assert first == {"n": 1}
+        assert sample(registry, "onyphe_in_flight_requests", endpoint="export") == 1
+        stream.close()
+        client.export("never started").close()
+    assert sample(registry, "onyphe_in_flight_requests", endpoint="export") == 0
+    assert sample(registry, "onyphe_requests_total", endpoint="export", status="200") == 1
+    assert sample(registry, "onyphe_stream_documents_total", endpoint="export") >= 1
+    assert sample(registry, "onyphe_stream_bytes_total", endpoint="export") > 0
+
+
+@respx.mock
+def test_a_dropped_stream_leaves_the_in_flight_gauge() -> None:
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text='{"n":1}\n{"n":2}\n'))
+    registry = CollectorRegistry()
+    with Onyphe(API_KEY, hooks=[PrometheusHook(registry)]) as client:
+        stream = client.export("x")
+        next(stream)
+        assert sample(registry, "onyphe_in_flight_requests", endpoint="export") == 1
+        del stream
+        gc.collect()
+        assert sample(registry, "onyphe_in_flight_requests", endpoint="export") == 0
+
+
+@respx.mock
+async def test_async_transport_errors() -> None:
+    respx.get(f"{BASE}/user").mock(side_effect=httpx.ConnectError("refused"))
+    registry = CollectorRegistry()
+    async with AsyncOnyphe(API_KEY, max_retries=1, backoff=0.0) as client:
+        instrument(client, registry, namespace="custom")
+        with pytest.raises(TransportError):
+            await client.user()
+    assert sample(registry, "custom_retries_total", endpoint="user", reason="transport") == 1
+    assert sample(registry, "custom_requests_total", endpoint="user", status="error") == 1
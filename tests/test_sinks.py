@@ -0,0 +1,320 @@
+"""Batched NDJSON writing and the background writer of pyonyphe.sinks."""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import time
+import zlib
+from pathlib import Path
+
+import pytest
+
+from pyonyphe.errors import ParamError
+from pyonyphe.sinks import (
+    Aggregator,
+    BackgroundWriter,
+    DelimitedSink,
+    GzipWriter,
+    NDJSONSink,
+    ShardedSink,
+    TeeSink,
+    compress,
+    compression_for,
+    copy,
+)
+
+
+class Recording(io.BytesIO):
+    """A stream that remembers each write, and can be slow or broken."""
+
+    def __init__(self, *, delay: float = 0.0, error: Exception | None = None) -> None:
+        super().__init__()
+        self.writes: list[int] = []
+        self.delay = delay
+        self.error = error
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.writes.append(len(data))
+        return super().write(data)
+
+
+def test_lines_go_out_in_large_writes(tmp_path: Path) -> None:
+    rows = [{"ip": f"10.0.0.{n % 256}", "n": n, "é": "ü"} for n in range(5000)]
+    stream = Recording()
+    sink = NDJSONSink(stream, buffer_size=64 * 1024)
+    assert copy(rows, sink, batch_size=100) == len(rows)
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == rows
+    assert len(stream.writes) < 10
+    with NDJSONSink.open(tmp_path / "out.ndjson") as on_disk:
+        copy(rows, on_disk)
+    assert (tmp_path / "out.ndjson").read_bytes() == stream.getvalue()
+
+
+def test_slow_stream_does_not_hold_the_caller() -> None:
+    stream = Recording(delay=0.05)
+    writer = BackgroundWriter(stream, depth=8)
+    started = time.perf_counter()
+    for _ in range(4):
+        writer.write(b"x" * 1024)
+    assert time.perf_counter() - started < 0.05
+    writer.close()
+    assert stream.writes == [1024] * 4
+
+
+def test_write_errors_reach_the_caller() -> None:
+    sink = NDJSONSink(BackgroundWriter(Recording(error=BrokenPipeError())), owned=True)
+    sink.write({"ip": "1.1.1.1"})
+    with pytest.raises(BrokenPipeError):
+        sink.close()
+
+
+def test_fetch_errors_keep_what_came_before() -> None:
+    def rows():
+        yield {"n": 1}
+        raise RuntimeError("cut")
+
+    stream = Recording()
+    with pytest.raises(RuntimeError, match="cut"), NDJSONSink(stream) as sink:
+        copy(rows(), sink)
+    assert stream.getvalue() == b'{"n": 1}\n'
+
+
+def test_slow_streams_are_flushed_as_they_come() -> None:
+    stream = Recording()
+    seen: list[bytes] = []
+
+    def rows():
+        yield {"n": 1}
+        time.sleep(0.06)
+        yield {"n": 2}
+        seen.append(stream.getvalue())
+        yield {"n": 3}
+
+    with NDJSONSink(stream) as sink:
+        copy(rows(), sink, linger=0.05)
+    assert seen == [b'{"n": 1}\n{"n": 2}\n']
+
+
+def test_delimited_rows_flatten_nested_fields(tmp_path: Path) -> None:
+    rows = [
+        {"ip": "1.1.1.1", "app": {"http": {"title": 'a, "b"'}}, "cve": ["x", "y"], "tls": True},
+        {"ip": "2.2.2.2", "cpe": [{"vendor": "nginx"}], "extra": 1},
+    ]
+    stream = Recording()
+    with DelimitedSink(stream) as sink:
+        copy(rows, sink, batch_size=1)
+    assert list(csv.reader(io.StringIO(stream.getvalue().decode()))) == [
+        ["ip", "app.http.title", "cve", "tls"],
+        ["1.1.1.1", 'a, "b"', "x|y", "true"],
+        ["2.2.2.2", "", "", ""],
+    ]
+    path = tmp_path / "out.tsv.gz"
+    fields = ["ip", "cpe.vendor", "cpe", "cve"]
+    with DelimitedSink.open(path, fields=fields, delimiter="\t", list_separator=";") as sink:
+        copy(rows, sink)
+    assert gzip.decompress(path.read_bytes()).decode().splitlines() == [
+        "ip\tcpe.vendor\tcpe\tcve",
+        "1.1.1.1\t\t\tx;y",
+        '2.2.2.2\tnginx\t"[{""vendor"": ""nginx""}]"\t',
+    ]
+
+
+def test_fields_left_out_are_told_once() -> None:
+    dropped: list[str] = []
+    rows = [{"ip": "1.1.1.1", "app": {}}, {"ip": "2.2.2.2", "app": {"x": 1}, "port": 80, "os": "x"}]
+    with DelimitedSink(Recording(), on_dropped=dropped.append) as sink:
+        copy([*rows, {"asn": "AS1"}], sink, batch_size=1)
+    assert dropped == ["port"]  # app.x goes in the app column, as JSON
+    with DelimitedSink(Recording(), ["ip"], on_dropped=dropped.append) as sink:
+        copy(rows, sink)
+    assert dropped == ["port"]
+
+
+ROWS = [
+    {"ip": f"10.0.{n // 256}.{n % 256}", "data": "HTTP/1.1 200 OK\r\n" * (n % 7)}
+    for n in range(20_000)
+]
+
+
+def test_compression_follows_the_suffix(tmp_path: Path) -> None:
+    assert compression_for("out.ndjson.gz") == "gzip"
+    assert compression_for(tmp_path / "OUT.ZST") == "zstd"
+    assert compression_for("out.ndjson") is None
+    with pytest.raises(ParamError, match="unknown compression"):
+        NDJSONSink.open(tmp_path / "out", compression="lzma")
+
+
+@pytest.mark.parametrize("threads", [0, 3])
+def test_gzip_members_read_back_as_one_stream(tmp_path: Path, threads: int) -> None:
+    path = tmp_path / "out.ndjson.gz"
+    with NDJSONSink.open(path, threads=threads, level=1, buffer_size=64 * 1024) as sink:
+        copy(ROWS, sink)
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        assert [json.loads(line) for line in handle] == ROWS
+
+
+def test_gzip_blocks_are_compressed_in_order() -> None:
+    stream = Recording()
+    writer = GzipWriter(stream, threads=4, block_size=1000)
+    for n in range(50):
+        writer.write(f"{n:03d}".encode() * 100)
+    writer.close()
+    assert gzip.decompress(stream.getvalue()) == b"".join(
+        f"{n:03d}".encode() * 100 for n in range(50)
+    )
+    assert len(stream.writes) == 15
+
+
+def test_flushes_do_not_cut_gzip_members() -> None:
+    stream = Recording()
+    with NDJSONSink(GzipWriter(stream), buffer_size=1, owned=True) as sink:
+        copy(ROWS[:2000], sink, batch_size=10, linger=0)
+        assert stream.getvalue() == b""  # under a block: nothing compressed yet
+    reader = zlib.decompressobj(wbits=31)
+    lines = reader.decompress(stream.getvalue()).decode().splitlines()
+    assert reader.eof and not reader.unused_data  # a single member
+    assert [json.loads(line) for line in lines] == ROWS[:2000]
+
+
+def test_flushes_do_not_cut_zstd_blocks() -> None:
+    zstandard = pytest.importorskip("zstandard")
+    sizes = []
+    for linger in (0, 60):
+        stream = Recording()
+        with NDJSONSink(compress(stream, "zstd"), buffer_size=1, owned=True) as sink:
+            copy(ROWS, sink, batch_size=10, linger=linger)
+        sizes.append(len(stream.getvalue()))
+        text = zstandard.ZstdDecompressor().decompressobj().decompress(stream.getvalue())
+        assert text.count(b"\n") == len(ROWS)
+    assert sizes[0] == sizes[1]
+
+
+def test_zstd_round_trip(tmp_path: Path) -> None:
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "out.ndjson.zst"
+    with NDJSONSink.open(path, threads=2) as sink:
+        copy(ROWS, sink)
+    with zstandard.open(path, "rt", encoding="utf-8") as handle:
+        assert [json.loads(line) for line in handle] == ROWS
+
+
+def _manifest(directory: Path) -> dict:
+    return json.loads((directory / "manifest.json").read_text(encoding="utf-8"))
+
+
+def test_shards_roll_over_and_are_listed(tmp_path: Path) -> None:
+    rows = [{"@category": ("datascan", "vulnscan", "geoloc")[n % 3], "n": n} for n in range(100)]
+    rows.append({"n": 100})
+    with ShardedSink(tmp_path, by="@category", max_documents=20, compression="gzip") as sink:
+        copy(rows, sink, batch_size=7)
+    manifest = _manifest(tmp_path)
+    assert manifest["documents"] == 101
+    assert [shard["path"] for shard in manifest["shards"] if shard["key"] == "datascan"] == [
+        "category=datascan/part-00000.ndjson.gz",
+        "category=datascan/part-00001.ndjson.gz",
+    ]
+    assert {shard["documents"] for shard in manifest["shards"]} <= {1, 13, 14, 20}
+    found = []
+    for shard in manifest["shards"]:
+        data = gzip.decompress((tmp_path / shard["path"]).read_bytes())
+        assert len(data) == shard["bytes"]
+        assert (tmp_path / shard["path"]).stat().st_size == shard["size"]
+        found += [json.loads(line) for line in data.splitlines()]
+    assert sorted(row["n"] for row in found) == list(range(101))
+    assert "category=__HIVE_DEFAULT_PARTITION__" in {path.name for path in tmp_path.iterdir()}
+
+
+def test_shards_by_size_and_with_few_open_files(tmp_path: Path) -> None:
+    rows = [{"port": 80 + n % 4, "data": "x" * 100} for n in range(400)]
+    with ShardedSink(tmp_path / "size", max_bytes=10_000) as sink:
+        copy(rows, sink, batch_size=10)
+    shards = _manifest(tmp_path / "size")["shards"]
+    assert len(shards) == 5
+    assert all(10_000 <= shard["bytes"] < 11_500 for shard in shards[:-1])
+    # Two files open at most, for four ports coming in turn: each batch evicts.
+    with ShardedSink(tmp_path / "lru", by="port", max_open=2) as sink:
+        copy(rows, sink, batch_size=4)
+        assert len(sink._open) == 2
+    shards = _manifest(tmp_path / "lru")["shards"]
+    assert sum(shard["documents"] for shard in shards) == 400
+    assert len({shard["key"] for shard in shards}) == 4
+    with pytest.raises(ParamError, match="max_documents"):
+        ShardedSink(tmp_path, max_documents=0)
+
+
+class Collecting:
+    """A sink keeping what it is given, slowly or not at all if asked to."""
+
+    def __init__(self, *, delay: float = 0.0, error: Exception | None = None) -> None:
+        self.rows: list[dict[str, object]] = []
+        self.flushes = 0
+        self.closed = False
+        self.delay = delay
+        self.error = error
+
+    def write_many(self, rows: list[dict[str, object]]) -> None:
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.rows.extend(rows)
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_tee_sink_writes_everything_everywhere() -> None:
+    rows = [{"n": n} for n in range(1000)]
+    stream = io.BytesIO()
+    fast, slow = Collecting(), Collecting(delay=0.001)
+    with TeeSink([fast, slow, NDJSONSink(stream)], depth=4) as tee:
+        assert copy(rows, tee, batch_size=100) == 1000
+    assert fast.rows == slow.rows == rows
+    assert fast.closed and slow.closed and fast.flushes >= 1
+    assert len(stream.getvalue().splitlines()) == 1000
+
+
+def test_tee_sink_queue_is_bounded() -> None:
+    slow = Collecting(delay=0.02)
+    tee = TeeSink([slow, Collecting()], depth=2)
+    started = time.perf_counter()
+    for n in range(10):
+        tee.write_many([{"n": n}])
+    # The slow sink can hold up the writer once its 2 batches are queued.
+    assert time.perf_counter() - started >= 0.1
+    tee.close()
+    assert len(slow.rows) == 10
+
+
+def test_tee_sink_raises_a_sink_error_and_closes_the_others() -> None:
+    broken, healthy = Collecting(error=OSError("disk full")), Collecting()
+    tee = TeeSink([broken, healthy])
+    tee.write_many([{"n": 1}])
+    with pytest.raises(OSError, match="disk full"):
+        tee.close()
+    assert healthy.rows == [{"n": 1}] and healthy.closed and broken.closed
+    with pytest.raises(ParamError):
+        TeeSink([])
+
+
+def test_aggregator_counts_values_and_list_items() -> None:
+    counts = Aggregator(["country", "domain", "app.http.title"])
+    counts.write_many(
+        [
+            {"country": "FR", "domain": ["a.fr", "b.fr"]},
+            {"country": "FR", "domain": []},
+            {"country": "DE", "app": {"http": {"title": "x"}}},
+        ]
+    )
+    assert counts.documents == 3
+    assert counts.most_common("country") == [("FR", 2), ("DE", 1)]
+    assert dict(counts.counts["domain"]) == {"a.fr": 1, "b.fr": 1, None: 2}
+    assert counts.most_common("app.http.title", 1) == [(None, 2)]
@@ -121,3 +121,10 @@ def test_alert_add_requires_every_field() -> None:
 
 def test_alert_del_uses_the_id_in_the_path() -> None:
     assert specs.alert_del(3).path == "alert/del/3"
+
+
+def test_endpoint_drops_the_caller_values() -> None:
+    assert specs.summary("ip", "8.8.8.8").endpoint == "summary/ip"
+    assert specs.simple_best("whois", "8.8.8.8").endpoint == "simple/whois/best"
+    assert specs.search("x").endpoint == "search"
+    assert specs.user().endpoint is None  # nothing to strip, the path is used
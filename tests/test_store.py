@@ -0,0 +1,105 @@
+"""Local SQLite and DuckDB stores: layout, indexes and upserts."""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from pyonyphe.errors import ParamError
+from pyonyphe.sinks import copy
+from pyonyphe.store import DuckDBStore, SQLiteStore, table_name
+
+DOCUMENTS = [
+    {
+        "@category": "datascan",
+        "@timestamp": "2025-01-01T00:00:00.000Z",
+        "ip": f"10.0.0.{n}",
+        "port": str(80 + n % 2),
+        "domain": ["example.com", f"n{n}.example.com"],
+        "hostname": f"host{n}.example.com",
+        "app": {"http": {"title": "home"}},
+    }
+    for n in range(10)
+] + [{"@category": "geo-loc", "ip": "1.1.1.1", "country": "AU"}, {"ip": "8.8.8.8"}]
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def store(request: pytest.FixtureRequest, tmp_path: Path) -> type[SQLiteStore]:
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+        return DuckDBStore
+    return SQLiteStore
+
+
+def _count(path: Path, kind: type[SQLiteStore], sql: str) -> int:
+    with kind(path) as store:
+        return store.connection.execute(sql).fetchone()[0]
+
+
+def test_documents_go_to_per_category_tables(tmp_path: Path, store: type[SQLiteStore]) -> None:
+    path = tmp_path / "onyphe.db"
+    with store(path, batch_rows=4) as sink:
+        assert copy(DOCUMENTS, sink) == 12
+    assert sink.tables() == ["datascan", "documents", "geo_loc"]
+    assert _count(path, store, "SELECT count(*) FROM datascan WHERE port = 81") == 5
+    assert (
+        _count(path, store, "SELECT count(*) FROM datascan_domain WHERE domain = 'example.com'")
+        == 10
+    )
+    assert _count(path, store, "SELECT count(*) FROM datascan_hostname") == 10
+    assert _count(path, store, "SELECT count(*) FROM geo_loc WHERE ip = '1.1.1.1'") == 1
+    with store(path) as sink:
+        (document,) = sink.connection.execute(
+            "SELECT document FROM datascan WHERE ip = '10.0.0.3'"
+        ).fetchone()
+    assert json.loads(document) == DOCUMENTS[3]
+
+
+def test_storing_again_replaces(tmp_path: Path, store: type[SQLiteStore]) -> None:
+    path = tmp_path / "onyphe.db"
+    for _ in range(2):
+        with store(path) as sink:
+            copy(DOCUMENTS, sink)
+    assert _count(path, store, "SELECT count(*) FROM datascan") == 10
+    assert _count(path, store, "SELECT count(*) FROM datascan_domain") == 20
+    assert _count(path, store, "SELECT count(*) FROM geo_loc") == 1
+
+
+def test_a_newer_scan_of_a_service_replaces_the_older(
+    tmp_path: Path, store: type[SQLiteStore]
+) -> None:
+    path = tmp_path / "onyphe.db"
+    service = DOCUMENTS[0]
+    with store(path) as sink:
+        copy([service], sink)
+    with store(path) as sink:
+        copy([{**service, "@timestamp": "2025-02-01T00:00:00.000Z"}], sink)
+    assert _count(path, store, "SELECT count(*) FROM datascan") == 1
+    assert _count(path, store, "SELECT count(*) FROM datascan WHERE timestamp LIKE '2025-02%'") == 1
+    assert _count(path, store, "SELECT count(*) FROM datascan_domain") == 2
+    # The same fields named with key= match the same rows.
+    with store(path, key=["ip", "port"]) as sink:
+        copy([{**service, "domain": "other.example"}], sink)
+    assert _count(path, store, "SELECT count(*) FROM datascan") == 1
+    assert _count(path, store, "SELECT count(*) FROM datascan_domain") == 1
+    # Without a port, a document is matched on its content.
+    portless = {"@category": "datascan", "ip": "10.9.9.9"}
+    with store(path) as sink:
+        copy([portless, {**portless, "@timestamp": "2025-02-01T00:00:00.000Z"}, portless], sink)
+    assert _count(path, store, "SELECT count(*) FROM datascan") == 3
+
+
+def test_table_names_stay_identifiers() -> None:
+    assert table_name("datascan") == "datascan"
+    assert table_name("x; DROP TABLE datascan") == "x__drop_table_datascan"
+    assert table_name("2fa") == "c_2fa"
+    assert table_name(None) == "documents"
+
+
+def test_duckdb_needs_its_extra(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "duckdb", None)
+    with pytest.raises(ParamError, match="duckdb extra"):
+        DuckDBStore(tmp_path / "onyphe.duckdb")
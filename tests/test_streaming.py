@@ -0,0 +1,87 @@
+"""Stream handles: lazy opening, prompt release and live counters."""
+
+from __future__ import annotations
+
+import httpx
+import pytest
+import respx
+
+from pyonyphe import AsyncOnyphe, Onyphe, OnyphePool
+from pyonyphe.errors import AuthenticationError
+from pyonyphe.fields import Projection
+from pyonyphe.hooks import STREAM_FINISHED, Event
+
+from .conftest import BASE
+
+BODY = '{"ip":"1.1.1.1"}\n\nnot json\n[1, 2]\n{"ip":"8.8.8.8"}'
+
+
+@respx.mock
+def test_stats_count_documents_bytes_and_junk(client: Onyphe) -> None:
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=BODY))
+    with client.export("x") as stream:
+        rows = list(stream)
+    assert [row["ip"] for row in rows] == ["1.1.1.1", "8.8.8.8"]
+    assert stream.stats.documents == 2
+    assert stream.stats.skipped == 2  # the blank line is not junk
+    assert stream.stats.bytes_received == len(BODY)
+    assert stream.stats.elapsed > 0
+    assert stream.closed
+
+
+@respx.mock
+def test_stats_count_only_what_was_yielded(client: Onyphe) -> None:
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=BODY + "\n"))
+    finished: list[Event] = []
+    client.add_hook(lambda event: finished.append(event) if event.name == STREAM_FINISHED else None)
+    with client.export("x") as stream:
+        assert next(stream) == {"ip": "1.1.1.1"}  # the whole body is one decoded chunk
+    assert stream.stats.documents == 1
+    assert [event.documents for event in finished] == [1]
+
+
+@respx.mock
+def test_projection_applies_as_lines_are_decoded(client: Onyphe) -> None:
+    body = '{"ip":"1.1.1.1","data":"%s","port":80}\n{"ip":"8.8.8.8"}' % ("x" * 5000)
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=body))
+    rows = list(client.export("x", project=Projection(drop=["data"], max_length=3)))
+    assert rows == [{"ip": "1.1", "port": 80}, {"ip": "8.8"}]
+
+
+def test_nothing_is_sent_before_iteration(client: Onyphe) -> None:
+    with respx.mock(assert_all_called=False) as mock:
+        route = mock.get(f"{BASE}/export/")
+        client.export("x")
+        assert route.call_count == 0
+
+
+@respx.mock
+def test_errors_are_raised_on_enter(client: Onyphe) -> None:
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(403, json={"text": "no"}))
+    handle = client.export("x")
+    with pytest.raises(AuthenticationError):
+        handle.__enter__()
+    assert handle.closed
+
+
+@respx.mock
+def test_close_releases_the_concurrency_slot() -> None:
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text='{"n":1}\n{"n":2}\n'))
+    with OnyphePool(max_retries=0, max_concurrency=1) as pool:
+        tenant = pool.add("acme", "k")
+        for _ in range(3):  # would deadlock if breaking out kept the slot
+            with tenant.export("x") as stream:
+                assert next(stream) == {"n": 1}
+            assert stream.closed
+            assert list(stream) == []
+
+
+@respx.mock
+async def test_async_handle() -> None:
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text=BODY))
+    async with AsyncOnyphe("k", max_retries=0) as client:
+        async with client.export("x") as stream:
+            first = await anext(stream)
+        assert first == {"ip": "1.1.1.1"}
+        assert stream.closed
+        assert stream.stats.documents == 1
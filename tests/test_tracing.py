@@ -0,0 +1,149 @@
+"""OpenTelemetry spans, checked against the SDK's in-memory exporter."""
+
+from __future__ import annotations
+
+import gc
+from collections.abc import Iterator
+
+import httpx
+import pytest
+import respx
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import StatusCode
+
+from pyonyphe import AsyncOnyphe, Onyphe
+from pyonyphe.errors import AuthenticationError
+from pyonyphe.tracing import instrument
+
+from .conftest import API_KEY, BASE, envelope
+
+
+@pytest.fixture
+def exporter() -> Iterator[InMemorySpanExporter]:
+    exporter = InMemorySpanExporter()
+    yield exporter
+    exporter.clear()
+
+
+@pytest.fixture
+def provider(exporter: InMemorySpanExporter) -> TracerProvider:
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return provider
+
+
+@respx.mock
+def test_call_attempt_and_backoff_spans(
+    provider: TracerProvider, exporter: InMemorySpanExporter
+) -> None:
+    respx.get(f"{BASE}/search/").mock(
+        side_effect=[
+            httpx.Response(503, json={"text": "busy"}),
+            httpx.Response(200, json=envelope([{"ip": "8.8.8.8"}])),
+        ]
+    )
+    with Onyphe(API_KEY, max_retries=1, backoff=0.0) as client:
+        instrument(client, provider)
+        client.search("protocol:dns", page=2, size=10)
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    names = [span.name for span in exporter.get_finished_spans()]
+    assert names.count("onyphe attempt") == 2
+    call = spans["onyphe search"]
+    assert call.attributes["onyphe.page"] == 2
+    assert call.attributes["onyphe.size"] == 10
+    assert call.attributes["http.response.status_code"] == 200
+    for span in exporter.get_finished_spans():
+        if span.name != "onyphe search":
+            assert span.parent.span_id == call.context.span_id
+    assert "onyphe backoff" in spans
+
+
+@respx.mock
+def test_send_many_keeps_the_caller_trace(
+    provider: TracerProvider, exporter: InMemorySpanExporter
+) -> None:
+    respx.get(url__startswith=f"{BASE}/summary/ip/").mock(
+        return_value=httpx.Response(200, json=envelope())
+    )
+    tracer = provider.get_tracer("test")
+    with Onyphe(API_KEY, max_retries=0) as client:
+        instrument(client, provider)
+        with tracer.start_as_current_span("job") as job:
+            calls = [lambda api, n=n: api.summary_ip(f"10.0.0.{n}") for n in range(4)]
+            assert all(result.ok for result in client.send_many(calls, workers=4))
+    calls_spans = [s for s in exporter.get_finished_spans() if s.name == "onyphe summary/ip"]
+    assert len(calls_spans) == 4
+    assert {span.parent.span_id for span in calls_spans} == {job.get_span_context().span_id}
+
+
+@respx.mock
+async def test_stream_span_counts_documents(
+    provider: TracerProvider, exporter: InMemorySpanExporter
+) -> None:
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(403, json={"text": "no"}))
+    async with AsyncOnyphe(API_KEY, max_retries=0) as client:
+        instrument(client, provider)
+        with pytest.raises(AuthenticationError):
+            async for _ in client.export("x"):
+                pass
+    (span,) = [s for s in exporter.get_finished_spans() if s.name == "onyphe export"]
+    assert span.status.status_code is StatusCode.ERROR
+    assert span.attributes["onyphe.documents"] == 0
+
+
+@respx.mock
+def test_search_iter_is_one_span_over_its_pages(
+    provider: TracerProvider, exporter: InMemorySpanExporter
+) -> None:
+    respx.get(f"{BASE}/search/").mock(
+        side_effect=[
+            httpx.Response(200, json=envelope([{"n": 1}], max_page=2, page=1)),
+            httpx.Response(200, json=envelope([{"n": 2}], max_page=2, page=2)),
+        ]
+    )
+    with Onyphe(API_KEY, max_retries=0) as client:
+        hook = instrument(client, provider)
+        assert [hit["n"] for hit in client.search_iter("x", size=1)] == [1, 2]
+        client.remove_hook(hook)
+        respx.get(f"{BASE}/search/").mock(return_value=httpx.Response(200, json=envelope([])))
+        assert list(client.search_iter("x")) == []
+    spans = exporter.get_finished_spans()
+    (whole,) = [span for span in spans if span.name == "onyphe search_iter"]
+    pages = [span for span in spans if span.name == "onyphe search"]
+    assert len(pages) == 2
+    assert {span.parent.span_id for span in pages} == {whole.context.span_id}
+    assert whole.attributes["onyphe.documents"] == 2
+
+
+@respx.mock
+async def test_export_partitioned_is_one_span(
+    provider: TracerProvider, exporter: InMemorySpanExporter
+) -> None:
+    respx.get(f"{BASE}/search/").mock(return_value=httpx.Response(200, json=envelope(total=5)))
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text='{"n":1}\n'))
+    async with AsyncOnyphe(API_KEY, max_retries=0) as client:
+        instrument(client, provider)
+        documents = [doc async for doc in client.export_partitioned("x", [], target=10)]
+    assert documents == [{"n": 1}]
+    spans = exporter.get_finished_spans()
+    (whole,) = [span for span in spans if span.name == "onyphe export_partitioned"]
+    calls = [span for span in spans if span.name in ("onyphe search", "onyphe export")]
+    assert len(calls) == 2
+    assert {span.parent.span_id for span in calls} == {whole.context.span_id}
+
+
+@respx.mock
+def test_a_dropped_stream_ends_its_span(
+    provider: TracerProvider, exporter: InMemorySpanExporter
+) -> None:
+    respx.get(f"{BASE}/export/").mock(return_value=httpx.Response(200, text='{"n":1}\n{"n":2}\n'))
+    with Onyphe(API_KEY, max_retries=0) as client:
+        instrument(client, provider)
+        stream = client.export("x")
+        next(stream)
+        del stream
+        gc.collect()
+        (span,) = [s for s in exporter.get_finished_spans() if s.name == "onyphe export"]
+    assert span.attributes["onyphe.abandoned"] is True